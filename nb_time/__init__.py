@@ -1,26 +1,77 @@
-import copy
 import functools
 import logging
-import pickle
+import os
 import sys
-import threading
 import types
 import typing
 import re
-import time
 import datetime
-from dateutil.relativedelta import relativedelta
-import dateutil.parser
-import pytz
-import arrow
+
+from nb_time import bucketing, clock, serialization
+from nb_time.adaptive_parser import adaptive_str_parser
+from nb_time.str_formatter import get_compiled_str_formatter
+from nb_time.str_parser import get_compiled_str_parser
+from nb_time.tz_registry import TZ_EAST_8, TZ_UTC, time_zone_registry
+
+if typing.TYPE_CHECKING:
+    import arrow
+    from nb_time.arrow_interop import ArrowWrap
+    from nb_time.batch_parse import ParseManyResult
+    from nb_time.nb_time_array import NbTimeArray
 
 # from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
+EPOCH_UTC = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def datetime_to_epoch_us(datetime_obj: datetime.datetime) -> int:
+    """带时区的 datetime 转成 utc 微秒整数时间戳，整数运算没有浮点误差。"""
+    return (datetime_obj - EPOCH_UTC) // _ONE_MICROSECOND
+
+
+# id(tz) -> (tz, 本地的 epoch)。不用 tz 做 key ，名字不同但偏移相同的 datetime.timezone 是相等的。
+_tz_id__local_epoch_map: typing.Dict[int, typing.Tuple[datetime.tzinfo, typing.Optional[datetime.datetime]]] = {}
+
+
+def _get_local_epoch(tz: datetime.tzinfo) -> typing.Optional[datetime.datetime]:
+    """固定偏移时区的 1970-01-01 00:00 UTC ，有夏令时的时区返回None"""
+    entry = _tz_id__local_epoch_map.get(id(tz))
+    if entry is not None and entry[0] is tz:
+        return entry[1]
+    local_epoch = EPOCH_UTC.astimezone(tz) if time_zone_registry.get_fixed_utcoffset(tz) is not None else None
+    if len(_tz_id__local_epoch_map) < 1024:
+        _tz_id__local_epoch_map[id(tz)] = (tz, local_epoch)
+    return local_epoch
+
+
+def epoch_us_to_datetime(epoch_us: int, tz: datetime.tzinfo) -> datetime.datetime:
+    """utc 微秒整数时间戳转成 tz 时区的 datetime"""
+    local_epoch = _get_local_epoch(tz)
+    if local_epoch is not None:  # 固定偏移的时区直接加，不需要 astimezone
+        return local_epoch + datetime.timedelta(microseconds=epoch_us)
+    return (EPOCH_UTC + datetime.timedelta(microseconds=epoch_us)).astimezone(tz)
+
+
+_now_fast_key__state_map: typing.Dict[tuple, tuple] = {}  # NbTime.now_fast 用，key -> (模板对象, 微秒时间戳, 对象)
+
+
+def _restore_nb_time(cls, epoch_us: int, time_zone_key, formatter_id):
+    """NbTime NbTimeLite 的 pickle 反序列化入口，见 NbTime.__reduce__ """
+    return cls._from_serialized(epoch_us, serialization.load_time_zone_key(time_zone_key),
+                                serialization.load_formatter(formatter_id))
+
+
+LOCAL_TIME_ZONE_ENV = 'NB_TIME_LOCAL_TIME_ZONE'  # 设置了这个环境变量就用它作为系统时区，不需要导入 tzlocal
+
 
 @functools.lru_cache()
 def get_localzone_ignore_version():  # python3.9以上不一样.  tzlocal 版本在不同python版本上自动安装不同版本
+    zone = os.environ.get(LOCAL_TIME_ZONE_ENV)
+    if zone:
+        return zone
     from tzlocal import get_localzone
     try:
         return get_localzone().zone
@@ -63,9 +114,14 @@ class DateTimeValue:
 class TimeInParamError(Exception):
     pass
 
-class ArrowWrap(arrow.Arrow):
-    def to_nb_time(self):
-        return NbTime(self)
+
+def __getattr__(name):
+    # arrow 导入很慢，ArrowWrap 定义在 nb_time.arrow_interop 里面，第一次用到时才导入
+    if name == 'ArrowWrap':
+        from nb_time.arrow_interop import ArrowWrap
+        return ArrowWrap
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
 class NbTime:
     """ 时间转换，支持链式操作，纯面向对象的的。
@@ -89,9 +145,8 @@ class NbTime:
     TIMEZONE_EASTERN_8 = 'UTC+8'  # UTC+08:00 这是东八区
     TIMEZONE_E8 = 'Etc/GMT-8'  # 这个也是东八区，这个Etc/GMT是标准的pytz的支持的格式。
     TIMEZONE_ASIA_SHANGHAI = 'Asia/Shanghai'  # 就是东八区.
-    TIMEZONE_TZ_EAST_8 = datetime.timezone(datetime.timedelta(hours=8),
-                                           name='UTC+08:00')  # 这种性能比pytz 'Asia/Shanghai' 性能高很多。但pytz可以处理历史夏令时。
-    TIMEZONE_TZ_UTC = datetime.timezone(datetime.timedelta(hours=0), name='UTC+07:00')
+    TIMEZONE_TZ_EAST_8 = TZ_EAST_8  # 这种性能比pytz 'Asia/Shanghai' 性能高很多。但pytz可以处理历史夏令时。
+    TIMEZONE_TZ_UTC = TZ_UTC
 
     default_formatter: str = None
     default_time_zone: str = None
@@ -104,18 +159,72 @@ class NbTime:
     def set_default_time_zone(cls, time_zone: str):
         cls.default_time_zone = time_zone
 
+    @staticmethod
+    def set_tz_backend(backend: str):
+        """
+        设置命名时区(例如 America/New_York)的解析方式，全局生效，在程序启动时设置:
+        'pytz' 默认，兼容以前的行为；
+        'zoneinfo' 使用标准库 zoneinfo.ZoneInfo ，不需要 pytz 的 localize normalize ，构造 to_tz shift 都更快，需要python3.9+；
+        'fixed' 解析成当前时刻的固定偏移，最快，但是不处理夏令时切换。
+        """
+        time_zone_registry.set_backend(backend)
+        NbTimeConfig._key__config_map.clear()
+        _now_fast_key__state_map.clear()  # now_fast 的模板对象里面是旧 backend 解析出来的时区
+
+    @staticmethod
+    def set_clock(clock_obj: typing.Optional[clock.Clock] = None) -> clock.Clock:
+        """
+        设置全局时钟，NbTime() now_fast today_zero is_greater_than_now NowTimeStrCache 都用这个时钟取当前时间，返回原来的时钟。
+        nb_time.clock 里面有 SystemClock(默认) CoarseClock(毫秒/秒级粗粒度，可以开后台线程刷新) MonotonicClock FakeClock(测试用)。
+        传None恢复成系统时钟。
+        """
+        return clock.set_clock(clock_obj)
+
+    @classmethod
+    def now_fast(cls, time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                 datetime_formatter: str = None) -> 'NbTime':
+        """
+        当前时间，比 NbTime() 快很多，不走构造函数，从同样配置的模板对象复制。
+        配合 CoarseClock 使用时，同一个毫秒/秒内返回的是同一个对象。
+        """
+        key = (cls, datetime_formatter, time_zone, cls.default_formatter, cls.default_time_zone)
+        now_us = clock.now_us()
+        state = _now_fast_key__state_map.get(key)
+        if state is not None:
+            template, last_us, last_nb_time = state
+            if last_us == now_us:
+                return last_nb_time
+        else:
+            template = cls(datetime_formatter=datetime_formatter, time_zone=time_zone)
+        # 当前时刻的 float 时间戳误差远小于0.5微秒，fromtimestamp 比 epoch_us_to_datetime 快一倍
+        nb_time = template._build_now_nb_time(datetime.datetime.fromtimestamp(now_us / 1000000, template.time_zone_obj))
+        # 整体替换 tuple ，不需要加锁
+        _now_fast_key__state_map[key] = (template, now_us, nb_time)
+        return nb_time
+
+    local_time_zone: str = None
+
+    @classmethod
+    def set_local_time_zone(cls, time_zone: typing.Optional[str]):
+        """
+        直接指定系统时区，不用 tzlocal 自动获取，命令行工具 serverless 这种短命进程可以省掉导入 tzlocal 的时间。
+        也可以设置环境变量 NB_TIME_LOCAL_TIME_ZONE 。传None恢复成自动获取。
+        """
+        NbTime.local_time_zone = time_zone
+        NbTime.get_localzone_name.cache_clear()
+
     @staticmethod
     @functools.lru_cache()
     def get_localzone_name() -> str:
-        zone = get_localzone_ignore_version()
-        print(f'auto get the system time zone is "{zone}"')
+        zone = NbTime.local_time_zone or get_localzone_ignore_version()
+        logger.debug(f'system time zone is "{zone}"')
         return zone
 
     time_zone_str__obj_map = {}
 
     def __init__(self,
                  datetimex: typing.Union[
-                     None, int, float, datetime.datetime, str, 'NbTime', DateTimeValue, arrow.Arrow] = None,
+                     None, int, float, datetime.datetime, str, 'NbTime', DateTimeValue, 'arrow.Arrow'] = None,
                  *,
                  datetime_formatter: str = None,
                  time_zone: typing.Union[str, datetime.tzinfo, None] = None):
@@ -146,38 +255,125 @@ class NbTime:
     def _build_nb_time(self, datetimex) -> 'NbTime':
         return self.__class__(datetimex, **self.init_params)
 
+    def _build_nb_time_from_datetime_obj(self, datetime_obj: datetime.datetime) -> 'NbTime':
+        """datetime_obj 已经是本对象时区的时间，直接复制配置生成新对象，不走 __init__ """
+        nb_time = self.__class__.__new__(self.__class__)
+        state = dict(self.__dict__)
+        state.pop('_epoch_us', None)
+        state.pop('_arrow_obj', None)
+        state['_raw_in_params'] = dict(self._raw_in_params, datetimex=datetime_obj)
+        state['first_param'] = datetime_obj
+        state['datetime_obj'] = state['datetime'] = datetime_obj
+        nb_time.__dict__.update(state)
+        return nb_time
+
+    def _build_now_nb_time(self, datetime_obj: datetime.datetime) -> 'NbTime':
+        """now_fast 用，self 是不传时间生成的模板对象，原始入参本来就是None，只需要替换时间"""
+        nb_time = self.__class__.__new__(self.__class__)
+        state = self.__dict__.copy()
+        state['datetime_obj'] = state['datetime'] = datetime_obj
+        nb_time.__dict__ = state
+        return nb_time
+
+    @classmethod
+    def from_many(cls, datetimexs: typing.Iterable, *,
+                  datetime_formatter: str = None,
+                  time_zone: typing.Union[str, datetime.tzinfo, None] = None) -> 'NbTimeArray':
+        """批量转换，返回 numpy 支持的 NbTimeArray ，时区只解析一次，比循环实例化 NbTime 快很多。需要安装 numpy"""
+        from nb_time.nb_time_array import NbTimeArray
+        return NbTimeArray(datetimexs, datetime_formatter=datetime_formatter or cls.default_formatter,
+                           time_zone=time_zone or cls.default_time_zone)
+
+    @classmethod
+    def parse_many(cls, datetimexs: typing.Iterable, *,
+                   datetime_formatter: str = None,
+                   time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                   errors: str = 'raise',
+                   output: str = 'nb_time') -> typing.Union[list, 'ParseManyResult']:
+        """
+        批量解析，时区和 formatter 只解析一次，失败的元素不抛异常不打日志。
+        :param errors: 'raise' 遇到解析失败抛出 TimeInParamError ；'coerce' 失败的位置是None ；
+                       'collect' 失败的位置是None，返回 (values, failed_indexes)
+        :param output: 'nb_time' 'datetime' 'timestamp' 'epoch_us' ，结果列表和入参一一对应
+        """
+        from nb_time.batch_parse import BatchParser
+        return BatchParser(cls, datetime_formatter, time_zone, output).parse(datetimexs, errors)
+
+    @classmethod
+    def iter_parse_many(cls, datetimexs: typing.Iterable, *,
+                        datetime_formatter: str = None,
+                        time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                        errors: str = 'raise',
+                        output: str = 'nb_time') -> typing.Iterator:
+        """parse_many 的生成器版本，用于流式输入，errors 只支持 'raise' 和 'coerce' """
+        from nb_time.batch_parse import BatchParser
+        return BatchParser(cls, datetime_formatter, time_zone, output).iter_parse(datetimexs, errors)
+
+    @classmethod
+    def range(cls, start, end, step: int = 1, unit: str = 'hours', *,
+              datetime_formatter: str = None,
+              time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+              output: str = 'nb_time',
+              limit: int = None) -> typing.Iterator:
+        """
+        惰性生成 start 到 end (包含 end) 之间每隔 step 个 unit 的时间，和 arrow.Arrow.range 一样包含终点。
+        :param unit: 'seconds' 'minutes' 'hours' 在utc时间戳上累加；'days' 'weeks' 'months' 'years' 按本时区墙上时间计算，夏令时切换日也是对齐的
+        :param output: 'nb_time' 'datetime' 'timestamp' 'epoch_us' 'str'(按 datetime_formatter 格式化)
+        :param limit: 最多生成多少个，end 为None时必须传
+        """
+        from nb_time.time_range import iter_range
+        return iter_range(cls, start, end, step, unit, datetime_formatter=datetime_formatter, time_zone=time_zone,
+                          output=output, limit=limit)
+
+    @classmethod
+    def span_iter(cls, start, end, step: int = 1, unit: str = 'hours', *,
+                  datetime_formatter: str = None,
+                  time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                  output: str = 'nb_time') -> typing.Iterator[tuple]:
+        """惰性生成覆盖 [start, end) 的连续区间 (区间开始, 区间结束)，最后一个区间的结束截断到 end ，参数同 range"""
+        from nb_time.time_range import iter_span
+        return iter_span(cls, start, end, step, unit, datetime_formatter=datetime_formatter, time_zone=time_zone,
+                         output=output)
+
     def get_time_zone_str(self, time_zone: typing.Union[str, datetime.tzinfo, None] = None):
         return time_zone or self.default_time_zone or self.get_localzone_name()
 
     def universal_parse_datetime_str(self, datetime_str):
+        """万能解析，按字符串形状学习格式并缓存结果，见 nb_time.adaptive_parser"""
+        return adaptive_str_parser.parse(datetime_str)
+
+    def _strptime_or_universal_parse(self, datetimex: str) -> datetime.datetime:
+        datetimex_raw = datetimex
+        if '%z' in self.datetime_formatter and ('+' not in datetimex or '-' not in datetimex):
+            datetimex = self.add_timezone_to_time_str(datetimex, self.time_zone_str)
         try:
-            return dateutil.parser.parse(datetime_str)
+            datetime_obj = datetime.datetime.strptime(datetimex, self.datetime_formatter)
         except Exception as e:
-            date_string = datetime_str  # "2013-05-05 12:30:45 America/Chicago"
-            date_parts = date_string.split()
-            parsed_date = dateutil.parser.parse(' '.join(date_parts[:-1]))
-            timezone = dateutil.tz.gettz(date_parts[-1])
-            datetime_obj = parsed_date.replace(tzinfo=timezone)
-            return self._build_nb_time(datetime_obj).datetime_obj
+            # print(e,type(e))
+            # print(f'尝试使用万能时间字符串解析 {datetimex}')
+            adaptive_str_parser.warn_formatter_failed(self.datetime_formatter, datetimex, e)
+            # 用原始字符串解析，不带时区的由 build_datetime_obj 按本对象时区 localize ，夏令时也是对的。
+            datetime_obj = self.universal_parse_datetime_str(datetimex_raw)
+        return datetime_obj
 
     def build_datetime_obj(self, datetimex):
         if datetimex is None:
             # print(self.time_zone_obj,type(self.time_zone_obj))
-            datetime_obj = datetime.datetime.now(tz=self.time_zone_obj)
+            if clock.is_system_clock():
+                datetime_obj = datetime.datetime.now(tz=self.time_zone_obj)
+            else:
+                datetime_obj = epoch_us_to_datetime(clock.now_us(), self.time_zone_obj)  # 设置了别的时钟，例如测试用的假时钟
         elif isinstance(datetimex, str):
             # print(self.datetime_formatter)
-            if '%z' in self.datetime_formatter and ('+' not in datetimex or '-' not in datetimex):
-                datetimex = self.add_timezone_to_time_str(datetimex, self.time_zone_str)
-            try:
-                datetime_obj = datetime.datetime.strptime(datetimex, self.datetime_formatter)
-            except Exception as e:
-                # print(e,type(e))
-                # print(f'尝试使用万能时间字符串解析 {datetimex}')
-                logger.warning(f'warning! formatter: {self.datetime_formatter} cannot parse time str: {datetimex}  , {type(e)} , {e}  , will try use  Universal time string parsing')
-                datetime_obj = self.universal_parse_datetime_str(datetimex)
+            datetime_obj = None
+            compiled_str_parser = get_compiled_str_parser(self.datetime_formatter)
+            if compiled_str_parser is not None:
+                datetime_obj = compiled_str_parser.parse(datetimex)  # 预编译的快速解析，匹配不上再走 strptime
+            if datetime_obj is None:
+                datetime_obj = self._strptime_or_universal_parse(datetimex)
             # print(repr(datetime_obj))
             if datetime_obj.tzinfo is None:
-                if isinstance(self.time_zone_obj, pytz.BaseTzInfo):
+                if hasattr(self.time_zone_obj, 'localize'):  # pytz 的时区
                     datetime_obj = self.time_zone_obj.localize(datetime_obj, )
                 else:
                     datetime_obj = datetime_obj.replace(tzinfo=self.time_zone_obj, )
@@ -189,28 +385,34 @@ class NbTime:
             #     datetime_obj = datetime_obj.replace(tzinfo=self.time_zone_obj, )
             # print(repr(datetime_obj))
         elif isinstance(datetimex, (int, float)):
-            if datetimex < 1:
-                datetimex += 86400
-            if datetimex >= 10 ** 12:
-                # raise TimeInParamError(
-                #     f'Invalid datetime param: {datetimex}. need seconds,not microseconds')  # 需要传入秒，而不是毫秒
-                datetimex = datetimex / 1000.0
+            datetimex = self.normalize_timestamp(datetimex)
             datetime_obj = datetime.datetime.fromtimestamp(datetimex, tz=self.time_zone_obj)  # 时间戳0在windows会出错。
         elif isinstance(datetimex, datetime.datetime):
             datetime_obj = datetimex
             datetime_obj = datetime_obj.astimezone(tz=self.time_zone_obj)
         elif isinstance(datetimex, DateTimeValue):
             datetime_obj = datetime.datetime(**datetimex.dict(), tzinfo=self.time_zone_obj)
-        elif isinstance(datetimex, NbTime):
+        elif isinstance(datetimex, (NbTime, NbTimeLite)):
             datetime_obj = datetimex.datetime_obj
             datetime_obj = datetime_obj.astimezone(tz=self.time_zone_obj)
-        elif isinstance(datetimex, arrow.Arrow):
+        elif 'arrow' in sys.modules and isinstance(datetimex, sys.modules['arrow'].Arrow):  # 没有导入过 arrow 就不可能是 Arrow
             datetime_obj = datetimex.datetime
             datetime_obj = datetime_obj.astimezone(tz=self.time_zone_obj)
         else:
             raise ValueError('input parameters is not right')
         return datetime_obj
 
+    @staticmethod
+    def normalize_timestamp(timestamp: typing.Union[int, float]) -> typing.Union[int, float]:
+        """数字入参统一转成秒时间戳，大于等于 10**12 的是13位的毫秒时间戳"""
+        if timestamp < 1:
+            timestamp += 86400
+        if timestamp >= 10 ** 12:
+            # raise TimeInParamError(
+            #     f'Invalid datetime param: {timestamp}. need seconds,not microseconds')  # 需要传入秒，而不是毫秒
+            timestamp = timestamp / 1000.0
+        return timestamp
+
     @classmethod
     def add_timezone_to_time_str(cls, datetimex: str, time_zone: str):
         offset = cls.get_timezone_offset(time_zone)
@@ -237,14 +439,12 @@ class NbTime:
 
     @classmethod
     def get_timezone_offset(cls, time_zone: str) -> datetime.timedelta:
-        tz = cls.build_pytz_timezone(time_zone)
-        # 将时区转换为以Etc/GMT+形式表示的时区
-        offset = tz.utcoffset(datetime.datetime.now())
-        return offset
+        """时区当前的utc偏移，有夏令时的时区按15分钟缓存"""
+        return time_zone_registry.get_utcoffset(cls.build_pytz_timezone(time_zone))
 
     @staticmethod
     def _utc_to_etc(timezone_str: str):
-        """把UTC+8或UTC+08:00 转化成pytz可以识别的Etc/GMT-8的时区格式"""
+        """把UTC+8或UTC+08:00 转化成pytz可以识别的Etc/GMT-8的时区格式，Etc/GMT 只有整点，UTC+05:30 这种原样返回"""
         offset_match = re.match(r"UTC([+-]?)(\d{1,2}):?(\d{0,2})", timezone_str)
         if not offset_match:
             return timezone_str
@@ -252,6 +452,8 @@ class NbTime:
         sign = offset_match.group(1)
         hours = offset_match.group(2)
         minutes = offset_match.group(3)
+        if minutes and int(minutes):
+            return timezone_str
 
         if sign == "+":
             sign = "-"
@@ -266,46 +468,16 @@ class NbTime:
     def build_pytz_timezone(cls, time_zone: typing.Union[str, datetime.tzinfo]) -> datetime.tzinfo:
         """pytz 不支持 GTM+8  UTC+7 这种时区表示方式
         Etc/GMT-8 就是 GMT+8 代表东8区。
+        解析和缓存由 time_zone_registry 负责，UTC+8 UTC+08:00 +0800 Etc/GMT-8 这些别名得到的是同一个时区对象，
+        固定偏移的都是 datetime.timezone ，UTC+05:30 这种非整点的也是准确的。
+        以前支持的宽松写法 UTC8 UTC 8 (没有符号当作东区) UTC+8:5 (一位数的分钟) 也可以。
+        time_zone_str__obj_map 里面可以手动注册自定义的时区，优先级最高。
         """
-        # print(time_zone,type(time_zone))
-        time_zone0 = time_zone
-        if time_zone0 in cls.time_zone_str__obj_map:
-            # print('zhijie')
-            return cls.time_zone_str__obj_map[time_zone0]
-
-        if isinstance(time_zone, datetime.tzinfo):
-            return time_zone
-
-        # 常见时区字符串转化为内置的timezone类型，比pytz性能高很多。
-        if time_zone in (cls.TIMEZONE_ASIA_SHANGHAI, cls.TIMEZONE_E8, cls.TIMEZONE_EASTERN_8):
-            # print('aaaa')
-            return cls.TIMEZONE_TZ_EAST_8
-        if time_zone in (cls.TIMEZONE_UTC, 'UTC+0'):
-            return cls.TIMEZONE_TZ_UTC
-
-        if 'Etc/GMT' in time_zone:
-            return pytz.timezone(time_zone)
-        # print(time_zone,type(time_zone))
-        time_zone = cls._utc_to_etc(time_zone)
-        # print(time_zone)
-        # pytz_timezone_xialinshi = pytz.timezone(time_zone)
-        pytz_timezone = pytz.timezone(time_zone, )
-
-        # print(pytz_timezone)
-        # # UTC 负时区对应的 pytz 可以识别的时区
-        # burden_timezone = 'Etc/GMT+'
-        # # UTC 正时区对应的 pytz 可以识别的时区
-        # just_timezone = 'Etc/GMT-'
-        # # 截取 UTC 时区差值,eg:zone_code=UTC+5,count=5
-        # count = time_zone[-1]
-        # if '-' in time_zone:  # 就是这样没有反。
-        #     pytz_timezone = pytz.timezone(burden_timezone + count)
-        # elif '+' in time_zone:
-        #     pytz_timezone = pytz.timezone(just_timezone + count)
-        # else:
-        #     pytz_timezone = pytz.timezone(time_zone)
-        cls.time_zone_str__obj_map[time_zone0] = pytz_timezone
-        return pytz_timezone
+        if cls.time_zone_str__obj_map:
+            tz = cls.time_zone_str__obj_map.get(time_zone)
+            if tz is not None:
+                return tz
+        return time_zone_registry.get_time_zone(time_zone)
 
     @property
     def datetime_str(self) -> str:
@@ -313,15 +485,19 @@ class NbTime:
 
     @property
     def time_str(self) -> str:
-        return self.datetime_obj.strftime(self.FORMATTER_TIME)
+        return self.get_str(self.FORMATTER_TIME)
 
     @property
     def date_str(self) -> str:
-        return self.datetime_obj.strftime(self.FORMATTER_DATE)
+        return self.get_str(self.FORMATTER_DATE)
 
     def get_str(self, formatter=None):
         # print(self.datetime_formatter)
-        return self.datetime_obj.strftime(formatter or self.datetime_formatter)
+        formatter = formatter or self.datetime_formatter
+        compiled_str_formatter = get_compiled_str_formatter(formatter)
+        if compiled_str_formatter is None:  # 有 %b %a 这种和 locale 相关的指令
+            return self.datetime_obj.strftime(formatter)
+        return compiled_str_formatter.format(self.datetime_obj)
 
     def fast_get_str_formatter_datetime_no_zone(self):
         return f'{self.datetime_obj.year:04d}-{self.datetime_obj.month:02d}-{self.datetime_obj.day:02d} {self.datetime_obj.hour:02d}:{self.datetime_obj.minute:02d}:{self.datetime_obj.second:02d}'
@@ -335,16 +511,80 @@ class NbTime:
         return self.datetime_obj.timestamp() * 1000
 
     def is_greater_than_now(self) -> bool:
-        return self.timestamp > time.time()
-
-    def __lt__(self, other: 'NbTime'):
-        return self.timestamp < other.timestamp
-
-    def __gt__(self, other: 'NbTime'):
-        return self.timestamp > other.timestamp
+        return self.epoch_us > clock.now_us()
 
-    def __eq__(self, other: 'NbTime'):
-        return self.timestamp == other.timestamp
+    @property
+    def epoch_us(self) -> int:
+        """utc 微秒整数时间戳，第一次访问时计算并缓存，比较和hash都用它，没有浮点误差。
+        大量排序时 sorted(nb_times, key=operator.attrgetter('epoch_us')) 比直接 sorted(nb_times) 快10倍以上。"""
+        if getattr(self, '_epoch_us', None) is None:
+            self._epoch_us = datetime_to_epoch_us(self.datetime_obj)
+        return self._epoch_us
+
+    def _get_compare_key(self, other) -> typing.Union[int, float]:
+        """other 可以是 NbTime NbTimeLite datetime 或者时间戳数字(规则和构造函数一样，大于等于10**12的当作毫秒)"""
+        if isinstance(other, (NbTime, NbTimeLite)):
+            return other.epoch_us
+        if isinstance(other, datetime.datetime):
+            if other.tzinfo is None:  # naive datetime 和构造函数的处理方式一样
+                return self._build_nb_time(other).epoch_us
+            return datetime_to_epoch_us(other)
+        if isinstance(other, (int, float)) and not isinstance(other, bool):
+            return other * 1000 if other >= 10 ** 12 else other * 1000000
+        return NotImplemented
+
+    def __lt__(self, other: typing.Union['NbTime', datetime.datetime, int, float]):
+        if isinstance(other, NbTime):  # 排序时绝大部分是这种情况，走最短路径
+            return self.epoch_us < other.epoch_us
+        other_key = self._get_compare_key(other)
+        if other_key is NotImplemented:
+            return NotImplemented
+        return self.epoch_us < other_key
+
+    def __le__(self, other: typing.Union['NbTime', datetime.datetime, int, float]):
+        if isinstance(other, NbTime):
+            return self.epoch_us <= other.epoch_us
+        other_key = self._get_compare_key(other)
+        if other_key is NotImplemented:
+            return NotImplemented
+        return self.epoch_us <= other_key
+
+    def __gt__(self, other: typing.Union['NbTime', datetime.datetime, int, float]):
+        if isinstance(other, NbTime):
+            return self.epoch_us > other.epoch_us
+        other_key = self._get_compare_key(other)
+        if other_key is NotImplemented:
+            return NotImplemented
+        return self.epoch_us > other_key
+
+    def __ge__(self, other: typing.Union['NbTime', datetime.datetime, int, float]):
+        if isinstance(other, NbTime):
+            return self.epoch_us >= other.epoch_us
+        other_key = self._get_compare_key(other)
+        if other_key is NotImplemented:
+            return NotImplemented
+        return self.epoch_us >= other_key
+
+    def __eq__(self, other: typing.Union['NbTime', datetime.datetime, int, float]):
+        if isinstance(other, NbTime):
+            return self.epoch_us == other.epoch_us
+        other_key = self._get_compare_key(other)
+        if other_key is NotImplemented:
+            return NotImplemented
+        return self.epoch_us == other_key
+
+    def __ne__(self, other: typing.Union['NbTime', datetime.datetime, int, float]):
+        if isinstance(other, NbTime):
+            return self.epoch_us != other.epoch_us
+        other_key = self._get_compare_key(other)
+        if other_key is NotImplemented:
+            return NotImplemented
+        return self.epoch_us != other_key
+
+    def __hash__(self):
+        """同一时刻不同时区的对象 hash 相同，可以放进 set dict 里面去重。
+        注意和数字 datetime 比较相等时 hash 不一定相同，set dict 里面不要混放。"""
+        return hash(self.epoch_us)
 
     def __str__(self) -> str:
         return f'<NbTime [{self.datetime_str}] ({self.time_zone_str})>'
@@ -352,18 +592,28 @@ class NbTime:
     def __repr__(self) -> str:
         return f'<NbTime [{self.datetime_str}] ({self.time_zone_str})>'
 
-    def humanize(self)->str:
-        return self.arrow.humanize()
+    def humanize(self, reference=None, locale: str = 'en_us') -> str:
+        """和 arrow 的 humanize 一样，例如 'an hour ago' ，不需要转换成 arrow 对象。reference 默认是现在"""
+        from nb_time.arrow_interop import humanize_many
+        return humanize_many([self], reference=reference, locale=locale)[0]
 
-    def to_arrow(self)->ArrowWrap:
+    @classmethod
+    def humanize_many(cls, nb_times: typing.Iterable, reference=None, locale: str = 'en_us',
+                      granularity: typing.Union[str, typing.List[str]] = 'auto',
+                      only_distance: bool = False) -> typing.List[str]:
+        """批量 humanize ，参考时间只取一次，locale 只创建一次，参数见 nb_time.arrow_interop.humanize_many"""
+        from nb_time.arrow_interop import humanize_many
+        return humanize_many(nb_times, reference=reference, locale=locale, granularity=granularity,
+                             only_distance=only_distance)
+
+    def to_arrow(self) -> 'ArrowWrap':
         # return arrow.get(self.datetime_obj)
-        return ArrowWrap(year=self.datetime_obj.year, month=self.datetime_obj.month, day=self.datetime_obj.day,
-                         hour=self.datetime_obj.hour,minute=self.datetime_obj.minute,second=self.datetime_obj.second,
-                         microsecond=self.datetime_obj.microsecond,
-                         tzinfo=self.time_zone_str)
+        # 复用 time_zone_obj ，不再用 time_zone_str 让 arrow 重新解析时区，UTC+8 这种 arrow 解析不了
+        from nb_time.arrow_interop import to_arrow
+        return to_arrow(self.datetime_obj)
 
     @property
-    def arrow(self) -> ArrowWrap:
+    def arrow(self) -> 'ArrowWrap':
         if getattr(self, '_arrow_obj', None) is None:
             self._arrow_obj = self.to_arrow()
         return self._arrow_obj
@@ -384,24 +634,74 @@ class NbTime:
     def __copy__(self):
         return self.clone()
 
-    
+
     # def __getstate__(self):
     #     # 自定义序列化时保存的状态
     #     state = self._raw_in_params
     #     return state
-    
+
     # def __setstate__(self, state):
     #     new_self = self.__class__(**state)
     #     self.__dict__.update(new_self.__dict__)
-    
+
+    def __reduce__(self):
+        """pickle 只保存 (类, utc微秒时间戳, 时区key, formatter id)，不保存 __dict__ 里面的入参 pytz对象 arrow对象"""
+        return _restore_nb_time, (self.__class__, self.epoch_us, self.time_zone_str,
+                                  serialization.dump_formatter(self.datetime_formatter))
+
+    @classmethod
+    def _from_serialized(cls, epoch_us: int, time_zone_str: typing.Union[str, datetime.tzinfo],
+                         datetime_formatter: str) -> 'NbTime':
+        """反序列化，不走 __init__ ，不解析字符串"""
+        time_zone_obj = cls.build_pytz_timezone(time_zone_str)
+        datetime_obj = epoch_us_to_datetime(epoch_us, time_zone_obj)
+        nb_time = cls.__new__(cls)
+        nb_time.__dict__ = {
+            '_raw_in_params': {'datetimex': datetime_obj, 'datetime_formatter': datetime_formatter,
+                               'time_zone': time_zone_str},
+            'init_params': {'datetime_formatter': datetime_formatter, 'time_zone': time_zone_str},
+            'first_param': datetime_obj,
+            'time_zone_str': time_zone_str,
+            'datetime_formatter': datetime_formatter,
+            'time_zone_obj': time_zone_obj,
+            'datetime_obj': datetime_obj,
+            'datetime': datetime_obj,
+            '_epoch_us': epoch_us,
+        }
+        return nb_time
+
+    def to_bytes(self) -> bytes:
+        """固定16字节的二进制格式，格式见 nb_time.serialization 。
+        formatter 和命名时区要在内置表里面或者已经注册过，整分钟的固定偏移时区都支持"""
+        return serialization.pack(self.epoch_us, self.time_zone_str, self.datetime_formatter)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'NbTime':
+        return cls._from_serialized(*serialization.unpack(data))
+
     def shift(self, years=0, months=0, days=0, leapdays=0, weeks=0,
               hours=0, minutes=0, seconds=0, microseconds=0, ) -> 'NbTime':
-        relativedeltax = relativedelta(years=years, months=months, days=days, leapdays=leapdays, weeks=weeks,
-                                       hours=hours, minutes=minutes, seconds=seconds,
-                                       microseconds=microseconds, )
-        new_date = self.datetime_obj + relativedeltax
-        # seconds_delta = seconds + minutes * 60 + hours * 3600 + days * 86400 + weeks * 86400 * 7
-        return self._build_nb_time(new_date, )
+        """
+        年 月 leapdays 和日历相关，用 relativedelta 按墙上时间计算；
+        周 天 时 分 秒 是固定长度，直接在utc时间上加 timedelta ，跨夏令时也是准确的绝对时间差。
+        结果直接包装成新对象，不会重新走 __init__ 的时区解析和 build_datetime_obj 。
+        """
+        datetime_obj = self.datetime_obj
+        if years or months or leapdays:
+            from dateutil.relativedelta import relativedelta
+            delta = relativedelta(years=years, months=months, leapdays=leapdays)
+            if hasattr(self.time_zone_obj, 'localize'):  # pytz 的时区，直接加会保留原来的偏移，跨夏令时墙上时间差1小时
+                datetime_obj = self.time_zone_obj.localize(datetime_obj.replace(tzinfo=None) + delta)
+            else:
+                datetime_obj = datetime_obj + delta
+        if weeks or days or hours or minutes or seconds or microseconds:
+            timedeltax = datetime.timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds,
+                                            microseconds=microseconds)
+            if isinstance(self.time_zone_obj, datetime.timezone):  # 固定偏移，墙上时间加减就是绝对时间加减
+                return self._build_nb_time_from_datetime_obj(datetime_obj + timedeltax)
+            datetime_obj = datetime_obj.astimezone(datetime.timezone.utc) + timedeltax
+        # utc 时间加减以后 astimezone 重新计算目标时刻的夏令时偏移
+        return self._build_nb_time_from_datetime_obj(datetime_obj.astimezone(self.time_zone_obj))
 
     def replace(self, year=None,
                 month=None,
@@ -411,7 +711,7 @@ class NbTime:
                 second=None,
                 microsecond=None,
                 ):
-        kw = copy.copy(locals())
+        kw = dict(locals())
         kw.pop('self')
         kw_new = {}
         for k, v in kw.items():
@@ -421,7 +721,7 @@ class NbTime:
         return self._build_nb_time(datetime_new)
 
     def to_tz(self, time_zone: str) -> 'NbTime':
-        init_params = copy.copy(self.init_params)
+        init_params = dict(self.init_params)
         init_params['time_zone'] = time_zone
         return self.__class__(self.timestamp, **init_params)
 
@@ -433,22 +733,17 @@ class NbTime:
 
     @property
     def today_zero(self) -> 'NbTime':
-        now = datetime.datetime.now(tz=self.time_zone_obj)
-        today_zero_datetime = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        return self._build_nb_time(today_zero_datetime, )
+        # 每个时区缓存今天的 [0点, 明天0点)，时钟跨过0点才重新计算，夏令时切换的那天也是准确的0点
+        today_start_us = bucketing.get_today_bounds_us(self.time_zone_obj, clock.now_us())[0]
+        return self._build_nb_time_from_epoch_us(today_start_us)
 
     @property
     def today_zero_timestamp(self) -> float:
         # zero_ts = time.mktime(datetime.date.today().timetuple())
         # return zero_ts
 
-        # # 获取当天零点时间
-        # today_start = self.time_zone_obj.localize(datetime.datetime(now.year, now.month, now.day, 0, 0, 0))
-        # # today_start =datetime.datetime(now.year, now.month, now.day, 0, 0, 0,tzinfo=self.time_zone_obj)
-        # # 将当天零点时间转换为时间戳
-        # timestamp = int(today_start.timestamp())
-
-        return self.today_zero.timestamp
+        # 不生成 NbTime 对象，直接用缓存的今天0点
+        return bucketing.get_today_bounds_us(self.time_zone_obj, clock.now_us())[0] / 1000000
 
     @property
     def same_day_zero(self) -> 'NbTime':
@@ -456,9 +751,79 @@ class NbTime:
         获取时间对象对应的当天的该对象时区的0点的 NbTime对象
         :return:
         """
+        # 固定偏移的时区是整数运算，有夏令时的时区按墙上时间取整，不会保留原来的偏移导致差1小时
+        return self._build_nb_time_from_epoch_us(
+            bucketing.bucket_epoch_us(self.epoch_us, bucketing.US_PER_DAY, self.time_zone_obj))
 
-        same_day_zero_datetime = self.datetime_obj.replace(hour=0, minute=0, second=0, microsecond=0)
-        return self._build_nb_time(same_day_zero_datetime, )
+    @classmethod
+    def _get_day_helper_params(cls, datetimex, time_zone) -> typing.Tuple[int, datetime.tzinfo]:
+        tz = cls.build_pytz_timezone(time_zone or cls.default_time_zone or NbTime.default_time_zone or
+                                     cls.get_localzone_name())
+        if datetimex is None:
+            return clock.now_us(), tz
+        if isinstance(datetimex, (int, float)):  # 秒和毫秒的判断规则和构造函数一样
+            return int(round(cls.normalize_timestamp(datetimex) * 1000000)), tz
+        if isinstance(datetimex, datetime.datetime) and datetimex.tzinfo is not None:
+            return datetime_to_epoch_us(datetimex), tz
+        if isinstance(datetimex, (NbTime, NbTimeLite)):
+            return datetimex.epoch_us, tz
+        return cls(datetimex, time_zone=tz).epoch_us, tz
+
+    @classmethod
+    def day_start_ts(cls, datetimex=None, time_zone: typing.Union[str, datetime.tzinfo, None] = None) -> int:
+        """
+        datetimex(默认现在) 在 time_zone 时区所在那一天0点的整数秒时间戳，不生成 NbTime 对象。
+        datetimex 可以是秒或毫秒时间戳 带时区的datetime NbTime ，其他的按 NbTime 的规则解析。
+        """
+        epoch_us, tz = cls._get_day_helper_params(datetimex, time_zone)
+        if datetimex is None:
+            return bucketing.get_today_bounds_us(tz, epoch_us)[0] // 1000000
+        return bucketing.get_day_bounds_us(epoch_us, tz)[0] // 1000000
+
+    @classmethod
+    def day_end_ts(cls, datetimex=None, time_zone: typing.Union[str, datetime.tzinfo, None] = None) -> int:
+        """所在那一天的结束时间戳，也就是第二天0点，当天是 [day_start_ts, day_end_ts) 。入参和返回值同 day_start_ts"""
+        epoch_us, tz = cls._get_day_helper_params(datetimex, time_zone)
+        if datetimex is None:
+            return bucketing.get_today_bounds_us(tz, epoch_us)[1] // 1000000
+        return bucketing.get_day_bounds_us(epoch_us, tz)[1] // 1000000
+
+    @classmethod
+    def is_same_day(cls, datetimex_a, datetimex_b=None,
+                    time_zone: typing.Union[str, datetime.tzinfo, None] = None) -> bool:
+        """
+        两个时间在 time_zone 时区是不是同一天，datetimex_b 默认是现在，也就是判断 datetimex_a 是不是今天。
+        例如 NbTime.is_same_day(last_request_ts, time_zone='UTC+8') ，不生成 NbTime 对象。
+        """
+        epoch_us_a, tz = cls._get_day_helper_params(datetimex_a, time_zone)
+        if datetimex_b is None:
+            start_us, end_us = bucketing.get_today_bounds_us(tz, clock.now_us())
+            return start_us <= epoch_us_a < end_us
+        epoch_us_b = cls._get_day_helper_params(datetimex_b, tz)[0]
+        return bucketing.is_same_day_us(epoch_us_a, epoch_us_b, tz)
+
+    def _build_nb_time_from_epoch_us(self, epoch_us: int) -> 'NbTime':
+        return self._build_nb_time_from_datetime_obj(epoch_us_to_datetime(epoch_us, self.time_zone_obj))
+
+    def floor(self, unit: str) -> 'NbTime':
+        """
+        本时区所在的 second minute hour day week month quarter year 的开始时刻，和 arrow 的 floor 一样，week 从周一开始。
+        直接在 utc 微秒时间戳上计算，不转换成 arrow 。
+        """
+        return self._build_nb_time_from_epoch_us(bucketing.floor_epoch_us(self.epoch_us, unit, self.time_zone_obj))
+
+    def ceil(self, unit: str) -> 'NbTime':
+        """所在区间的最后一微秒，和 arrow 的 ceil 一样，例如 NbTime().ceil('day') 是 23:59:59.999999"""
+        return self._build_nb_time_from_epoch_us(bucketing.ceil_epoch_us(self.epoch_us, unit, self.time_zone_obj))
+
+    def bucket(self, interval: typing.Union[str, int, float, datetime.timedelta]) -> 'NbTime':
+        """
+        所在时间窗口的开始时刻，窗口按本时区的0点对齐，用于按 5分钟 15分钟 1小时 这样的窗口聚合。
+        :param interval: '30s' '15min' '1h' '1d' 或者 timedelta ，数字是秒数
+        批量分桶用 nb_time.bucketing.bucket_many 或者 NbTimeArray.bucket 。
+        """
+        interval_us = bucketing.parse_interval_us(interval)
+        return self._build_nb_time_from_epoch_us(bucketing.bucket_epoch_us(self.epoch_us, interval_us, self.time_zone_obj))
 
     @staticmethod
     def seconds_to_hour_minute_second(seconds):
@@ -508,47 +873,258 @@ class ShanghaiNbTime(NbTime):
     default_formatter = NbTime.FORMATTER_DATETIME_NO_ZONE
 
 
+class NbTimeConfig:
+    """ NbTimeLite 共享的时区和 formatter 配置。
+
+    同样的 (datetime_formatter, time_zone_str) 全局只有一个实例，几千万个 NbTimeLite 对象只各自保存一个引用。
+    """
+    __slots__ = ('datetime_formatter', 'time_zone_str', 'time_zone_obj')
+
+    _key__config_map: typing.Dict[tuple, 'NbTimeConfig'] = {}
+
+    def __init__(self, datetime_formatter: str, time_zone_str: typing.Union[str, datetime.tzinfo]):
+        self.datetime_formatter = datetime_formatter
+        self.time_zone_str = time_zone_str
+        self.time_zone_obj = NbTime.build_pytz_timezone(time_zone_str)
+
+    @classmethod
+    def get(cls, datetime_formatter: str, time_zone_str: typing.Union[str, datetime.tzinfo]) -> 'NbTimeConfig':
+        key = (datetime_formatter, time_zone_str)
+        config = cls._key__config_map.get(key)
+        if config is None:
+            config = cls._key__config_map.setdefault(key, cls(datetime_formatter, time_zone_str))
+        return config
+
+    def __reduce__(self):
+        return self.get, (self.datetime_formatter, self.time_zone_str)
+
+    def __repr__(self) -> str:
+        return f'<NbTimeConfig {self.datetime_formatter!r} ({self.time_zone_str})>'
+
+
+class NbTimeLite:
+    """ 轻量版 NbTime ，用 __slots__ 只保存 datetime 对象和一个共享的 NbTimeConfig 。
+
+    NbTime 每个实例都有一个 __dict__ 存了原始入参 时区 formatter 等8个属性，需要在内存里面保存几千万个时间对象时用这个类。
+    arrow timestamp 和各种字符串都是访问时才计算，不缓存在实例上。方法和 NbTime 一样，支持链式操作。
+
+    没有单独设置 default_formatter default_time_zone 时使用 NbTime 的默认值。
+    """
+    __slots__ = ('datetime_obj', '_config')
+
+    default_formatter: str = None
+    default_time_zone: str = None
+
+    set_default_formatter = NbTime.__dict__['set_default_formatter']
+    set_default_time_zone = NbTime.__dict__['set_default_time_zone']
+
+    def __init__(self,
+                 datetimex: typing.Union[
+                     None, int, float, datetime.datetime, str, NbTime, 'NbTimeLite', DateTimeValue, 'arrow.Arrow'] = None,
+                 *,
+                 datetime_formatter: str = None,
+                 time_zone: typing.Union[str, datetime.tzinfo, None] = None):
+        """参数和 NbTime 一样"""
+        self._config = self._get_config(datetime_formatter, time_zone)
+        self.datetime_obj = self.build_datetime_obj(datetimex)
+
+    @classmethod
+    def _get_config(cls, datetime_formatter: str = None,
+                    time_zone: typing.Union[str, datetime.tzinfo, None] = None) -> NbTimeConfig:
+        datetime_formatter = datetime_formatter or cls.default_formatter or NbTime.default_formatter or NbTime.FORMATTER_ISO
+        time_zone = time_zone or cls.default_time_zone or NbTime.default_time_zone or NbTime.get_localzone_name()
+        return NbTimeConfig.get(datetime_formatter, time_zone)
+
+    @classmethod
+    def _from_datetime_obj(cls, datetime_obj: datetime.datetime, config: NbTimeConfig) -> 'NbTimeLite':
+        """已经是 config 时区的 datetime 直接包装，不走 __init__ """
+        nb_time_lite = cls.__new__(cls)
+        nb_time_lite._config = config
+        nb_time_lite.datetime_obj = datetime_obj
+        return nb_time_lite
+
+    def _build_nb_time_from_datetime_obj(self, datetime_obj: datetime.datetime) -> 'NbTimeLite':
+        return self._from_datetime_obj(datetime_obj, self._config)
+
+    _build_now_nb_time = _build_nb_time_from_datetime_obj
+
+    def _build_nb_time(self, datetimex) -> 'NbTimeLite':
+        if isinstance(datetimex, datetime.datetime) and datetimex.tzinfo is not None:
+            return self._from_datetime_obj(datetimex.astimezone(self._config.time_zone_obj), self._config)
+        return self._from_datetime_obj(self.build_datetime_obj(datetimex), self._config)
+
+    def __reduce__(self):
+        return _restore_nb_time, (self.__class__, self.epoch_us, self._config.time_zone_str,
+                                  serialization.dump_formatter(self._config.datetime_formatter))
+
+    @classmethod
+    def _from_serialized(cls, epoch_us: int, time_zone_str: typing.Union[str, datetime.tzinfo],
+                         datetime_formatter: str) -> 'NbTimeLite':
+        config = NbTimeConfig.get(datetime_formatter, time_zone_str)
+        return cls._from_datetime_obj(epoch_us_to_datetime(epoch_us, config.time_zone_obj), config)
+
+    @property
+    def datetime_formatter(self) -> str:
+        return self._config.datetime_formatter
+
+    @property
+    def time_zone_str(self) -> typing.Union[str, datetime.tzinfo]:
+        return self._config.time_zone_str
+
+    @property
+    def time_zone_obj(self) -> datetime.tzinfo:
+        return self._config.time_zone_obj
+
+    @property
+    def init_params(self) -> dict:
+        return {'datetime_formatter': self._config.datetime_formatter, 'time_zone': self._config.time_zone_str}
+
+    def to_nb_time(self) -> NbTime:
+        return NbTime(self.datetime_obj, **self.init_params)
+
+    def to_tz(self, time_zone: typing.Union[str, datetime.tzinfo]) -> 'NbTimeLite':
+        config = self._get_config(self._config.datetime_formatter, time_zone)
+        return self._from_datetime_obj(self.datetime_obj.astimezone(config.time_zone_obj), config)
+
+    def __str__(self) -> str:
+        return f'<NbTimeLite [{self.datetime_str}] ({self.time_zone_str})>'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    @property
+    def arrow(self) -> 'ArrowWrap':
+        return self.to_arrow()
+
+    @property
+    def epoch_us(self) -> int:
+        """utc 微秒整数时间戳，不缓存，节省内存"""
+        return datetime_to_epoch_us(self.datetime_obj)
+
+    # 下面这些方法只依赖 datetime_obj time_zone_obj datetime_formatter 等属性，直接复用 NbTime 的实现，
+    # 类方法绑定在 NbTime 上，共用 NbTime 的时区缓存。
+    get_localzone_name = NbTime.__dict__['get_localzone_name']
+    set_local_time_zone = NbTime.__dict__['set_local_time_zone']
+    build_pytz_timezone = NbTime.build_pytz_timezone
+    get_timezone_offset = NbTime.get_timezone_offset
+    add_timezone_to_time_str = NbTime.add_timezone_to_time_str
+    _contains_two_or_more_letters = NbTime.__dict__['_contains_two_or_more_letters']
+    seconds_to_hour_minute_second = NbTime.__dict__['seconds_to_hour_minute_second']
+    normalize_timestamp = NbTime.__dict__['normalize_timestamp']
+    build_datetime_obj = NbTime.build_datetime_obj
+    _strptime_or_universal_parse = NbTime._strptime_or_universal_parse
+    universal_parse_datetime_str = NbTime.universal_parse_datetime_str
+    datetime_str = NbTime.datetime_str
+    time_str = NbTime.time_str
+    date_str = NbTime.date_str
+    get_str = NbTime.get_str
+    fast_get_str_formatter_datetime_no_zone = NbTime.fast_get_str_formatter_datetime_no_zone
+    timestamp = NbTime.timestamp
+    timestamp_millisecond = NbTime.timestamp_millisecond
+    is_greater_than_now = NbTime.is_greater_than_now
+    _get_compare_key = NbTime._get_compare_key
+    __lt__ = NbTime.__lt__
+    __le__ = NbTime.__le__
+    __gt__ = NbTime.__gt__
+    __ge__ = NbTime.__ge__
+    __eq__ = NbTime.__eq__
+    __ne__ = NbTime.__ne__
+    __hash__ = NbTime.__hash__
+    humanize = NbTime.humanize
+    humanize_many = NbTime.__dict__['humanize_many']
+    to_arrow = NbTime.to_arrow
+    isoformat = NbTime.isoformat
+    __call__ = NbTime.__call__
+    clone = NbTime.clone
+    __copy__ = NbTime.__copy__
+    shift = NbTime.shift
+    replace = NbTime.replace
+    to_utc = NbTime.to_utc
+    to_utc8 = NbTime.to_utc8
+    today_zero = NbTime.today_zero
+    today_zero_timestamp = NbTime.today_zero_timestamp
+    same_day_zero = NbTime.same_day_zero
+    _get_day_helper_params = NbTime.__dict__['_get_day_helper_params']
+    day_start_ts = NbTime.__dict__['day_start_ts']
+    day_end_ts = NbTime.__dict__['day_end_ts']
+    is_same_day = NbTime.__dict__['is_same_day']
+    now_fast = NbTime.__dict__['now_fast']
+    _build_nb_time_from_epoch_us = NbTime._build_nb_time_from_epoch_us
+    floor = NbTime.floor
+    ceil = NbTime.ceil
+    bucket = NbTime.bucket
+    to_bytes = NbTime.to_bytes
+    from_bytes = NbTime.__dict__['from_bytes']
+
+    # 放在最后定义，避免类体里面的 datetime 名字遮盖 datetime 模块。
+    datetime = property(lambda self: self.datetime_obj)
+
+
+# FORMATTER_* TIMEZONE_* 常量和 NbTime 保持一致
+for _name, _value in list(vars(NbTime).items()):
+    if _name.startswith(('FORMATTER_', 'TIMEZONE_')):
+        setattr(NbTimeLite, _name, _value)
+
+
 class NowTimeStrCache:
     # 生成100万次当前时间字符串%Y-%m-%d %H:%M:%S仅需0.4秒.
-    # 全局变量，用于存储缓存的时间字符串和对应的整秒时间戳
-    _cached_time_str: typing.Optional[str] = None
-    _cached_time_second: int = 0
-
-    # 为了线程安全，使用锁。在极高并发下，锁的开销远小于每毫秒都进行时间格式化。
-    _time_cache_lock = threading.Lock()
+    # 按 (formatter, 时区) 分别缓存，每个key存的是不可变的 (时间桶, 时间字符串) tuple，
+    # 过期时直接整体替换 dict 里面的 tuple ，不需要加锁，多个线程用不同时区和格式互不影响。
+    _key__state_map: typing.Dict[tuple, typing.Tuple[int, str]] = {}
 
     @classmethod
-    def fast_get_now_time_str(cls, timezone_str: str = None) -> str:
+    def fast_get_now_time_str(cls, timezone_str: typing.Union[str, datetime.tzinfo, None] = None,
+                              formatter: str = NbTime.FORMATTER_DATETIME_NO_ZONE) -> str:
         """
-        获取当前时间字符串，格式为 '%Y-%m-%d %H:%M:%S'。
+        获取当前时间字符串，默认格式为 '%Y-%m-%d %H:%M:%S'。
         通过缓存机制，同一秒内的多次调用直接返回缓存结果，极大提升性能。
-        适用于对时间精度要求不高（秒级即可）的高并发场景。
+        formatter 带 %f 时(例如 NbTime.FORMATTER_MILLISECOND)按毫秒缓存，%f 的后三位是0。
+        适用于对时间精度要求不高（秒级/毫秒级即可）的高并发场景。
+        :param timezone_str: 时区，和 NbTime 的 time_zone 一样，不传则使用 NbTime 的默认时区
+        :param formatter: 时间格式
         :return: 格式化后的时间字符串，例如 '2024-06-12 15:30:45'
         """
-        # timezone_str = timezone_str or FunboostCommonConfig.TIMEZONE
-
-        # 获取当前的整秒时间戳（去掉小数部分）
-        current_second = int(time.time())
-
-        # 如果缓存的时间戳与当前秒数一致，直接返回缓存的字符串。
-        if current_second == cls._cached_time_second:
-            return cls._cached_time_str
+        timezone_str = timezone_str or NbTime.default_time_zone or NbTime.get_localzone_name()
+        key = (formatter, timezone_str)
+        now = clock.now_timestamp()
+        bucket = int(now * 1000) if '%f' in formatter else int(now)
 
-        # 如果不一致，说明进入新的一秒，需要重新计算并更新缓存。
-        # 使用锁确保在多线程环境下，只有一个线程会执行更新操作。
+        # 如果缓存的时间桶与当前一致，直接返回缓存的字符串。
+        state = cls._key__state_map.get(key)
+        if state is not None and state[0] == bucket:
+            return state[1]
 
-        with cls._time_cache_lock:
-            # 双重检查锁定 (Double-Checked Locking)，防止在等待锁的过程中，其他线程已经更新了缓存。
-            if current_second == cls._cached_time_second:
-                return cls._cached_time_str
+        # 进入了新的一秒(或毫秒)，重新计算。多个线程同时过期时各自算出的结果是一样的，谁覆盖谁都没关系。
+        return cls._build_time_str(key, bucket)
 
-            # 重新计算时间字符串。这里直接使用 time.strftime，因为它在秒级更新的场景下性能足够。
-            # 我们不需要像 Funboost 那样为每一毫秒的调用都去做查表优化。
-            now = datetime.datetime.now(tz=pytz.timezone(timezone_str))
-            cls._cached_time_str = now.strftime('%Y-%m-%d %H:%M:%S', )
-            cls._cached_time_second = current_second
+    @classmethod
+    def get_time_str(cls, timestamp: float, timezone_str: typing.Union[str, datetime.tzinfo, None] = None,
+                     formatter: str = NbTime.FORMATTER_DATETIME_NO_ZONE) -> str:
+        """
+        任意时间戳的时间字符串，和 fast_get_now_time_str 共用同一个缓存，只缓存每个 (formatter, 时区) 最近的一个时间桶。
+        日志 record.created 这种基本递增的时间戳命中率很高，nb_time.log_formatter.NbTimeFormatter 用它生成 asctime 。
+        """
+        timezone_str = timezone_str or NbTime.default_time_zone or NbTime.get_localzone_name()
+        key = (formatter, timezone_str)
+        bucket = int(timestamp * 1000) if '%f' in formatter else int(timestamp)
+        state = cls._key__state_map.get(key)
+        if state is not None and state[0] == bucket:
+            return state[1]
+        return cls._build_time_str(key, bucket)
 
-        return cls._cached_time_str
+    @classmethod
+    def _build_time_str(cls, key: tuple, bucket: int) -> str:
+        formatter, timezone_str = key
+        time_zone_obj = NbTime.build_pytz_timezone(timezone_str)
+        bucket_ts = bucket / 1000 if '%f' in formatter else bucket
+        bucket_datetime = datetime.datetime.fromtimestamp(bucket_ts, tz=time_zone_obj)
+        compiled_str_formatter = get_compiled_str_formatter(formatter)
+        if compiled_str_formatter is None:
+            time_str = bucket_datetime.strftime(formatter)
+        else:
+            time_str = compiled_str_formatter.format(bucket_datetime)
+        cls._key__state_map[key] = (bucket, time_str)
+        return time_str
 
 
 
@@ -557,6 +1133,8 @@ class NowTimeStrCache:
 
 if __name__ == '__main__':
     import nb_log
+    import pickle
+    import pytz
 
     """
     1557113661.0
@@ -0,0 +1,199 @@
+"""
+自适应的万能时间字符串解析器，替代每次都直接调用 dateutil.parser.parse 。
+
+formatter 解析失败时 NbTime 会走万能解析，dateutil 比 strptime 慢10到50倍。
+实际的日志和上游数据里面格式虽然杂，但每种格式的字符串 "形状" 是固定的，
+例如 '20230506T010203.886 +08:00' 的形状是 '99999999a999999.999 +99:99' 。
+
+  1. 每种形状第一次出现时用 dateutil 解析，再从常用格式里面找一个解析结果和 dateutil 完全一致的格式，
+     找到了就把这个形状提升为这个格式，以后同形状的字符串直接用预编译解析器或 strptime 解析；
+  2. 最近解析过的原始字符串 -> datetime 放在 lru_cache 里面，重复的字符串不再解析；
+  3. formatter 解析失败的告警按 formatter 限频，不会每条都打日志。
+"""
+import datetime
+import functools
+import logging
+import threading
+import time
+import typing
+
+from nb_time.str_parser import get_compiled_str_parser
+
+logger = logging.getLogger(__name__)
+
+# 按顺序尝试，数字类的格式走预编译解析器，带 %b %p 的走 strptime 。
+# 不包含 %y ，两位数年份 strptime 和 dateutil 的世纪规则不一样；
+# 不包含 %d/%m ，dateutil 对 05/06 是月在前，对 13/06 才是日在前，同一个形状学到 %d/%m 会和 dateutil 结果不一致。
+CANDIDATE_FORMATTERS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S %z',
+    '%Y-%m-%d %H:%M:%S.%f %z',
+    '%Y-%m-%d %H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%Y%m%dT%H%M%S',
+    '%Y%m%dT%H%M%S.%f',
+    '%Y%m%dT%H%M%S %z',
+    '%Y%m%dT%H%M%S.%f %z',
+    '%Y%m%dT%H%M%S%z',
+    '%Y%m%dT%H%M%S.%f%z',
+    '%Y%m%d%H%M%S',
+    '%Y%m%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d %H:%M:%S.%f',
+    '%Y/%m/%d',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y',
+    '%b %d %Y %I:%M%p',
+    '%b %d %Y %I:%M:%S%p',
+    '%b %d %Y %H:%M:%S',
+    '%b %d, %Y %I:%M %p',
+    '%d %b %Y %H:%M:%S',
+    '%a, %d %b %Y %H:%M:%S %z',
+    '%a %b %d %H:%M:%S %Y',
+)
+
+_NO_FORMATTER = ''  # 形状已经试过所有候选格式都不行，直接走 dateutil
+
+
+def get_str_shape(datetime_str: str) -> str:
+    """字符串的形状，数字换成 9 ，字母换成 a ，其他字符原样保留"""
+    return datetime_str.translate(_SHAPE_TABLE)
+
+
+class _ShapeTable(dict):
+    """str.translate 用的映射表，按需计算并缓存每个字符的映射"""
+
+    def __missing__(self, code_point: int) -> int:
+        char = chr(code_point)
+        if char.isdigit():
+            value = ord('9')
+        elif char.isalpha():
+            value = ord('a')
+        else:
+            value = code_point
+        self[code_point] = value
+        return value
+
+
+_SHAPE_TABLE = _ShapeTable()
+
+
+def _build_formatter_parse_func(formatter: str) -> typing.Callable[[str], typing.Optional[datetime.datetime]]:
+    compiled_str_parser = get_compiled_str_parser(formatter)
+    if compiled_str_parser is not None:
+        return compiled_str_parser.parse
+
+    def _strptime(datetime_str: str) -> typing.Optional[datetime.datetime]:
+        try:
+            return datetime.datetime.strptime(datetime_str, formatter)
+        except ValueError:
+            return None
+
+    return _strptime
+
+
+def _is_same_datetime(datetime_obj1: datetime.datetime, datetime_obj2: datetime.datetime) -> bool:
+    if (datetime_obj1.tzinfo is None) != (datetime_obj2.tzinfo is None):
+        return False
+    return (datetime_obj1.replace(tzinfo=None) == datetime_obj2.replace(tzinfo=None)
+            and datetime_obj1.utcoffset() == datetime_obj2.utcoffset())
+
+
+def dateutil_parse(datetime_str: str) -> datetime.datetime:
+    """dateutil 万能解析，结尾是时区名字的(例如 '2013-05-05 12:30:45 America/Chicago')也能解析"""
+    import dateutil.parser  # 导入很慢，第一次遇到新形状的字符串才导入
+    import dateutil.tz
+    try:
+        return dateutil.parser.parse(datetime_str)
+    except Exception:
+        date_parts = datetime_str.split()
+        parsed_date = dateutil.parser.parse(' '.join(date_parts[:-1]))
+        return parsed_date.replace(tzinfo=dateutil.tz.gettz(date_parts[-1]))
+
+
+class AdaptiveStrParser:
+    """ 按字符串形状学习格式的万能解析器，多线程共享是安全的，最坏情况是同一个形状重复学习一次。 """
+
+    def __init__(self, cache_size: int = 8192, max_shapes: int = 1024, warning_interval: float = 10):
+        """
+        :param cache_size: 原始字符串 -> datetime 的 lru 缓存大小
+        :param max_shapes: 最多记住多少种形状，超过了清空重新学习
+        :param warning_interval: 同一个 formatter 的解析失败告警，多少秒内只打印一次
+        """
+        self.max_shapes = max_shapes
+        self.warning_interval = warning_interval
+        self._shape__formatter_map = {}
+        self._formatter__parse_func_map = {}
+        self._formatter__warning_state_map = {}  # formatter -> (上次告警时间, 之后被压制的告警次数)
+        self._warning_lock = threading.Lock()
+        self._parse_cached = functools.lru_cache(maxsize=cache_size)(self._parse_uncached)
+
+    def _get_parse_func(self, formatter: str):
+        parse_func = self._formatter__parse_func_map.get(formatter)
+        if parse_func is None:
+            parse_func = self._formatter__parse_func_map[formatter] = _build_formatter_parse_func(formatter)
+        return parse_func
+
+    def _learn_formatter(self, datetime_str: str, expected: datetime.datetime) -> str:
+        for formatter in CANDIDATE_FORMATTERS:
+            datetime_obj = self._get_parse_func(formatter)(datetime_str)
+            if datetime_obj is not None and _is_same_datetime(datetime_obj, expected):
+                return formatter
+        return _NO_FORMATTER
+
+    def _parse_uncached(self, datetime_str: str, today_ordinal: int) -> datetime.datetime:
+        # today_ordinal 只用来作为缓存 key 的一部分，dateutil 对缺失的年月日用当天补全，跨天以后缓存要失效。
+        shape = get_str_shape(datetime_str)
+        formatter = self._shape__formatter_map.get(shape)
+        if formatter:
+            datetime_obj = self._get_parse_func(formatter)(datetime_str)
+            if datetime_obj is not None:
+                return datetime_obj
+        datetime_obj = dateutil_parse(datetime_str)
+        if formatter is None:
+            if len(self._shape__formatter_map) >= self.max_shapes:
+                self._shape__formatter_map.clear()
+            self._shape__formatter_map[shape] = self._learn_formatter(datetime_str, datetime_obj)
+        return datetime_obj
+
+    def parse(self, datetime_str: str) -> datetime.datetime:
+        """解析任意格式的时间字符串，返回的 datetime 可能是 naive 的，解析不了抛出 dateutil 的异常"""
+        return self._parse_cached(datetime_str, datetime.date.today().toordinal())
+
+    def get_learned_formatter(self, datetime_str: str) -> typing.Optional[str]:
+        """这个字符串的形状学习到的格式，还没学习过或者没有合适的格式返回None"""
+        return self._shape__formatter_map.get(get_str_shape(datetime_str)) or None
+
+    def warn_formatter_failed(self, formatter: str, datetime_str: str, exc: Exception):
+        """formatter 解析失败的告警，同一个 formatter 每 warning_interval 秒最多打印一次，并带上被压制的次数"""
+        now = time.monotonic()
+        with self._warning_lock:
+            last_time, suppressed = self._formatter__warning_state_map.get(formatter, (None, 0))
+            if last_time is not None and now - last_time < self.warning_interval:
+                self._formatter__warning_state_map[formatter] = (last_time, suppressed + 1)
+                return
+            self._formatter__warning_state_map[formatter] = (now, 0)
+        suppressed_msg = f' ({suppressed} similar warnings suppressed)' if suppressed else ''
+        logger.warning(f'warning! formatter: {formatter} cannot parse time str: {datetime_str}  , {type(exc)} , {exc}  , '
+                       f'will try use  Universal time string parsing{suppressed_msg}')
+
+    def cache_clear(self):
+        self._parse_cached.cache_clear()
+        self._shape__formatter_map.clear()
+
+    def cache_info(self) -> dict:
+        return {
+            'str': self._parse_cached.cache_info(),
+            'shapes': len(self._shape__formatter_map),
+            'learned_shapes': sum(1 for formatter in self._shape__formatter_map.values() if formatter),
+        }
+
+
+adaptive_str_parser = AdaptiveStrParser()
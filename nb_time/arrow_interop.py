@@ -0,0 +1,222 @@
+"""
+NbTime 和 arrow 之间的转换。arrow 导入很慢，import nb_time 时不导入这个模块，第一次用到 arrow humanize 时才导入。
+
+to_arrow 复用已经解析好的 time_zone_obj ，不再把时区字符串交给 arrow 重新解析，UTC+8 这种 arrow 不认识的写法也可以转换。
+humanize_many 批量生成 'an hour ago' 这种描述，参考时间只取一次，locale 对象只创建一次，不需要每个时间都转换成 arrow 对象:
+
+    NbTime.humanize_many(nb_times, reference=NbTime())
+"""
+import calendar
+import datetime
+import typing
+
+import arrow
+from arrow import locales
+from arrow import parser as arrow_parser
+
+from nb_time import NbTime, NbTimeLite, clock, datetime_to_epoch_us, epoch_us_to_datetime
+from nb_time.tz_registry import time_zone_registry
+
+
+class ArrowWrap(arrow.Arrow):
+    def to_nb_time(self):
+        return NbTime(self)
+
+
+# 和 arrow.Arrow.humanize 用的阈值一样，arrow 里面是私有属性，这里自己定义，不依赖 arrow 的内部命名
+_SECS_PER_MINUTE = 60
+_SECS_PER_HOUR = 60 * 60
+_SECS_PER_DAY = 60 * 60 * 24
+_SECS_PER_WEEK = 60 * 60 * 24 * 7
+_SECS_PER_MONTH = 60 * 60 * 24 * 30.5
+_SECS_PER_YEAR = 60 * 60 * 24 * 365
+_MONTHS_PER_YEAR = 12
+
+# id(tz) -> (tz, arrow 使用的 tzinfo)。和 nb_time._get_local_epoch 一样用 id 做 key 。
+_tz_id__arrow_tzinfo_map: typing.Dict[int, typing.Tuple[datetime.tzinfo, datetime.tzinfo]] = {}
+
+
+def get_arrow_tzinfo(tz: datetime.tzinfo) -> datetime.tzinfo:
+    """arrow 不直接使用 pytz 的时区对象，会按 zone 名字重新解析一次，这里每个时区对象只解析一次，其他 tzinfo 原样使用"""
+    entry = _tz_id__arrow_tzinfo_map.get(id(tz))
+    if entry is not None and entry[0] is tz:
+        return entry[1]
+    zone = getattr(tz, 'zone', None)
+    arrow_tz = arrow_parser.TzinfoParser.parse(zone) if zone and hasattr(tz, 'localize') else tz
+    if len(_tz_id__arrow_tzinfo_map) < 1024:
+        _tz_id__arrow_tzinfo_map[id(tz)] = (tz, arrow_tz)
+    return arrow_tz
+
+
+def to_arrow(datetime_obj: datetime.datetime, arrow_cls: typing.Type[ArrowWrap] = ArrowWrap) -> ArrowWrap:
+    tz = datetime_obj.tzinfo
+    arrow_tz = get_arrow_tzinfo(tz)
+    if arrow_tz is not tz:
+        # 按 utc 时刻转换，夏令时结束时重复的那个小时由 fold 区分
+        datetime_obj = datetime_obj.astimezone(arrow_tz)
+    return arrow_cls(datetime_obj.year, datetime_obj.month, datetime_obj.day, datetime_obj.hour,
+                     datetime_obj.minute, datetime_obj.second, datetime_obj.microsecond, arrow_tz,
+                     fold=datetime_obj.fold)
+
+
+def _to_epoch_us(reference) -> int:
+    if reference is None:
+        return clock.now_us()
+    if isinstance(reference, (NbTime, NbTimeLite)):
+        return reference.epoch_us
+    if isinstance(reference, arrow.Arrow):
+        return datetime_to_epoch_us(reference.datetime)
+    if isinstance(reference, datetime.datetime) and reference.tzinfo is not None:
+        return datetime_to_epoch_us(reference)
+    if isinstance(reference, (int, float)):
+        return int(round(reference * 1000000))
+    return NbTime(reference).epoch_us
+
+
+def _get_reference_arrow_tzinfo(reference) -> typing.Optional[datetime.tzinfo]:
+    """
+    参考时间按哪个时区的墙上时间计算月份，None 表示按每个时间自己的时区。
+    和 arrow 一样: 参考时间是 Arrow 时用它自己的时区，NbTime 当作 to_arrow() 以后的 Arrow ，
+    None 和 datetime 转换到被描述的时间的时区。
+    """
+    if isinstance(reference, (NbTime, NbTimeLite)):
+        return get_arrow_tzinfo(reference.time_zone_obj)
+    if isinstance(reference, arrow.Arrow):
+        return reference.tzinfo
+    return None
+
+
+def _build_reference_entry(tz: datetime.tzinfo, reference_us: int, reference_arrow_tz: typing.Optional[datetime.tzinfo]):
+    """
+    (tz, 参考时间在 tz 时区的 datetime, 参考时间在 tz 时区的墙上时间)。
+    参考时间在别的时区时后两个是None ，按月计算的交给 arrow 处理；固定偏移的时区墙上时间相减就是绝对时间差，墙上时间也是None 。
+    """
+    if reference_arrow_tz is not None and get_arrow_tzinfo(tz) is not reference_arrow_tz:
+        return tz, None, None
+    reference_datetime = epoch_us_to_datetime(reference_us, tz)
+    if time_zone_registry.get_fixed_utcoffset(tz) is not None:
+        return tz, reference_datetime, None
+    return tz, reference_datetime, reference_datetime.replace(tzinfo=None)
+
+
+def _build_reference_arrow(reference, reference_us: int, tz: datetime.tzinfo) -> arrow.Arrow:
+    """逐个交给 arrow 处理时的参考时间，tz 是被描述的时间的时区"""
+    if isinstance(reference, arrow.Arrow):
+        return reference
+    if isinstance(reference, (NbTime, NbTimeLite)):
+        return to_arrow(reference.datetime_obj)
+    return to_arrow(epoch_us_to_datetime(reference_us, tz))
+
+
+def _add_months(datetime_obj: datetime.datetime, months: int) -> datetime.datetime:
+    year, month_index = divmod(datetime_obj.year * 12 + datetime_obj.month - 1 + months, 12)
+    day = min(datetime_obj.day, calendar.monthrange(year, month_index + 1)[1])
+    return datetime_obj.replace(year=year, month=month_index + 1, day=day)
+
+
+def _get_calendar_months_days(later: datetime.datetime, earlier: datetime.datetime) -> typing.Tuple[int, int]:
+    """和 relativedelta(later, earlier) 的 years*12+months 以及 days 一样，不创建 relativedelta 对象，快很多"""
+    months = (later.year - earlier.year) * 12 + later.month - earlier.month
+    shifted = _add_months(earlier, months)
+    while later < shifted:
+        months -= 1
+        shifted = _add_months(earlier, months)
+    return months, (later - shifted).days
+
+
+def _get_auto_timeframe(nb_time, delta_seconds: int,
+                        reference_datetime: typing.Optional[datetime.datetime]) -> typing.Tuple[str, int]:
+    """返回 (timeframe, delta) ，和 arrow.Arrow.humanize(granularity='auto') 的规则一样"""
+    sign = -1 if delta_seconds < 0 else 1
+    diff = abs(delta_seconds)
+    if diff < 10:
+        return 'now', 0
+    if diff < _SECS_PER_MINUTE:
+        return 'seconds', sign * diff
+    if diff < _SECS_PER_MINUTE * 2:
+        return 'minute', sign
+    if diff < _SECS_PER_HOUR:
+        return 'minutes', sign * max(diff // _SECS_PER_MINUTE, 2)
+    if diff < _SECS_PER_HOUR * 2:
+        return 'hour', sign
+    if diff < _SECS_PER_DAY:
+        return 'hours', sign * max(diff // _SECS_PER_HOUR, 2)
+    if diff < _SECS_PER_DAY * 2:
+        return 'day', sign
+    if diff < _SECS_PER_WEEK:
+        return 'days', sign * max(diff // _SECS_PER_DAY, 2)
+    # arrow 里面两个时间是同一个 tzinfo ，比较和 relativedelta 都是按墙上时间
+    wall = nb_time.datetime_obj.replace(tzinfo=None)
+    reference_wall = reference_datetime.replace(tzinfo=None)
+    if wall < reference_wall:
+        calendar_months, calendar_days = _get_calendar_months_days(reference_wall, wall)
+    else:
+        calendar_months, calendar_days = _get_calendar_months_days(wall, reference_wall)
+    if calendar_days > 14:
+        calendar_months += 1
+    calendar_months = min(calendar_months, _MONTHS_PER_YEAR)
+    if calendar_months >= 1 and diff < _SECS_PER_YEAR:
+        if calendar_months == 1:
+            return 'month', sign
+        return 'months', sign * calendar_months
+    if diff < _SECS_PER_WEEK * 2:
+        return 'week', sign
+    if diff < _SECS_PER_MONTH:
+        return 'weeks', sign * max(diff // _SECS_PER_WEEK, 2)
+    if diff < _SECS_PER_YEAR * 2:
+        return 'year', sign
+    return 'years', sign * max(diff // _SECS_PER_YEAR, 2)
+
+
+def humanize_many(nb_times: typing.Iterable, reference=None, locale: str = 'en_us',
+                  granularity: typing.Union[str, typing.List[str]] = 'auto',
+                  only_distance: bool = False) -> typing.List[str]:
+    """
+    批量 humanize ，结果和逐个调用 nb_time.to_arrow().humanize(参考时间的 arrow 对象) 一样，tests/test_humanize.py 有对比。
+    和 arrow 一样，参考时间和被描述的时间在同一个时区时按墙上时间相减；
+    不在同一个时区、而且相差一周以上需要按月计算时，arrow 按两个时区各自的墙上时间计算月份，这种少见的情况逐个交给 arrow 处理。
+    :param nb_times: NbTime 或 NbTimeLite 序列
+    :param reference: 参考时间，默认是现在(nb_time.clock 的时钟)，可以是 NbTime datetime arrow 时间戳
+    :param locale: 同 arrow ，例如 'zh_cn'
+    :param granularity: 同 arrow ，不是 'auto' 时逐个交给 arrow 处理
+    """
+    reference_us = _to_epoch_us(reference)
+    reference_arrow_tz = _get_reference_arrow_tzinfo(reference)
+    if granularity != 'auto':
+        tz_id__reference_arrow_map = {}
+        out = []
+        for nb_time in nb_times:
+            tz = nb_time.time_zone_obj
+            entry = tz_id__reference_arrow_map.get(id(tz))
+            if entry is None or entry[0] is not tz:
+                entry = tz_id__reference_arrow_map[id(tz)] = (tz, _build_reference_arrow(reference, reference_us, tz))
+            out.append(nb_time.arrow.humanize(entry[1], locale=locale, granularity=granularity,
+                                              only_distance=only_distance))
+        return out
+    locale_obj = locales.get_locale(locale)
+    timeframe__text_map = {}  # 同一个 (timeframe, delta) 的描述只生成一次，例如 '3 months ago'
+    tz_id__reference_map = {}
+    out = []
+    append = out.append
+    for nb_time in nb_times:
+        tz = nb_time.time_zone_obj
+        entry = tz_id__reference_map.get(id(tz))
+        if entry is None or entry[0] is not tz:
+            entry = tz_id__reference_map[id(tz)] = _build_reference_entry(tz, reference_us, reference_arrow_tz)
+        reference_datetime, reference_wall = entry[1], entry[2]
+        if reference_wall is not None:
+            # arrow 里面两个时间是同一个 tzinfo ，相减是按墙上时间，跨夏令时切换时和绝对时间差1小时
+            delta_seconds = int(round((nb_time.datetime_obj.replace(tzinfo=None) - reference_wall).total_seconds()))
+        else:
+            delta_seconds = int(round((nb_time.epoch_us - reference_us) / 1000000))
+        if reference_datetime is None and abs(delta_seconds) >= _SECS_PER_WEEK:
+            append(nb_time.to_arrow().humanize(_build_reference_arrow(reference, reference_us, tz),
+                                               locale=locale, only_distance=only_distance))
+            continue
+        timeframe = _get_auto_timeframe(nb_time, delta_seconds, reference_datetime)
+        text = timeframe__text_map.get(timeframe)
+        if text is None:
+            text = timeframe__text_map[timeframe] = locale_obj.describe(timeframe[0], timeframe[1],
+                                                                        only_distance=only_distance)
+        append(text)
+    return out
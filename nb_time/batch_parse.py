@@ -0,0 +1,149 @@
+"""
+批量解析，NbTime.parse_many / NbTime.iter_parse_many 的实现。
+
+几百万个时间字符串循环 NbTime(s) 加 try/except 时，耗时大部分花在异常、告警日志和每次重复的时区/formatter 解析上。
+这里时区和预编译解析器只解析一次，失败的元素不抛异常不打日志，只记录下标。
+
+    values, failed_indexes = NbTime.parse_many(strs, time_zone='UTC+8', errors='collect', output='timestamp')
+"""
+import datetime
+import typing
+
+from nb_time import NbTime, TimeInParamError, datetime_to_epoch_us
+from nb_time.adaptive_parser import adaptive_str_parser
+from nb_time.str_parser import get_compiled_str_parser
+from nb_time.tz_registry import time_zone_registry
+
+ERRORS_RAISE = 'raise'  # 遇到第一个解析失败的元素抛出 TimeInParamError
+ERRORS_COERCE = 'coerce'  # 解析失败的位置返回None
+ERRORS_COLLECT = 'collect'  # 解析失败的位置返回None，并且返回失败的下标列表
+
+OUTPUT_NB_TIME = 'nb_time'
+OUTPUT_DATETIME = 'datetime'
+OUTPUT_TIMESTAMP = 'timestamp'  # 秒级浮点时间戳
+OUTPUT_EPOCH_US = 'epoch_us'  # utc 微秒整数时间戳
+OUTPUTS = (OUTPUT_NB_TIME, OUTPUT_DATETIME, OUTPUT_TIMESTAMP, OUTPUT_EPOCH_US)
+
+_STR_CACHE_SIZE = 65536
+US_PER_SECOND = 1000000
+_ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+_EPOCH_NAIVE = datetime.datetime(1970, 1, 1)
+
+
+class ParseManyResult(typing.NamedTuple):
+    values: list
+    failed_indexes: typing.List[int]
+
+
+class BatchParser:
+    """ 一组 (nb_time_cls, datetime_formatter, time_zone, output) 对应一个批量解析器 """
+
+    def __init__(self, nb_time_cls: typing.Type[NbTime] = NbTime,
+                 datetime_formatter: str = None,
+                 time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                 output: str = OUTPUT_NB_TIME):
+        if output not in OUTPUTS:
+            raise ValueError(f'output must be one of {OUTPUTS}, got {output!r}')
+        # 模板对象只构造一次，时区和 formatter 的解析规则和单个 NbTime 完全一样。
+        self._template = nb_time_cls(datetime_formatter=datetime_formatter, time_zone=time_zone)
+        self.datetime_formatter = self._template.datetime_formatter
+        self.time_zone_obj = self._template.time_zone_obj
+        self.output = output
+        self._is_pytz = hasattr(self.time_zone_obj, 'localize')  # 和 NbTime.build_datetime_obj 一样判断，不需要导入 pytz
+        self._compiled_str_parser = get_compiled_str_parser(self.datetime_formatter)
+        # 输出时间戳并且是固定偏移的时区时，不带时区的字符串直接整数运算得到时间戳，不需要构造带时区的 datetime
+        self._fixed_offset_us = None
+        if output in (OUTPUT_TIMESTAMP, OUTPUT_EPOCH_US):
+            fixed_offset = time_zone_registry.get_fixed_utcoffset(self.time_zone_obj)
+            if fixed_offset is not None:
+                self._fixed_offset_us = fixed_offset // _ONE_MICROSECOND
+        self._str__value_map = {}  # 相邻的时间字符串经常重复，同一个字符串只解析一次
+
+    def _parse_str_raw(self, datetime_str: str) -> datetime.datetime:
+        """返回的 datetime 可能是 naive 的"""
+        datetime_obj = None
+        if self._compiled_str_parser is not None:
+            datetime_obj = self._compiled_str_parser.parse(datetime_str)
+        else:
+            try:
+                datetime_obj = datetime.datetime.strptime(datetime_str, self.datetime_formatter)
+            except ValueError:
+                pass
+        if datetime_obj is None:
+            datetime_obj = adaptive_str_parser.parse(datetime_str)  # 不打告警日志，解析不了直接抛异常
+        return datetime_obj
+
+    def _localize(self, datetime_obj: datetime.datetime) -> datetime.datetime:
+        if datetime_obj.tzinfo is None:
+            if self._is_pytz:
+                return self.time_zone_obj.localize(datetime_obj)
+            return datetime_obj.replace(tzinfo=self.time_zone_obj)
+        return datetime_obj.astimezone(self.time_zone_obj)
+
+    def _datetime_to_value(self, datetime_obj: datetime.datetime):
+        output = self.output
+        if output == OUTPUT_DATETIME:
+            return datetime_obj
+        if output == OUTPUT_NB_TIME:
+            return self._template._build_nb_time_from_datetime_obj(datetime_obj)
+        epoch_us = datetime_to_epoch_us(datetime_obj)
+        return epoch_us if output == OUTPUT_EPOCH_US else epoch_us / US_PER_SECOND
+
+    def _str_to_value(self, datetime_str: str):
+        datetime_obj = self._parse_str_raw(datetime_str)
+        if self._fixed_offset_us is not None and datetime_obj.tzinfo is None:
+            epoch_us = (datetime_obj - _EPOCH_NAIVE) // _ONE_MICROSECOND - self._fixed_offset_us
+            return epoch_us if self.output == OUTPUT_EPOCH_US else epoch_us / US_PER_SECOND
+        datetime_obj = self._localize(datetime_obj)
+        if self.output == OUTPUT_NB_TIME:
+            return datetime_obj  # NbTime 对象每次单独生成，不在多个位置共享同一个对象
+        return self._datetime_to_value(datetime_obj)
+
+    def convert(self, datetimex):
+        """转换一个元素，规则和 NbTime(datetimex) 一样，失败抛出异常"""
+        if isinstance(datetimex, str):
+            value = self._str__value_map.get(datetimex)
+            if value is None:
+                value = self._str_to_value(datetimex)
+                if len(self._str__value_map) >= _STR_CACHE_SIZE:
+                    self._str__value_map.clear()
+                self._str__value_map[datetimex] = value
+            if self.output == OUTPUT_NB_TIME:
+                return self._template._build_nb_time_from_datetime_obj(value)
+            return value
+        if isinstance(datetimex, datetime.datetime) and datetimex.tzinfo is not None:
+            return self._datetime_to_value(datetimex.astimezone(self.time_zone_obj))
+        return self._datetime_to_value(self._template.build_datetime_obj(datetimex))
+
+    def iter_parse(self, datetimexs: typing.Iterable, errors: str = ERRORS_RAISE) -> typing.Iterator:
+        """流式解析，逐个产出结果，errors 只支持 'raise' 和 'coerce' """
+        if errors not in (ERRORS_RAISE, ERRORS_COERCE):
+            raise ValueError(f"errors must be 'raise' or 'coerce' for streaming parse, got {errors!r}")
+        convert = self.convert
+        for index, datetimex in enumerate(datetimexs):
+            try:
+                yield convert(datetimex)
+            except Exception as e:
+                if errors == ERRORS_RAISE:
+                    raise TimeInParamError(f'cannot parse item {index}: {datetimex!r} , {type(e)} {e}') from e
+                yield None
+
+    def parse(self, datetimexs: typing.Iterable,
+              errors: str = ERRORS_RAISE) -> typing.Union[list, ParseManyResult]:
+        if errors not in (ERRORS_RAISE, ERRORS_COERCE, ERRORS_COLLECT):
+            raise ValueError(f"errors must be 'raise' 'coerce' or 'collect', got {errors!r}")
+        values = []
+        failed_indexes = []
+        append = values.append
+        convert = self.convert
+        for index, datetimex in enumerate(datetimexs):
+            try:
+                append(convert(datetimex))
+            except Exception as e:
+                if errors == ERRORS_RAISE:
+                    raise TimeInParamError(f'cannot parse item {index}: {datetimex!r} , {type(e)} {e}') from e
+                append(None)
+                failed_indexes.append(index)
+        if errors == ERRORS_COLLECT:
+            return ParseManyResult(values, failed_indexes)
+        return values
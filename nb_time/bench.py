@@ -0,0 +1,218 @@
+"""
+NbTime 热点路径的基准测试，升级前后各跑一次对比，提前发现性能退化。
+
+    python -m nb_time.bench                                  # 打印每个用例的 ops/sec 和每次调用新分配的内存
+    python -m nb_time.bench -o before.json                   # 结果写入 json
+    python -m nb_time.bench --baseline before.json           # 和以前的结果对比，有用例变慢超过 --threshold 时退出码是1
+    python -m nb_time.bench --filter get_str --time-zone America/New_York
+
+ops/sec 是多轮里面最快的一轮，内存是 tracemalloc 统计的每次调用之后还存活的新分配字节数和内存块数(也就是返回的对象占用的内存)。
+"""
+import argparse
+import datetime
+import json
+import pickle
+import platform
+import sys
+import timeit
+import tracemalloc
+import typing
+
+import arrow
+
+from nb_time import DateTimeValue, NbTime, NbTimeLite, NowTimeStrCache, time_zone_registry
+
+DEFAULT_TIME_ZONE = 'UTC+8'
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+MEMORY_CALLS = 1000
+
+_FORMATTER_NAMES = ('FORMATTER_DATETIME', 'FORMATTER_DATETIME_NO_ZONE', 'FORMATTER_MILLISECOND', 'FORMATTER_DATE',
+                    'FORMATTER_TIME', 'FORMATTER_ISO')
+
+
+def build_cases(time_zone: str = DEFAULT_TIME_ZONE) -> typing.List[typing.Tuple[str, typing.Callable[[], typing.Any]]]:
+    """返回 [(用例名, 无参函数)]，用例名是 json 结果里面的 key ，不要随便修改，否则没法和以前的结果对比"""
+    ts = 1709192429
+    nb_time = NbTime(ts, time_zone=time_zone)
+    other = NbTime(ts + 1, time_zone=time_zone)
+    datetime_obj = nb_time.datetime_obj
+    date_time_value = DateTimeValue(2024, 2, 29, 15, 40, 29)
+    arrow_obj = nb_time.to_arrow()
+    str_no_zone = nb_time.get_str(NbTime.FORMATTER_DATETIME_NO_ZONE)
+    str_iso = nb_time.get_str(NbTime.FORMATTER_ISO)
+    pickled = pickle.dumps(nb_time)
+    packed = nb_time.to_bytes()
+    nb_time_lite = NbTimeLite(ts, time_zone=time_zone)
+    cases = [
+        ('init/None', lambda: NbTime(time_zone=time_zone)),
+        ('init/int', lambda: NbTime(ts, time_zone=time_zone)),
+        ('init/float', lambda: NbTime(ts + 0.123456, time_zone=time_zone)),
+        ('init/str', lambda: NbTime(str_no_zone, datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE,
+                                    time_zone=time_zone)),
+        ('init/str_iso', lambda: NbTime(str_iso, time_zone=time_zone)),
+        ('init/datetime', lambda: NbTime(datetime_obj, time_zone=time_zone)),
+        ('init/DateTimeValue', lambda: NbTime(date_time_value, time_zone=time_zone)),
+        ('init/NbTime', lambda: NbTime(nb_time, time_zone=time_zone)),
+        ('init/Arrow', lambda: NbTime(arrow_obj, time_zone=time_zone)),
+        ('NbTimeLite/init/int', lambda: NbTimeLite(ts, time_zone=time_zone)),
+        ('now_fast', lambda: NbTime.now_fast(time_zone)),
+    ]
+    for formatter_name in _FORMATTER_NAMES:
+        formatter = getattr(NbTime, formatter_name)
+        cases.append((f'get_str/{formatter_name}', lambda formatter=formatter: nb_time.get_str(formatter)))
+    cases += [
+        ('NbTimeLite/get_str/FORMATTER_DATETIME_NO_ZONE',
+         lambda: nb_time_lite.get_str(NbTime.FORMATTER_DATETIME_NO_ZONE)),
+        ('to_tz/UTC', lambda: nb_time.to_tz('UTC')),
+        ('to_tz/America/New_York', lambda: nb_time.to_tz('America/New_York')),
+        ('shift/hours', lambda: nb_time.shift(hours=1)),
+        ('shift/months', lambda: nb_time.shift(months=1)),
+        ('floor/hour', lambda: nb_time.floor('hour')),
+        ('compare/lt', lambda: nb_time < other),
+        ('compare/eq', lambda: nb_time == other),
+        ('compare/lt_datetime', lambda: nb_time < datetime_obj),
+        ('pickle/dumps', lambda: pickle.dumps(nb_time)),
+        ('pickle/loads', lambda: pickle.loads(pickled)),
+        ('to_bytes', lambda: nb_time.to_bytes()),
+        ('from_bytes', lambda: NbTime.from_bytes(packed)),
+        ('NowTimeStrCache/FORMATTER_DATETIME_NO_ZONE',
+         lambda: NowTimeStrCache.fast_get_now_time_str(time_zone, NbTime.FORMATTER_DATETIME_NO_ZONE)),
+        ('NowTimeStrCache/FORMATTER_MILLISECOND',
+         lambda: NowTimeStrCache.fast_get_now_time_str(time_zone, NbTime.FORMATTER_MILLISECOND)),
+    ]
+    return cases
+
+
+def measure_speed(func: typing.Callable, min_time: float = DEFAULT_MIN_TIME,
+                  repeat: int = DEFAULT_REPEAT) -> float:
+    """返回 ops/sec ，先自动确定每轮的调用次数让每轮至少 min_time 秒，再取 repeat 轮里面最快的一轮"""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed * 10 > min_time else 10
+    best = min([elapsed] + timer.repeat(repeat - 1, number)) if repeat > 1 else elapsed
+    return number / best
+
+
+def measure_memory(func: typing.Callable, calls: int = MEMORY_CALLS) -> typing.Tuple[float, float]:
+    """返回 (每次调用新分配并且存活的字节数, 内存块数)，结果保存在预先分配好的列表里面，不统计列表本身"""
+    func()  # 先调用一次，让各种缓存就绪
+    results = [None] * calls
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for i in range(calls):
+            results[i] = func()
+        after = tracemalloc.take_snapshot()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    trace_filter = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    stats = after.filter_traces(trace_filter).compare_to(before.filter_traces(trace_filter), 'filename')
+    del results
+    return (sum(stat.size_diff for stat in stats) / calls,
+            sum(stat.count_diff for stat in stats) / calls)
+
+
+def run(time_zone: str = DEFAULT_TIME_ZONE, name_filter: str = None, min_time: float = DEFAULT_MIN_TIME,
+        repeat: int = DEFAULT_REPEAT, memory: bool = True, print_progress: bool = True) -> dict:
+    results = {}
+    for name, func in build_cases(time_zone):
+        if name_filter and name_filter not in name:
+            continue
+        ops_per_sec = measure_speed(func, min_time, repeat)
+        result = {'ops_per_sec': round(ops_per_sec, 1), 'ns_per_op': round(1e9 / ops_per_sec, 1)}
+        if memory:
+            bytes_per_op, blocks_per_op = measure_memory(func)
+            result['bytes_per_op'] = round(bytes_per_op, 1)
+            result['blocks_per_op'] = round(blocks_per_op, 2)
+        results[name] = result
+        if print_progress:
+            print(format_result_line(name, result), flush=True)
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time_zone': time_zone,
+            'tz_backend': time_zone_registry.backend,
+            'arrow': arrow.__version__,
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+
+def format_result_line(name: str, result: dict) -> str:
+    line = f'{name:48} {result["ops_per_sec"]:>14,.0f} ops/sec {result["ns_per_op"]:>12,.1f} ns/op'
+    if 'bytes_per_op' in result:
+        line += f' {result["bytes_per_op"]:>9,.1f} B/op {result["blocks_per_op"]:>6.2f} blocks/op'
+    return line
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> typing.List[str]:
+    """打印和基准结果的对比，返回变慢超过 threshold 的用例名"""
+    regressions = []
+    baseline_results = baseline.get('results', {})
+    print(f'\n{"case":48} {"baseline ops/s":>14} {"current ops/s":>14} {"ratio":>8}')
+    for name, result in current['results'].items():
+        baseline_result = baseline_results.get(name)
+        if baseline_result is None:
+            print(f'{name:48} {"-":>14} {result["ops_per_sec"]:>14,.0f} {"new":>8}')
+            continue
+        ratio = result['ops_per_sec'] / baseline_result['ops_per_sec']
+        mark = ''
+        if ratio < 1 - threshold:
+            mark = '  SLOWER'
+            regressions.append(name)
+        elif ratio > 1 + threshold:
+            mark = '  faster'
+        print(f'{name:48} {baseline_result["ops_per_sec"]:>14,.0f} {result["ops_per_sec"]:>14,.0f} '
+              f'{ratio:>8.2f}{mark}')
+    return regressions
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m nb_time.bench', description='Benchmark NbTime hot paths.')
+    parser.add_argument('-o', '--output', help='write results to this json file')
+    parser.add_argument('--baseline', help='compare with a json file written by a previous run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='fail when a case is slower than baseline by more than this ratio, default 0.1')
+    parser.add_argument('--filter', dest='name_filter', help='only run cases whose name contains this string')
+    parser.add_argument('--time-zone', default=DEFAULT_TIME_ZONE, help=f'default {DEFAULT_TIME_ZONE}')
+    parser.add_argument('--tz-backend', help='pytz / zoneinfo / fixed, see NbTime.set_tz_backend')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME,
+                        help='minimum seconds of each timing round, default 0.2')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='timing rounds, the best one is used')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc measurement')
+    return parser
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    if args.tz_backend:
+        NbTime.set_tz_backend(args.tz_backend)
+    current = run(args.time_zone, args.name_filter, args.min_time, args.repeat, memory=not args.no_memory)
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding='utf8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}: '
+                  f'{", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+floor / ceil / 时间窗口分桶，NbTime.floor NbTime.ceil NbTime.bucket 和批量分桶 bucket_many 的实现。
+
+不经过 arrow ，全部在 utc 微秒整数时间戳上计算:
+  固定偏移的时区(UTC+8 等)直接整数取整；
+  有夏令时的时区先按当时的偏移取整，窗口内没有夏令时切换时就是结果，夏令时结束时重复的两个 01:xx 也能分开；
+  窗口跨过夏令时切换的，以及 周 月 季 年，按本时区的墙上时间取整，再转回 utc 。
+
+窗口都按本时区的 1970-01-01 00:00 对齐，整除1天的窗口就是从每天0点开始。
+"""
+import datetime
+import functools
+import re
+import typing
+
+from nb_time.tz_registry import time_zone_registry
+
+US_PER_SECOND = 1000000
+US_PER_MINUTE = 60 * US_PER_SECOND
+US_PER_HOUR = 3600 * US_PER_SECOND
+US_PER_DAY = 86400 * US_PER_SECOND
+US_PER_WEEK = 7 * US_PER_DAY
+
+_ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+_EPOCH_NAIVE = datetime.datetime(1970, 1, 1)
+
+FIXED_UNIT_US = {
+    'second': US_PER_SECOND,
+    'minute': US_PER_MINUTE,
+    'hour': US_PER_HOUR,
+    'day': US_PER_DAY,
+}
+CALENDAR_UNIT_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+UNITS = tuple(FIXED_UNIT_US) + ('week',) + tuple(CALENDAR_UNIT_MONTHS)
+
+_INTERVAL_UNIT_US = {
+    'us': 1, 'ms': 1000,
+    's': US_PER_SECOND, 'sec': US_PER_SECOND, 'second': US_PER_SECOND,
+    'm': US_PER_MINUTE, 'min': US_PER_MINUTE, 'minute': US_PER_MINUTE,
+    'h': US_PER_HOUR, 'hour': US_PER_HOUR,
+    'd': US_PER_DAY, 'day': US_PER_DAY,
+    'w': US_PER_WEEK, 'week': US_PER_WEEK,
+}
+_INTERVAL_PATTERN = re.compile(r'\s*(\d+)\s*([a-z]+?)s?\s*', re.IGNORECASE)
+
+
+def check_unit(unit: str) -> str:
+    unit = unit.lower()
+    if unit in UNITS:
+        return unit
+    if unit.endswith('s') and unit[:-1] in UNITS:  # 'hours' 'days' 也可以
+        return unit[:-1]
+    raise ValueError(f'unit must be one of {UNITS}, got {unit!r}')
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_interval_str(interval: str) -> int:
+    match = _INTERVAL_PATTERN.fullmatch(interval)
+    if match is None or match.group(2).lower() not in _INTERVAL_UNIT_US:
+        raise ValueError(f"invalid interval {interval!r}, should be like '30s' '15min' '1h' '1d'")
+    return int(match.group(1)) * _INTERVAL_UNIT_US[match.group(2).lower()]
+
+
+def parse_interval_us(interval: typing.Union[str, int, float, datetime.timedelta]) -> int:
+    """窗口大小转成微秒，可以是 '15min' '1h' 这种字符串，timedelta ，或者秒数"""
+    if isinstance(interval, str):
+        interval_us = _parse_interval_str(interval)
+    elif isinstance(interval, datetime.timedelta):
+        interval_us = interval // _ONE_MICROSECOND
+    else:
+        interval_us = int(round(interval * US_PER_SECOND))
+    if interval_us <= 0:
+        raise ValueError(f'interval must be positive, got {interval!r}')
+    return interval_us
+
+
+# id(tz) -> (tz, 固定偏移微秒数或None)。和 nb_time._get_local_epoch 一样用 id 做 key 。
+_tz_id__fixed_offset_us_map: typing.Dict[int, typing.Tuple[datetime.tzinfo, typing.Optional[int]]] = {}
+
+
+def get_fixed_offset_us(tz: datetime.tzinfo) -> typing.Optional[int]:
+    """固定偏移的时区(datetime.timezone, pytz 的 Etc/GMT-8 UTC 等)返回偏移微秒数，有夏令时的时区返回None"""
+    entry = _tz_id__fixed_offset_us_map.get(id(tz))
+    if entry is not None and entry[0] is tz:
+        return entry[1]
+    offset = time_zone_registry.get_fixed_utcoffset(tz)
+    offset_us = None if offset is None else offset // _ONE_MICROSECOND
+    if len(_tz_id__fixed_offset_us_map) < 1024:
+        _tz_id__fixed_offset_us_map[id(tz)] = (tz, offset_us)
+    return offset_us
+
+
+def get_offset_us(tz: datetime.tzinfo, epoch_us: int) -> int:
+    """tz 在 epoch_us 时刻的 utc 偏移微秒数，按15分钟分桶缓存"""
+    return time_zone_registry.get_utcoffset(tz, epoch_us // US_PER_SECOND) // _ONE_MICROSECOND
+
+
+def local_boundary_to_epoch_us(local_us: int, tz: datetime.tzinfo) -> int:
+    """
+    窗口边界的墙上时间(微秒)转回utc。
+    夏令时结束时重复的墙上时间取较早的一次，夏令时开始时不存在的墙上时间(例如智利的0点)取切换以后的第一个时刻，
+    这样 floor 的结果不会晚于原来的时间，也不会跑到前一个窗口。
+    """
+    offset_before_us = get_offset_us(tz, local_us - US_PER_DAY)
+    candidate_us = local_us - offset_before_us
+    if get_offset_us(tz, candidate_us) == offset_before_us:
+        return candidate_us
+    offset_after_us = get_offset_us(tz, local_us + US_PER_DAY)
+    candidate_after_us = local_us - offset_after_us
+    if get_offset_us(tz, candidate_after_us) == offset_after_us:
+        return candidate_after_us
+    return candidate_us
+
+
+def bucket_epoch_us(epoch_us: int, interval_us: int, tz: datetime.tzinfo) -> int:
+    """epoch_us 所在窗口的开始时刻"""
+    fixed_offset_us = get_fixed_offset_us(tz)
+    if fixed_offset_us is not None:
+        local_us = epoch_us + fixed_offset_us
+        return local_us - local_us % interval_us - fixed_offset_us
+    offset_us = get_offset_us(tz, epoch_us)
+    local_us = epoch_us + offset_us
+    floored_us = epoch_us - local_us % interval_us
+    if get_offset_us(tz, floored_us) == offset_us:  # 窗口内没有夏令时切换，绝大多数情况
+        return floored_us
+    return local_boundary_to_epoch_us(local_us - local_us % interval_us, tz)
+
+
+def _floor_local_us(local_us: int, unit: str) -> int:
+    if unit in FIXED_UNIT_US:
+        return local_us - local_us % FIXED_UNIT_US[unit]
+    if unit == 'week':  # 按周一对齐，1970-01-01 是周四
+        local_days = local_us // US_PER_DAY
+        return (local_days - (local_days + 3) % 7) * US_PER_DAY
+    local_naive = _EPOCH_NAIVE + datetime.timedelta(microseconds=local_us)
+    month = local_naive.month
+    if unit == 'quarter':
+        month = (month - 1) // 3 * 3 + 1
+    elif unit == 'year':
+        month = 1
+    return (datetime.datetime(local_naive.year, month, 1) - _EPOCH_NAIVE) // _ONE_MICROSECOND
+
+
+def _add_units_to_local_us(local_us: int, unit: str, count: int = 1) -> int:
+    if unit in FIXED_UNIT_US:
+        return local_us + FIXED_UNIT_US[unit] * count
+    if unit == 'week':
+        return local_us + US_PER_WEEK * count
+    local_naive = _EPOCH_NAIVE + datetime.timedelta(microseconds=local_us)
+    total_months = local_naive.year * 12 + local_naive.month - 1 + CALENDAR_UNIT_MONTHS[unit] * count
+    year, month_index = divmod(total_months, 12)
+    return (local_naive.replace(year=year, month=month_index + 1) - _EPOCH_NAIVE) // _ONE_MICROSECOND
+
+
+def _get_local_us(epoch_us: int, tz: datetime.tzinfo) -> int:
+    fixed_offset_us = get_fixed_offset_us(tz)
+    return epoch_us + (fixed_offset_us if fixed_offset_us is not None else get_offset_us(tz, epoch_us))
+
+
+def floor_epoch_us(epoch_us: int, unit: str, tz: datetime.tzinfo) -> int:
+    """epoch_us 在 tz 时区所在的 秒/分/时/天/周/月/季/年 的开始时刻"""
+    unit = check_unit(unit)
+    if unit in FIXED_UNIT_US:
+        return bucket_epoch_us(epoch_us, FIXED_UNIT_US[unit], tz)
+    return local_boundary_to_epoch_us(_floor_local_us(_get_local_us(epoch_us, tz), unit), tz)
+
+
+def ceil_epoch_us(epoch_us: int, unit: str, tz: datetime.tzinfo) -> int:
+    """和 arrow 的 ceil 一样，是所在区间的最后一微秒，例如 23:59:59.999999"""
+    unit = check_unit(unit)
+    if unit in ('second', 'minute'):
+        return bucket_epoch_us(epoch_us, FIXED_UNIT_US[unit], tz) + FIXED_UNIT_US[unit] - 1
+    if unit == 'hour':
+        # 加1小时再 floor 一次，夏令时结束时重复的 01:xx 是两个小时，第二个 01:00 就是下一个区间的开始
+        floored_us = bucket_epoch_us(epoch_us, US_PER_HOUR, tz)
+        next_start_us = bucket_epoch_us(floored_us + US_PER_HOUR, US_PER_HOUR, tz)
+        if next_start_us > epoch_us:
+            return next_start_us - 1
+        # Lord_Howe 这种半小时夏令时结束的那个小时有1个半小时，加1小时还在同一个区间里面，按墙上时间取下一个小时
+        return local_boundary_to_epoch_us(_floor_local_us(_get_local_us(epoch_us, tz), unit) + US_PER_HOUR, tz) - 1
+    # 下一个区间开始的墙上时间，不能用 floor 结果的墙上时间去加，夏令时切换时那个墙上时间可能已经被挪动了
+    floored_local_us = _floor_local_us(_get_local_us(epoch_us, tz), unit)
+    return local_boundary_to_epoch_us(_add_units_to_local_us(floored_local_us, unit), tz) - 1
+
+
+def get_day_bounds_us(epoch_us: int, tz: datetime.tzinfo) -> typing.Tuple[int, int]:
+    """epoch_us 在 tz 时区所在的那一天 [0点, 第二天0点) ，夏令时切换的那天不是24小时"""
+    fixed_offset_us = get_fixed_offset_us(tz)
+    if fixed_offset_us is not None:
+        start_us = epoch_us - (epoch_us + fixed_offset_us) % US_PER_DAY
+        return start_us, start_us + US_PER_DAY
+    return bucket_epoch_us(epoch_us, US_PER_DAY, tz), ceil_epoch_us(epoch_us, 'day', tz) + 1
+
+
+# id(tz) -> (tz, 今天0点, 明天0点)，每个时区只缓存当前这一天，时钟跨过边界时才重新计算
+_tz_id__today_bounds_map: typing.Dict[int, typing.Tuple[datetime.tzinfo, int, int]] = {}
+
+
+def get_today_bounds_us(tz: datetime.tzinfo, now_us: int) -> typing.Tuple[int, int]:
+    """now_us 是当前时间，限流配额这种每个请求都要判断是不是今天的地方用，绝大多数调用只是一次字典查找和两次比较"""
+    entry = _tz_id__today_bounds_map.get(id(tz))
+    if entry is not None and entry[0] is tz and entry[1] <= now_us < entry[2]:
+        return entry[1], entry[2]
+    start_us, end_us = get_day_bounds_us(now_us, tz)
+    if entry is not None or len(_tz_id__today_bounds_map) < 1024:
+        _tz_id__today_bounds_map[id(tz)] = (tz, start_us, end_us)  # 整体替换 tuple ，不需要加锁
+    return start_us, end_us
+
+
+def is_same_day_us(epoch_us_a: int, epoch_us_b: int, tz: datetime.tzinfo) -> bool:
+    fixed_offset_us = get_fixed_offset_us(tz)
+    if fixed_offset_us is not None:
+        return (epoch_us_a + fixed_offset_us) // US_PER_DAY == (epoch_us_b + fixed_offset_us) // US_PER_DAY
+    start_us, end_us = get_day_bounds_us(epoch_us_a, tz)
+    return start_us <= epoch_us_b < end_us
+
+
+_INPUT_UNIT_US = {'s': US_PER_SECOND, 'ms': 1000, 'us': 1}
+
+
+def bucket_many(values, interval: typing.Union[str, int, float, datetime.timedelta],
+                time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                unit: str = 's'):
+    """
+    批量分桶，把几百万个事件时间戳归到所在窗口的开始时刻，用于按分钟/小时/天聚合。
+    :param values: utc 时间戳序列，可以是 list 也可以是 numpy 数组(向量化计算)
+    :param interval: 窗口大小，例如 '1min' '1h' '1d' 或者 timedelta
+    :param time_zone: 按哪个时区对齐窗口，默认是 NbTime 的默认时区
+    :param unit: values 的单位 's' 'ms' 'us' ，返回值的单位和 values 一样
+    :return: numpy 数组入参返回 numpy 数组，其他返回 list 。秒级浮点入参返回的是浮点数
+    """
+    from nb_time import NbTime
+    if unit not in _INPUT_UNIT_US:
+        raise ValueError(f"unit must be 's' 'ms' or 'us', got {unit!r}")
+    scale = _INPUT_UNIT_US[unit]
+    interval_us = parse_interval_us(interval)
+    tz = NbTime.build_pytz_timezone(time_zone or NbTime.default_time_zone or NbTime.get_localzone_name())
+    if type(values).__module__ == 'numpy':
+        from nb_time.nb_time_array import NbTimeArray
+        import numpy as np
+        if values.dtype.kind == 'f':
+            epoch_us = np.round(values * scale).astype(np.int64)
+        else:
+            epoch_us = values.astype(np.int64) * scale
+        arr = NbTimeArray(None, time_zone=tz)
+        arr.epoch_us = epoch_us
+        bucketed_us = arr._bucket_us(interval_us).epoch_us
+        if values.dtype.kind == 'f':
+            return bucketed_us / scale
+        return bucketed_us // scale
+    out = []
+    append = out.append
+    fixed_offset_us = get_fixed_offset_us(tz)
+    for value in values:
+        epoch_us = int(value * scale) if isinstance(value, int) else int(round(value * scale))
+        if fixed_offset_us is not None:
+            local_us = epoch_us + fixed_offset_us
+            bucketed_us = local_us - local_us % interval_us - fixed_offset_us
+        else:
+            bucketed_us = bucket_epoch_us(epoch_us, interval_us, tz)
+        append(bucketed_us // scale if isinstance(value, int) else bucketed_us / scale)
+    return out
@@ -0,0 +1,279 @@
+"""
+日志时间戳改写命令行工具，python -m nb_time 的入口。
+
+按行流式读取 stdin 或文件，用正则或者列号找到每行里面的时间字符串，
+用 NbTime 解析、to_tz 转时区、再按指定的 formatter 输出，其余内容原样保留。
+不指定 --from-formatter 时，每种形状的时间字符串第一次出现时识别一次格式，之后按识别到的格式解析，
+不指定 --to-formatter 时输出也保持这个格式。
+
+    python -m nb_time --from-tz UTC --to-tz Asia/Shanghai --to-formatter "%Y-%m-%d %H:%M:%S" app.log > app_cn.log
+    cat app.log | python -m nb_time --regex "^\\[(.+?)\\]" --to-tz UTC
+    python -m nb_time --column 0 --delimiter "|" --processes 4 -o out.log big.log
+
+相邻的日志行时间字符串大多相同，解析结果按时间字符串缓存，同一个字符串只解析一次。
+多 GB 的文件可以用 --processes 按字节范围切分给多个进程并行处理，结果按原顺序拼接。
+"""
+import argparse
+import concurrent.futures
+import io
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import typing
+
+from nb_time import NbTime
+from nb_time.adaptive_parser import adaptive_str_parser, get_str_shape
+
+logger = logging.getLogger(__name__)
+
+IO_BUFFER_SIZE = 1024 * 1024
+WRITE_BATCH_LINES = 4096
+ENCODING = 'utf-8'
+ENCODING_ERRORS = 'surrogateescape'  # 非 utf8 的字节原样写回去
+
+# 默认匹配行里面第一个 2024-01-02 03:04:05 或 2024-01-02T03:04:05.123+08:00 这种时间
+DEFAULT_TIMESTAMP_REGEX = r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:\s?(?:Z|[+-]\d{2}:?\d{2}))?'
+
+
+class TimestampRewriter:
+    """ 改写一行文本里面的时间字符串，解析结果按原始时间字符串缓存 """
+
+    def __init__(self,
+                 regex: typing.Optional[str] = None,
+                 column: typing.Optional[int] = None,
+                 delimiter: typing.Optional[str] = None,
+                 from_formatter: typing.Optional[str] = None,
+                 from_tz: typing.Optional[str] = None,
+                 to_formatter: typing.Optional[str] = None,
+                 to_tz: typing.Optional[str] = None,
+                 cache_size: int = 100000):
+        """
+        :param regex: 匹配时间字符串的正则，有分组时用第一个分组，没有分组用整个匹配。和 column 二选一。
+        :param column: 时间字符串所在的列号，从0开始。
+        :param delimiter: 列分隔符，默认按连续空白分列。
+        :param from_formatter: 解析时间字符串用的 formatter ，同 NbTime 的 datetime_formatter ，
+                               默认按每种字符串形状自动识别一次
+        :param from_tz: 时间字符串不带时区时按这个时区解析
+        :param to_formatter: 输出的 formatter ，默认和 from_formatter 一样，from_formatter 也没有指定时和输入的格式一样，
+                             识别不出格式的输出成 '%Y-%m-%d %H:%M:%S.%f' ，带时区的再加上 ' %z'
+        :param to_tz: 输出转换到的时区，默认和 from_tz 一样
+        :param cache_size: 解析结果缓存的最大条数，满了就清空重新缓存
+        """
+        if column is None:
+            self._pattern = re.compile(regex or DEFAULT_TIMESTAMP_REGEX)
+        else:
+            self._pattern = None
+        self.column = column
+        self.delimiter = delimiter
+        self.from_formatter = from_formatter
+        self.from_tz = from_tz
+        self.to_formatter = to_formatter or from_formatter
+        self.to_tz = to_tz or from_tz
+        self.cache_size = cache_size
+        self._time_str__new_str_map = {}
+        self._shape__formatter_map = {}  # 没有指定 from_formatter 时，字符串形状 -> 识别到的格式，识别不出是None
+        self.fail_count = 0
+
+    def _detect_formatter(self, time_str: str) -> typing.Optional[str]:
+        """同一种形状只识别一次，后面同形状的字符串直接用识别到的格式解析，不会每行都走万能解析和告警"""
+        shape = get_str_shape(time_str)
+        if shape not in self._shape__formatter_map:
+            adaptive_str_parser.parse(time_str)
+            if len(self._shape__formatter_map) >= adaptive_str_parser.max_shapes:
+                self._shape__formatter_map.clear()
+            self._shape__formatter_map[shape] = adaptive_str_parser.get_learned_formatter(time_str)
+        return self._shape__formatter_map[shape]
+
+    def _build_nb_time(self, time_str: str) -> typing.Tuple[NbTime, typing.Optional[str]]:
+        """返回 (NbTime, 输入的格式)"""
+        from_formatter = self.from_formatter or self._detect_formatter(time_str)
+        if from_formatter is not None:
+            return NbTime(time_str, datetime_formatter=from_formatter, time_zone=self.from_tz), from_formatter
+        # 识别不出格式的，万能解析以后转成确定格式的字符串再交给 NbTime ，不带时区的按 from_tz 解析
+        datetime_obj = adaptive_str_parser.parse(time_str)
+        formatter = NbTime.FORMATTER_MILLISECOND if datetime_obj.tzinfo else '%Y-%m-%d %H:%M:%S.%f'
+        return NbTime(datetime_obj.strftime(formatter), datetime_formatter=formatter, time_zone=self.from_tz), None
+
+    def convert_time_str(self, time_str: str) -> typing.Optional[str]:
+        """转换一个时间字符串，解析失败返回None"""
+        new_str = self._time_str__new_str_map.get(time_str)
+        if new_str is not None:
+            return new_str
+        try:
+            nb_time, from_formatter = self._build_nb_time(time_str)
+            if self.to_tz:
+                nb_time = nb_time.to_tz(self.to_tz)
+            new_str = nb_time.get_str(self.to_formatter or from_formatter)
+        except Exception as e:
+            self.fail_count += 1
+            logger.debug(f'cannot convert time str {time_str!r}, {type(e)} {e}')
+            return None
+        if len(self._time_str__new_str_map) >= self.cache_size:
+            self._time_str__new_str_map.clear()
+        self._time_str__new_str_map[time_str] = new_str
+        return new_str
+
+    def _find_column_span(self, line: str) -> typing.Optional[typing.Tuple[int, int]]:
+        if self.delimiter is None:
+            for i, match in enumerate(re.finditer(r'\S+', line)):
+                if i == self.column:
+                    return match.span()
+            return None
+        start = 0
+        for _ in range(self.column):
+            pos = line.find(self.delimiter, start)
+            if pos == -1:
+                return None
+            start = pos + len(self.delimiter)
+        end = line.find(self.delimiter, start)
+        if end == -1:
+            end = len(line.rstrip('\r\n'))
+        return start, end
+
+    def _find_span(self, line: str) -> typing.Optional[typing.Tuple[int, int]]:
+        if self._pattern is None:
+            return self._find_column_span(line)
+        match = self._pattern.search(line)
+        if match is None:
+            return None
+        return match.span(1) if match.re.groups else match.span()
+
+    def rewrite_line(self, line: str) -> str:
+        span = self._find_span(line)
+        if span is None:
+            return line
+        start, end = span
+        new_str = self.convert_time_str(line[start:end])
+        if new_str is None:
+            return line
+        return line[:start] + new_str + line[end:]
+
+    def rewrite_stream(self, in_stream: typing.Iterable[str], out_stream: typing.TextIO):
+        """逐行改写，攒够一批再一次性写出，减少 write 调用次数"""
+        batch = []
+        rewrite_line = self.rewrite_line
+        for line in in_stream:
+            batch.append(rewrite_line(line))
+            if len(batch) >= WRITE_BATCH_LINES:
+                out_stream.write(''.join(batch))
+                batch = []
+        if batch:
+            out_stream.write(''.join(batch))
+
+
+def _open_text_reader(binary_stream: typing.BinaryIO) -> io.TextIOWrapper:
+    return io.TextIOWrapper(binary_stream, encoding=ENCODING, errors=ENCODING_ERRORS, newline='')
+
+
+def _iter_range_lines(binary_stream: typing.BinaryIO, start: int, end: int) -> typing.Iterator[str]:
+    """逐行读取文件 [start, end) 这段字节，start end 都已经对齐到行首"""
+    binary_stream.seek(start)
+    pos = start
+    while pos < end:
+        raw_line = binary_stream.readline()
+        if not raw_line:
+            break
+        pos += len(raw_line)
+        yield raw_line.decode(ENCODING, ENCODING_ERRORS)
+
+
+def split_file_byte_ranges(file_path: str, parts: int) -> typing.List[typing.Tuple[int, int]]:
+    """把文件按字节大小切成 parts 段，每段的边界对齐到换行符之后"""
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, boundaries[-1]))
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+
+
+def _rewrite_file_range(file_path: str, start: int, end: int, rewriter_kwargs: dict) -> typing.Tuple[str, int]:
+    """子进程里面执行，把 [start, end) 这段改写到一个临时文件，返回 (临时文件路径, 转换失败的个数)"""
+    rewriter = TimestampRewriter(**rewriter_kwargs)
+    fd, out_path = tempfile.mkstemp(prefix='nb_time_', suffix='.part')
+    with open(file_path, 'rb', buffering=IO_BUFFER_SIZE) as f_in, \
+            open(fd, 'w', encoding=ENCODING, errors=ENCODING_ERRORS, newline='', buffering=IO_BUFFER_SIZE) as f_out:
+        rewriter.rewrite_stream(_iter_range_lines(f_in, start, end), f_out)
+    return out_path, rewriter.fail_count
+
+
+def rewrite_file_parallel(file_path: str, out_stream: typing.TextIO, processes: int, rewriter_kwargs: dict) -> int:
+    """多进程改写一个文件，返回转换失败的个数"""
+    ranges = split_file_byte_ranges(file_path, processes)
+    fail_count = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_rewrite_file_range, file_path, start, end, rewriter_kwargs)
+                   for start, end in ranges]
+        for future in futures:  # 按原文件顺序拼接
+            part_path, part_fail_count = future.result()
+            fail_count += part_fail_count
+            try:
+                with open(part_path, 'r', encoding=ENCODING, errors=ENCODING_ERRORS, newline='') as f_part:
+                    shutil.copyfileobj(f_part, out_stream, IO_BUFFER_SIZE)
+            finally:
+                os.remove(part_path)
+    return fail_count
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m nb_time',
+                                     description='Re-zone / re-format timestamps in log files line by line.')
+    parser.add_argument('files', nargs='*', help='input files, read stdin if not given')
+    parser.add_argument('-o', '--output', help='output file, write stdout if not given')
+    locate = parser.add_mutually_exclusive_group()
+    locate.add_argument('--regex', help='regex to find the timestamp, first group is used if the regex has groups')
+    locate.add_argument('--column', type=int, help='0-based column index of the timestamp')
+    parser.add_argument('--delimiter', help='column delimiter, default is runs of whitespace')
+    parser.add_argument('--from-formatter', help='formatter used to parse the timestamp, like %%Y-%%m-%%d %%H:%%M:%%S, '
+                                                 'detected once per timestamp shape if not given')
+    parser.add_argument('--from-tz', help='time zone of timestamps without offset, default is NbTime default zone')
+    parser.add_argument('--to-formatter', help='output formatter, default is --from-formatter or the detected input format')
+    parser.add_argument('--to-tz', help='output time zone, default is --from-tz')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='split each input file by byte ranges and rewrite with this many processes, '
+                             'needs input files')
+    return parser
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+    if args.processes > 1 and not args.files:
+        arg_parser.error('--processes needs input files, stdin can only be read by one process')
+    rewriter_kwargs = dict(regex=args.regex, column=args.column, delimiter=args.delimiter,
+                           from_formatter=args.from_formatter, from_tz=args.from_tz,
+                           to_formatter=args.to_formatter, to_tz=args.to_tz)
+    rewriter = TimestampRewriter(**rewriter_kwargs)
+    fail_count = 0
+    if args.output:
+        out_stream = open(args.output, 'w', encoding=ENCODING, errors=ENCODING_ERRORS, newline='',
+                          buffering=IO_BUFFER_SIZE)
+    else:
+        out_stream = io.TextIOWrapper(sys.stdout.buffer, encoding=ENCODING, errors=ENCODING_ERRORS, newline='',
+                                      write_through=False)
+    try:
+        if not args.files:
+            rewriter.rewrite_stream(_open_text_reader(sys.stdin.buffer), out_stream)
+        for file_path in args.files:
+            if args.processes > 1:
+                out_stream.flush()
+                fail_count += rewrite_file_parallel(file_path, out_stream, args.processes, rewriter_kwargs)
+            else:
+                with open(file_path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+                    rewriter.rewrite_stream(_open_text_reader(f), out_stream)
+    finally:
+        out_stream.flush()
+        if args.output:
+            out_stream.close()
+        else:
+            out_stream.detach()
+    fail_count += rewriter.fail_count
+    if fail_count:
+        logger.warning(f'{fail_count} timestamps could not be converted and were kept unchanged')
+    return 0
@@ -0,0 +1,195 @@
+"""
+当前时间的时钟层，NbTime() NbTime.now_fast today_zero is_greater_than_now NowTimeStrCache 都从这里取当前时间。
+
+    NbTime.set_clock(CoarseClock(resolution=0.001, ticker=True))  # 日志等热点路径，后台线程每毫秒刷新一次
+    NbTime.set_clock(MonotonicClock())  # 不受系统时间回拨影响
+    with use_clock(FakeClock('2024-03-10 01:59:59', time_zone='America/New_York')) as clock:  # 单元测试
+        clock.advance(seconds=1)
+
+时钟内部统一用 utc 微秒整数时间戳。
+"""
+import abc
+import contextlib
+import datetime
+import os
+import threading
+import time
+import typing
+import weakref
+
+US_PER_SECOND = 1000000
+
+
+class Clock(abc.ABC):
+    """时钟基类，子类实现 now_us"""
+
+    @abc.abstractmethod
+    def now_us(self) -> int:
+        """当前的 utc 微秒整数时间戳"""
+
+    def now_timestamp(self) -> float:
+        return self.now_us() / US_PER_SECOND
+
+
+class SystemClock(Clock):
+    """系统时间，默认的时钟"""
+
+    def now_us(self) -> int:
+        return time.time_ns() // 1000
+
+
+class MonotonicClock(Clock):
+    """
+    启动时记下一次系统时间，之后用 time.monotonic_ns 累加，系统时间被回拨或者 ntp 跳变时不会倒退。
+    resync_interval 秒以后重新对齐一次系统时间，None 表示不重新对齐。
+    """
+
+    def __init__(self, resync_interval: typing.Optional[float] = None):
+        self.resync_interval_ns = None if resync_interval is None else int(resync_interval * 1e9)
+        self._anchor = self._build_anchor()
+
+    @staticmethod
+    def _build_anchor() -> typing.Tuple[int, int]:
+        return time.time_ns(), time.monotonic_ns()
+
+    def now_us(self) -> int:
+        wall_ns, mono_ns = self._anchor
+        elapsed_ns = time.monotonic_ns() - mono_ns
+        if self.resync_interval_ns is not None and elapsed_ns > self.resync_interval_ns:
+            # 整体替换 tuple ，多线程同时重新对齐也没关系
+            self._anchor = self._build_anchor()
+            return self._anchor[0] // 1000
+        return (wall_ns + elapsed_ns) // 1000
+
+
+_ticking_clocks = weakref.WeakSet()
+
+
+def _stop_tickers_after_fork():
+    # fork 出来的子进程里面没有后台线程，退回到访问时刷新
+    for clock in list(_ticking_clocks):
+        clock._ticker_thread = None
+        clock._ticker_stop = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_stop_tickers_after_fork)
+
+
+class CoarseClock(Clock):
+    """
+    粗粒度时钟，时间截断到 resolution 秒(0.001 是毫秒，1 是秒)，同一个时间桶里面的调用拿到的是同一个值，
+    NowTimeStrCache 和 NbTime.now_fast 的缓存命中率更高。
+    ticker=True 时启动一个后台 daemon 线程每隔 resolution 刷新一次，读取时只是一次属性访问，不调用系统时间；
+    否则访问时刷新。
+    """
+
+    def __init__(self, resolution: float = 0.001, source: Clock = None, ticker: bool = False):
+        self.resolution_us = int(round(resolution * US_PER_SECOND))
+        if self.resolution_us <= 0:
+            raise ValueError(f'resolution must be at least 1 microsecond, got {resolution!r}')
+        self.source = source or SystemClock()
+        self._ticker_thread: typing.Optional[threading.Thread] = None
+        self._ticker_stop: typing.Optional[threading.Event] = None
+        self._ticked_us = self._read_source()
+        if ticker:
+            self.start_ticker()
+
+    def _read_source(self) -> int:
+        now_us = self.source.now_us()
+        return now_us - now_us % self.resolution_us
+
+    def now_us(self) -> int:
+        if self._ticker_thread is not None:
+            return self._ticked_us
+        return self._read_source()
+
+    def _tick_forever(self, stop_event: threading.Event):
+        interval = self.resolution_us / US_PER_SECOND
+        while not stop_event.wait(interval):
+            self._ticked_us = self._read_source()
+
+    def start_ticker(self):
+        if self._ticker_thread is not None:
+            return
+        self._ticked_us = self._read_source()
+        self._ticker_stop = threading.Event()
+        self._ticker_thread = threading.Thread(target=self._tick_forever, args=(self._ticker_stop,),
+                                               name='nb_time_coarse_clock', daemon=True)
+        self._ticker_thread.start()
+        _ticking_clocks.add(self)
+
+    def stop_ticker(self):
+        if self._ticker_thread is None:
+            return
+        self._ticker_stop.set()
+        self._ticker_thread = None
+        self._ticker_stop = None
+        _ticking_clocks.discard(self)
+
+
+class FakeClock(Clock):
+    """
+    测试用的假时钟，时间不会自己走，用 set advance 修改。
+    :param start: 时间戳，或者 NbTime 能解析的任何入参(字符串 datetime 等)，默认是当前系统时间
+    :param time_zone: start 是不带时区的字符串时按哪个时区理解
+    """
+
+    def __init__(self, start=None, time_zone: typing.Union[str, datetime.tzinfo, None] = None):
+        self._now_us = time.time_ns() // 1000 if start is None else self._to_epoch_us(start, time_zone)
+
+    @staticmethod
+    def _to_epoch_us(value, time_zone) -> int:
+        if isinstance(value, (int, float)):
+            return int(round(value * US_PER_SECOND))
+        from nb_time import NbTime
+        return NbTime(value, time_zone=time_zone).epoch_us
+
+    def now_us(self) -> int:
+        return self._now_us
+
+    def set(self, value, time_zone: typing.Union[str, datetime.tzinfo, None] = None):
+        self._now_us = self._to_epoch_us(value, time_zone)
+
+    def advance(self, days=0, hours=0, minutes=0, seconds=0, milliseconds=0, microseconds=0):
+        self._now_us += datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds,
+                                           milliseconds=milliseconds,
+                                           microseconds=microseconds) // datetime.timedelta(microseconds=1)
+
+
+_clock: Clock = SystemClock()
+
+
+def get_clock() -> Clock:
+    return _clock
+
+
+def is_system_clock() -> bool:
+    """全局时钟是不是默认的系统时钟，是的话 NbTime() 直接调用 datetime.datetime.now ，不绕道微秒时间戳"""
+    return type(_clock) is SystemClock
+
+
+def set_clock(clock: typing.Optional[Clock] = None) -> Clock:
+    """设置全局时钟，返回原来的时钟，传None恢复成系统时钟"""
+    global _clock
+    old_clock = _clock
+    _clock = clock or SystemClock()
+    return old_clock
+
+
+@contextlib.contextmanager
+def use_clock(clock: Clock) -> typing.Iterator[Clock]:
+    """临时切换全局时钟，退出时恢复，测试用"""
+    old_clock = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(old_clock)
+
+
+def now_us() -> int:
+    return _clock.now_us()
+
+
+def now_timestamp() -> float:
+    return _clock.now_us() / US_PER_SECOND
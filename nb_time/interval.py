@@ -0,0 +1,335 @@
+"""
+时间区间 [start, end) 和区间集合，排班 SLA 统计这种场景用: 哪些窗口覆盖了某个时刻，一共覆盖了多长时间。
+
+端点只保存 utc 微秒整数，不保存 NbTime 对象，取出来的时候再按时区和 datetime_formatter 转换成 NbTime 。
+
+    windows = IntervalSet([('2024-03-01 09:00:00', '2024-03-01 12:00:00'),
+                           ('2024-03-01 11:00:00', '2024-03-01 18:00:00')], time_zone='UTC+8')
+    windows.stab('2024-03-01 11:30:00')  # 覆盖这个时刻的区间在原始输入里面的位置
+    windows.duration  # 合并重叠部分以后一共覆盖的时长
+    windows.subtract(maintenance_windows).merge()
+
+merge union intersect subtract 返回的都是合并好的(不重叠、按时间排序)区间集合，都是 numpy 向量化的 O(n log n) 。
+"""
+import datetime
+import typing
+
+import numpy as np
+
+from nb_time import NbTime, NbTimeLite, datetime_to_epoch_us, epoch_us_to_datetime
+from nb_time.nb_time_array import NbTimeArray
+from nb_time.nb_time_index import _readonly
+
+
+def _to_epoch_us(datetimex, nb_time_cls: typing.Type[NbTime], init_params: dict) -> int:
+    if isinstance(datetimex, (NbTime, NbTimeLite)):
+        return datetimex.epoch_us
+    if isinstance(datetimex, datetime.datetime) and datetimex.tzinfo is not None:
+        return datetime_to_epoch_us(datetimex)
+    if isinstance(datetimex, np.number):
+        datetimex = datetimex.item()
+    return nb_time_cls(datetimex, **init_params).epoch_us
+
+
+class NbTimeInterval:
+    """ 左闭右开的时间区间 [start, end) ，start_us end_us 是 utc 微秒整数，start end 属性按时区转换成 NbTime """
+    __slots__ = ('start_us', 'end_us', 'init_params')
+    nb_time_cls = NbTime
+
+    def __init__(self, start, end, *,
+                 datetime_formatter: str = None,
+                 time_zone: typing.Union[str, datetime.tzinfo, None] = None):
+        """
+        :param start: NbTime 能解析的任何时间
+        :param end: 同 start ，不能早于 start ，和 start 相等时是空区间
+        """
+        self.init_params = {'datetime_formatter': datetime_formatter, 'time_zone': time_zone}
+        self.start_us = _to_epoch_us(start, self.nb_time_cls, self.init_params)
+        self.end_us = _to_epoch_us(end, self.nb_time_cls, self.init_params)
+        if self.end_us < self.start_us:
+            raise ValueError(f'interval end must not be earlier than start, got [{start!r}, {end!r})')
+
+    @classmethod
+    def _from_epoch_us(cls, start_us: int, end_us: int, init_params: dict) -> 'NbTimeInterval':
+        interval = cls.__new__(cls)
+        interval.start_us = start_us
+        interval.end_us = end_us
+        interval.init_params = init_params
+        return interval
+
+    def _build_nb_time(self, epoch_us: int) -> NbTime:
+        return self.nb_time_cls(epoch_us_to_datetime(epoch_us, datetime.timezone.utc), **self.init_params)
+
+    @property
+    def start(self) -> NbTime:
+        return self._build_nb_time(self.start_us)
+
+    @property
+    def end(self) -> NbTime:
+        return self._build_nb_time(self.end_us)
+
+    @property
+    def duration_us(self) -> int:
+        return self.end_us - self.start_us
+
+    @property
+    def duration(self) -> datetime.timedelta:
+        return datetime.timedelta(microseconds=self.end_us - self.start_us)
+
+    def is_empty(self) -> bool:
+        return self.end_us == self.start_us
+
+    def contains(self, datetimex) -> bool:
+        return self.start_us <= _to_epoch_us(datetimex, self.nb_time_cls, self.init_params) < self.end_us
+
+    def overlaps(self, other: 'NbTimeInterval') -> bool:
+        return self.start_us < other.end_us and other.start_us < self.end_us
+
+    def intersection(self, other: 'NbTimeInterval') -> typing.Optional['NbTimeInterval']:
+        """重叠的部分，不重叠返回None"""
+        start_us, end_us = max(self.start_us, other.start_us), min(self.end_us, other.end_us)
+        if start_us >= end_us:
+            return None
+        return self._from_epoch_us(start_us, end_us, self.init_params)
+
+    def __contains__(self, datetimex) -> bool:
+        return self.contains(datetimex)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, NbTimeInterval):
+            return NotImplemented
+        return self.start_us == other.start_us and self.end_us == other.end_us
+
+    def __lt__(self, other: 'NbTimeInterval') -> bool:
+        return (self.start_us, self.end_us) < (other.start_us, other.end_us)
+
+    def __hash__(self):
+        return hash((self.start_us, self.end_us))
+
+    def __str__(self) -> str:
+        start, end = self.start, self.end
+        return f'<NbTimeInterval [{start.datetime_str}, {end.datetime_str}) ({start.time_zone_str})>'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+def _merge_epoch_us(starts_us: np.ndarray, ends_us: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """按 start 排好序的区间合并成不重叠的区间，首尾相接的也合并，空区间丢掉"""
+    non_empty = ends_us > starts_us
+    starts_us, ends_us = starts_us[non_empty], ends_us[non_empty]
+    if not len(starts_us):
+        return starts_us, ends_us
+    max_ends_us = np.maximum.accumulate(ends_us)
+    # start 大于前面所有区间的最大 end 时开始一个新的合并区间
+    group_first = np.flatnonzero(np.concatenate(([True], starts_us[1:] > max_ends_us[:-1])))
+    group_last = np.concatenate((group_first[1:] - 1, [len(starts_us) - 1]))
+    return starts_us[group_first], max_ends_us[group_last]
+
+
+def _covered(starts_us: np.ndarray, ends_us: np.ndarray, points_us: np.ndarray) -> np.ndarray:
+    """合并好的区间是否覆盖每个点"""
+    if not len(starts_us):
+        return np.zeros(len(points_us), dtype=bool)
+    locs = np.searchsorted(starts_us, points_us, side='right') - 1
+    return (locs >= 0) & (ends_us[np.maximum(locs, 0)] > points_us)
+
+
+class IntervalSet:
+    """ 区间集合，区间可以重叠，按 (start, end) 排序保存成 int64 数组，不可变，所有区间共享同一个时区和 datetime_formatter """
+    nb_time_interval_cls = NbTimeInterval
+
+    def __init__(self,
+                 intervals: typing.Iterable = None,
+                 *,
+                 datetime_formatter: str = None,
+                 time_zone: typing.Union[str, datetime.tzinfo, None] = None):
+        """
+        :param intervals: NbTimeInterval 或者 (start, end) 组成的序列，start end 是 NbTime 能解析的任何时间
+        """
+        self._array = NbTimeArray(None, datetime_formatter=datetime_formatter, time_zone=time_zone)
+        nb_time_cls, init_params = self._array.nb_time_cls, self._array.init_params
+        starts, ends = [], []
+        for interval in intervals or []:
+            if isinstance(interval, NbTimeInterval):
+                starts.append(interval.start_us)
+                ends.append(interval.end_us)
+            else:
+                start, end = interval
+                starts.append(_to_epoch_us(start, nb_time_cls, init_params))
+                ends.append(_to_epoch_us(end, nb_time_cls, init_params))
+        starts_us = np.array(starts, dtype=np.int64)
+        ends_us = np.array(ends, dtype=np.int64)
+        if (ends_us < starts_us).any():
+            bad = int(np.flatnonzero(ends_us < starts_us)[0])
+            raise ValueError(f'interval end must not be earlier than start, got interval {bad}')
+        order = np.lexsort((ends_us, starts_us))
+        self._set_state(starts_us[order], ends_us[order], order.astype(np.int64))
+
+    def _set_state(self, starts_us: np.ndarray, ends_us: np.ndarray, positions: np.ndarray):
+        self.starts_us = _readonly(starts_us)  # type: np.ndarray  # 按 (start, end) 升序
+        self.ends_us = _readonly(ends_us)  # type: np.ndarray
+        self.positions = _readonly(positions)  # type: np.ndarray  # 每个区间在原始输入里面的位置
+        self._sorted_ends_us = None
+        self._max_ends_us = np.maximum.accumulate(ends_us) if len(ends_us) else ends_us  # 前 i+1 个区间里面最大的 end
+
+    def _build_interval_set(self, starts_us: np.ndarray, ends_us: np.ndarray,
+                            positions: np.ndarray = None) -> 'IntervalSet':
+        interval_set = self.__class__.__new__(self.__class__)
+        interval_set._array = self._array
+        interval_set._set_state(starts_us, ends_us,
+                                np.arange(len(starts_us), dtype=np.int64) if positions is None else positions)
+        return interval_set
+
+    @classmethod
+    def from_epoch_us(cls, starts_us, ends_us, *,
+                      datetime_formatter: str = None,
+                      time_zone: typing.Union[str, datetime.tzinfo, None] = None) -> 'IntervalSet':
+        """直接用 utc 微秒数组构造，不需要逐个转换"""
+        interval_set = cls(None, datetime_formatter=datetime_formatter, time_zone=time_zone)
+        starts_us = np.asarray(starts_us, dtype=np.int64)
+        ends_us = np.asarray(ends_us, dtype=np.int64)
+        if (ends_us < starts_us).any():
+            raise ValueError('interval end must not be earlier than start')
+        order = np.lexsort((ends_us, starts_us))
+        interval_set._set_state(starts_us[order], ends_us[order], order.astype(np.int64))
+        return interval_set
+
+    def _to_points_us(self, datetimexs) -> np.ndarray:
+        if isinstance(datetimexs, NbTimeArray):
+            return datetimexs.epoch_us
+        return self._array.build_epoch_us(datetimexs)
+
+    def _other_merged(self, other: 'IntervalSet') -> typing.Tuple[np.ndarray, np.ndarray]:
+        if not isinstance(other, IntervalSet):
+            other = self.__class__(other, **self._array.init_params)
+        return _merge_epoch_us(other.starts_us, other.ends_us)
+
+    def merge(self) -> 'IntervalSet':
+        """合并重叠和首尾相接的区间"""
+        return self._build_interval_set(*_merge_epoch_us(self.starts_us, self.ends_us))
+
+    def union(self, other: 'IntervalSet') -> 'IntervalSet':
+        other_starts_us, other_ends_us = self._other_merged(other)
+        starts_us = np.concatenate((self.starts_us, other_starts_us))
+        ends_us = np.concatenate((self.ends_us, other_ends_us))
+        order = np.argsort(starts_us, kind='stable')
+        return self._build_interval_set(*_merge_epoch_us(starts_us[order], ends_us[order]))
+
+    def _combine(self, other: 'IntervalSet', keep_other: bool) -> 'IntervalSet':
+        """把两边所有端点切成小段，按每一小段被哪一边覆盖决定保留哪些，再合并"""
+        starts_us, ends_us = _merge_epoch_us(self.starts_us, self.ends_us)
+        other_starts_us, other_ends_us = self._other_merged(other)
+        bounds_us = np.unique(np.concatenate((starts_us, ends_us, other_starts_us, other_ends_us)))
+        if len(bounds_us) < 2:
+            return self._build_interval_set(bounds_us[:0], bounds_us[:0])
+        segment_starts_us, segment_ends_us = bounds_us[:-1], bounds_us[1:]
+        keep = _covered(starts_us, ends_us, segment_starts_us)
+        other_covered = _covered(other_starts_us, other_ends_us, segment_starts_us)
+        keep &= other_covered if keep_other else ~other_covered
+        return self._build_interval_set(*_merge_epoch_us(segment_starts_us[keep], segment_ends_us[keep]))
+
+    def intersect(self, other: 'IntervalSet') -> 'IntervalSet':
+        return self._combine(other, keep_other=True)
+
+    def subtract(self, other: 'IntervalSet') -> 'IntervalSet':
+        return self._combine(other, keep_other=False)
+
+    def __or__(self, other: 'IntervalSet') -> 'IntervalSet':
+        return self.union(other)
+
+    def __and__(self, other: 'IntervalSet') -> 'IntervalSet':
+        return self.intersect(other)
+
+    def __sub__(self, other: 'IntervalSet') -> 'IntervalSet':
+        return self.subtract(other)
+
+    def stab(self, datetimex) -> np.ndarray:
+        """
+        覆盖 datetimex 的区间(start <= t < end)在原始输入里面的位置。
+        复杂度见 _overlap_positions 。
+        """
+        point_us = _to_epoch_us(datetimex, self._array.nb_time_cls, self._array.init_params)
+        return self._overlap_positions(point_us, point_us + 1)
+
+    def overlap(self, start, end) -> np.ndarray:
+        """和 [start, end) 有重叠的区间在原始输入里面的位置"""
+        nb_time_cls, init_params = self._array.nb_time_cls, self._array.init_params
+        return self._overlap_positions(_to_epoch_us(start, nb_time_cls, init_params),
+                                       _to_epoch_us(end, nb_time_cls, init_params))
+
+    def _overlap_positions(self, start_us: int, end_us: int) -> np.ndarray:
+        """
+        按 start 排好序，start < end_us 的是前面一段；前缀最大 end 不超过 start_us 的那些区间都在 start_us 之前结束了。
+        两次二分得到候选的一段，再用 numpy 过滤 end > start_us 。
+        复杂度是 O(log n + 候选数)，候选是从第一个还没结束的区间到 end_us 之间的所有区间，
+        有一个很早开始、很晚结束的区间时，它后面的区间都会成为候选，最坏退化成 O(n) 的向量化过滤。
+        """
+        left = np.searchsorted(self._max_ends_us, start_us, side='right')
+        right = np.searchsorted(self.starts_us, end_us, side='left')
+        candidates = slice(left, right)
+        matched = self.ends_us[candidates] > start_us
+        return self.positions[candidates][matched]
+
+    def count_at(self, datetimexs) -> np.ndarray:
+        """每个时间被多少个区间覆盖，(start <= t 的区间数) - (end <= t 的区间数)，批量二分"""
+        points_us = self._to_points_us(datetimexs)
+        if self._sorted_ends_us is None:
+            self._sorted_ends_us = np.sort(self.ends_us)
+        return (np.searchsorted(self.starts_us, points_us, side='right') -
+                np.searchsorted(self._sorted_ends_us, points_us, side='right'))
+
+    def covers(self, datetimexs) -> np.ndarray:
+        """每个时间是否被至少一个区间覆盖"""
+        return self.count_at(datetimexs) > 0
+
+    @property
+    def duration_us(self) -> int:
+        """合并重叠部分以后覆盖的总时长，重叠的时间只算一次"""
+        starts_us, ends_us = _merge_epoch_us(self.starts_us, self.ends_us)
+        return int((ends_us - starts_us).sum())
+
+    @property
+    def duration(self) -> datetime.timedelta:
+        return datetime.timedelta(microseconds=self.duration_us)
+
+    @property
+    def sum_duration_us(self) -> int:
+        """每个区间时长直接相加，重叠的时间会重复计算"""
+        return int((self.ends_us - self.starts_us).sum())
+
+    def get_str(self, formatter=None) -> typing.List[typing.Tuple[str, str]]:
+        start_strs = self._array._build_nb_time_array(self.starts_us.copy()).get_str(formatter)
+        end_strs = self._array._build_nb_time_array(self.ends_us.copy()).get_str(formatter)
+        return list(zip(start_strs, end_strs))
+
+    def __len__(self):
+        return len(self.starts_us)
+
+    def __getitem__(self, item) -> NbTimeInterval:
+        return self.nb_time_interval_cls._from_epoch_us(int(self.starts_us[item]), int(self.ends_us[item]),
+                                                        self._array.init_params)
+
+    def __iter__(self) -> typing.Iterator[NbTimeInterval]:
+        init_params = self._array.init_params
+        from_epoch_us = self.nb_time_interval_cls._from_epoch_us
+        for start_us, end_us in zip(self.starts_us.tolist(), self.ends_us.tolist()):
+            yield from_epoch_us(start_us, end_us, init_params)
+
+    def __str__(self) -> str:
+        return f'<IntervalSet len={len(self)} ({self._array.time_zone_str})>'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+if __name__ == '__main__':
+    windows = IntervalSet([('2024-03-01 09:00:00', '2024-03-01 12:00:00'),
+                           ('2024-03-01 11:00:00', '2024-03-01 18:00:00'),
+                           ('2024-03-02 09:00:00', '2024-03-02 10:00:00')],
+                          time_zone='UTC+8', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE)
+    maintenance = IntervalSet([('2024-03-01 13:00:00', '2024-03-01 14:00:00')],
+                              time_zone='UTC+8', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE)
+    print(windows.stab('2024-03-01 11:30:00'), windows.duration, windows.sum_duration_us)
+    print(windows.merge().get_str(), windows.subtract(maintenance).get_str())
+    print(list(windows.intersect(maintenance)), windows[0].duration)
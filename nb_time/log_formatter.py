@@ -0,0 +1,53 @@
+"""
+日志 Formatter ，asctime 用 NowTimeStrCache 按 record.created 的秒缓存，不用每条日志都调用 time.strftime 。
+
+    handler.setFormatter(NbTimeFormatter('%(asctime)s - %(levelname)s - %(message)s', time_zone='UTC+8'))
+
+dictConfig 里面用 '()' 可以传 time_zone ，用 'class' 只能用默认时区(NbTime 的默认时区或者系统时区):
+
+    'formatters': {'nb': {'()': 'nb_time.log_formatter.NbTimeFormatter',
+                          'fmt': '%(asctime)s - %(message)s', 'datefmt': '%Y-%m-%d %H:%M:%S', 'time_zone': 'UTC+8'}}
+
+不传 datefmt 时和 logging.Formatter 一样是 '2024-02-29 15:40:29,123' ，毫秒后缀也是预先生成好的。
+"""
+import datetime
+import logging
+import typing
+
+from nb_time import NbTime, NowTimeStrCache
+
+
+class NbTimeFormatter(logging.Formatter):
+    """logging.Formatter 的替代品，只是 formatTime 不一样，其他参数和 logging.Formatter 相同"""
+
+    def __init__(self, fmt: str = None, datefmt: str = None, style: str = '%', validate: bool = True, *,
+                 time_zone: typing.Union[str, datetime.tzinfo, None] = None, **kwargs):
+        """
+        :param time_zone: asctime 的时区，和 NbTime 的 time_zone 一样，默认是 NbTime 的默认时区或者系统时区
+        kwargs 是 python3.10 以上 logging.Formatter 的 defaults 参数
+        """
+        super().__init__(fmt, datefmt, style, validate, **kwargs)
+        self.time_zone = time_zone
+        self._msec_suffixes: typing.Optional[typing.Tuple[str, ...]] = None
+        if self.default_msec_format and self.default_msec_format.startswith('%s'):
+            # ',000' 到 ',999' ，和 default_msec_format % (s, msecs) 的结果一样
+            self._msec_suffixes = tuple(self.default_msec_format % ('', msecs) for msecs in range(1000))
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str = None) -> str:
+        if datefmt:
+            return NowTimeStrCache.get_time_str(record.created, self.time_zone, datefmt)
+        time_str = NowTimeStrCache.get_time_str(record.created, self.time_zone, self.default_time_format)
+        if not self.default_msec_format:
+            return time_str
+        if self._msec_suffixes is not None:
+            return time_str + self._msec_suffixes[int(record.msecs)]
+        return self.default_msec_format % (time_str, record.msecs)
+
+
+if __name__ == '__main__':
+    logger = logging.getLogger('nb_time_log_formatter_demo')
+    handler = logging.StreamHandler()
+    handler.setFormatter(NbTimeFormatter('%(asctime)s - %(levelname)s - %(message)s', time_zone='UTC+8'))
+    logger.addHandler(handler)
+    logger.warning('hello')
+    print(NbTime(time_zone='UTC+8'))
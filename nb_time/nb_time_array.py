@@ -0,0 +1,340 @@
+"""
+NbTimeArray 批量时间转换，底层是一个 numpy datetime64[us] 数组(存的是utc时刻) + 一个共享的时区对象。
+
+几百万个时间戳/时间字符串转换时，不需要每个值都去实例化一次 NbTime，
+时区只解析一次，时间戳的转换、shift、same_day_zero 都是 numpy 向量化计算。
+
+    arr = NbTimeArray([1709192429, 1709283094], time_zone='UTC+8')
+    print(arr.shift(hours=1).get_str(NbTime.FORMATTER_DATETIME_NO_ZONE))
+"""
+import datetime
+import typing
+
+import numpy as np
+
+from nb_time import NbTime, datetime_to_epoch_us, epoch_us_to_datetime
+from nb_time.bucketing import get_fixed_offset_us, parse_interval_us
+from nb_time.str_formatter import get_compiled_str_formatter
+
+US_PER_SECOND = 1000000
+US_PER_DAY = 86400 * US_PER_SECOND
+# 时区偏移按15分钟分桶计算，现实中所有的夏令时切换时刻都是对齐到15分钟的。
+_OFFSET_BUCKET_US = 900 * US_PER_SECOND
+
+
+def add_months_to_local_us(local_us: np.ndarray, months: typing.Union[int, np.ndarray]) -> np.ndarray:
+    """墙上时间(微秒)加上若干个月，months 可以是数组，和 relativedelta 一样月末日期会截断"""
+    local = local_us.view('datetime64[us]')
+    month_start = local.astype('datetime64[M]')
+    in_month_us = (local - month_start.astype('datetime64[us]')).view(np.int64)
+    new_month_start = month_start + months
+    days_in_month = ((new_month_start + 1).astype('datetime64[D]') -
+                     new_month_start.astype('datetime64[D]')).view(np.int64)
+    day_index = np.minimum(in_month_us // US_PER_DAY, days_in_month - 1)
+    return (new_month_start.astype('datetime64[us]').view(np.int64) +
+            day_index * US_PER_DAY + in_month_us % US_PER_DAY)
+
+
+class NbTimeArray:
+    """ 向量化的 NbTime，批量时间戳/字符串/datetime 转换。
+
+    所有元素共享同一个时区和 datetime_formatter，时区解析复用 NbTime.build_pytz_timezone 。
+    """
+    nb_time_cls = NbTime
+
+    def __init__(self,
+                 datetimexs: typing.Union[typing.Iterable, np.ndarray, None] = None,
+                 *,
+                 datetime_formatter: str = None,
+                 time_zone: typing.Union[str, datetime.tzinfo, None] = None):
+        """
+        :param datetimexs: 时间戳 时间字符串 datetime NbTime 等组成的序列，也可以是 numpy 的数值数组或 datetime64 数组(当作utc时刻)。
+        :param datetime_formatter: 同 NbTime
+        :param time_zone: 同 NbTime
+        """
+        self.init_params = {'datetime_formatter': datetime_formatter, 'time_zone': time_zone}
+        self.time_zone_str = time_zone or self.nb_time_cls.default_time_zone or self.nb_time_cls.get_localzone_name()
+        self.datetime_formatter = datetime_formatter or self.nb_time_cls.default_formatter or self.nb_time_cls.FORMATTER_ISO
+        self.time_zone_obj = self.nb_time_cls.build_pytz_timezone(self.time_zone_str)
+        if datetimexs is None:
+            datetimexs = []
+        self.epoch_us = self.build_epoch_us(datetimexs)  # type: np.ndarray  # int64 utc 微秒
+
+    @classmethod
+    def _from_epoch_us(cls, epoch_us: np.ndarray, init_params: dict) -> 'NbTimeArray':
+        arr = cls(None, **init_params)
+        arr.epoch_us = epoch_us
+        return arr
+
+    def _build_nb_time_array(self, epoch_us: np.ndarray) -> 'NbTimeArray':
+        return self._from_epoch_us(epoch_us, self.init_params)
+
+    def build_epoch_us(self, datetimexs) -> np.ndarray:
+        if isinstance(datetimexs, NbTimeArray):
+            return datetimexs.epoch_us.copy()
+        if isinstance(datetimexs, np.ndarray) and datetimexs.dtype.kind in 'iuf':
+            return self._numbers_to_epoch_us(datetimexs)
+        if isinstance(datetimexs, np.ndarray) and datetimexs.dtype.kind == 'M':
+            return datetimexs.astype('datetime64[us]').view(np.int64).copy()
+        datetimexs = list(datetimexs)
+        if not datetimexs:
+            return np.empty(0, dtype=np.int64)
+        if all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in datetimexs):
+            return self._numbers_to_epoch_us(np.asarray(datetimexs))
+        return self._objects_to_epoch_us(datetimexs)
+
+    @staticmethod
+    def _numbers_to_epoch_us(numbers: np.ndarray) -> np.ndarray:
+        # 规则和 NbTime.build_datetime_obj 一致: 小于1的加一天，大于等于10**12的当作毫秒。
+        if numbers.dtype.kind in 'iu':
+            numbers = numbers.astype(np.int64)
+            numbers = np.where(numbers < 1, numbers + 86400, numbers)
+            return np.where(numbers >= 10 ** 12, numbers * 1000, numbers * US_PER_SECOND)
+        numbers = numbers.astype(np.float64)
+        numbers = np.where(numbers < 1, numbers + 86400, numbers)
+        seconds = np.where(numbers >= 10 ** 12, numbers / 1000.0, numbers)
+        # 和 datetime.fromtimestamp 一样先拆出整数秒再对小数部分四舍五入，避免大数乘法的浮点误差
+        int_seconds = np.floor(seconds)
+        return int_seconds.astype(np.int64) * US_PER_SECOND + np.round((seconds - int_seconds) * US_PER_SECOND).astype(np.int64)
+
+    def _objects_to_epoch_us(self, datetimexs: list) -> np.ndarray:
+        out = np.empty(len(datetimexs), dtype=np.int64)
+        str_cache = {}  # 日志等数据里面相邻的时间字符串经常重复，同一个字符串只解析一次。
+        for i, datetimex in enumerate(datetimexs):
+            if isinstance(datetimex, str):
+                epoch_us = str_cache.get(datetimex)
+                if epoch_us is None:
+                    epoch_us = str_cache[datetimex] = datetime_to_epoch_us(
+                        self.nb_time_cls(datetimex, **self.init_params).datetime_obj)
+            elif isinstance(datetimex, datetime.datetime) and datetimex.tzinfo is not None:
+                epoch_us = datetime_to_epoch_us(datetimex)
+            elif isinstance(datetimex, NbTime):
+                epoch_us = datetime_to_epoch_us(datetimex.datetime_obj)
+            else:
+                epoch_us = datetime_to_epoch_us(self.nb_time_cls(datetimex, **self.init_params).datetime_obj)
+            out[i] = epoch_us
+        return out
+
+    def get_utc_offsets_us(self, epoch_us: np.ndarray = None) -> np.ndarray:
+        """每个元素在当前时区的utc偏移(微秒)。固定偏移时区直接广播，夏令时时区按15分钟分桶只计算不重复的桶。"""
+        if epoch_us is None:
+            epoch_us = self.epoch_us
+        fixed = get_fixed_offset_us(self.time_zone_obj)
+        if fixed is not None:
+            return np.full(epoch_us.shape, fixed, dtype=np.int64)
+        buckets, inverse = np.unique(epoch_us // _OFFSET_BUCKET_US, return_inverse=True)
+        bucket_offsets = np.fromiter(
+            (epoch_us_to_datetime(int(b) * _OFFSET_BUCKET_US, self.time_zone_obj).utcoffset() //
+             datetime.timedelta(microseconds=1) for b in buckets),
+            dtype=np.int64, count=len(buckets))
+        return bucket_offsets[inverse.reshape(epoch_us.shape)]
+
+    def _local_to_epoch_us(self, local_us: np.ndarray) -> np.ndarray:
+        """时区墙上时间(微秒)转回utc，先用近似偏移猜一次，再用猜到的utc时刻的真实偏移修正。"""
+        guess = local_us - self.get_utc_offsets_us(local_us)
+        return local_us - self.get_utc_offsets_us(guess)
+
+    def _local_boundary_to_epoch_us(self, local_us: np.ndarray) -> np.ndarray:
+        """窗口边界的墙上时间转回utc，重复的墙上时间取较早的一次，不存在的取切换以后的第一个时刻，同 nb_time.bucketing"""
+        offset_before = self.get_utc_offsets_us(local_us - US_PER_DAY)
+        offset_after = self.get_utc_offsets_us(local_us + US_PER_DAY)
+        candidate_before = local_us - offset_before
+        candidate_after = local_us - offset_after
+        use_before = (self.get_utc_offsets_us(candidate_before) == offset_before) | \
+                     (self.get_utc_offsets_us(candidate_after) != offset_after)
+        return np.where(use_before, candidate_before, candidate_after)
+
+    @property
+    def local_us(self) -> np.ndarray:
+        return self.epoch_us + self.get_utc_offsets_us()
+
+    @property
+    def datetime64(self) -> np.ndarray:
+        """utc 时刻的 datetime64[us] 数组"""
+        return self.epoch_us.view('datetime64[us]')
+
+    @property
+    def local_datetime64(self) -> np.ndarray:
+        """本时区墙上时间的 datetime64[us] 数组"""
+        return self.local_us.view('datetime64[us]')
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self.epoch_us / US_PER_SECOND
+
+    @property
+    def timestamp_millisecond(self) -> np.ndarray:
+        return self.epoch_us / 1000
+
+    def to_tz(self, time_zone: typing.Union[str, datetime.tzinfo]) -> 'NbTimeArray':
+        init_params = dict(self.init_params, time_zone=time_zone)
+        return self._from_epoch_us(self.epoch_us.copy(), init_params)
+
+    def to_utc(self) -> 'NbTimeArray':
+        return self.to_tz(self.nb_time_cls.TIMEZONE_UTC)
+
+    def shift(self, years=0, months=0, days=0, leapdays=0, weeks=0,
+              hours=0, minutes=0, seconds=0, microseconds=0, ) -> 'NbTimeArray':
+        """
+        天 时 分 秒 这些固定长度的单位直接在微秒时间戳上加减，
+        年 月 按墙上时间计算，和 relativedelta 一样月末日期会截断，例如 1月31日 + 1个月 = 2月28/29日，
+        跨夏令时墙上时间不变，和 NbTime.shift 一样。小数的秒 时 分 四舍五入到微秒。
+        """
+        epoch_us = self.epoch_us
+        total_months = years * 12 + months
+        if total_months:
+            epoch_us = self._local_to_epoch_us(add_months_to_local_us(self.local_us, total_months))
+        if leapdays:
+            # leapdays 和具体年份相关，极少使用，逐个交给 NbTime.shift 处理。
+            return self.__class__([nbt.shift(leapdays=leapdays) for nbt in self._build_nb_time_array(epoch_us)],
+                                  **self.init_params).shift(weeks=weeks, days=days, hours=hours, minutes=minutes,
+                                                            seconds=seconds, microseconds=microseconds)
+        # 结果必须还是 int64 ，hours=1.5 这种小数先四舍五入成整数微秒
+        fixed_us = int(round((((weeks * 7 + days) * 24 + hours) * 60 + minutes) * 60 * US_PER_SECOND +
+                             seconds * US_PER_SECOND + microseconds))
+        if fixed_us:
+            epoch_us = epoch_us + fixed_us
+        elif epoch_us is self.epoch_us:
+            epoch_us = epoch_us.copy()
+        return self._build_nb_time_array(epoch_us)
+
+    @classmethod
+    def range(cls, start, end, step: int = 1, unit: str = 'hours', *,
+              datetime_formatter: str = None,
+              time_zone: typing.Union[str, datetime.tzinfo, None] = None) -> 'NbTimeArray':
+        """NbTime.range 的 numpy 版本，一次性生成 start 到 end (包含 end) 之间的所有时间，适合几百万个点的大范围"""
+        from nb_time.time_range import FIXED_UNIT_US, check_unit
+        unit = check_unit(unit)
+        if not isinstance(step, int) or step == 0:
+            raise ValueError(f'step must be a non-zero int, got {step!r}')
+        arr = cls(None, datetime_formatter=datetime_formatter, time_zone=time_zone)
+        start_us, end_us = arr.build_epoch_us([start, end]).tolist()
+        direction = 1 if step > 0 else -1
+        if unit in FIXED_UNIT_US:
+            arr.epoch_us = np.arange(start_us, end_us + direction, step * FIXED_UNIT_US[unit], dtype=np.int64)
+            return arr
+        bounds_us = np.array([start_us, end_us], dtype=np.int64)
+        start_local, end_local = (bounds_us + arr.get_utc_offsets_us(bounds_us)).tolist()
+        if unit in ('days', 'weeks'):
+            step_us = step * (7 if unit == 'weeks' else 1) * US_PER_DAY
+            local_us = np.arange(start_local, end_local + direction, step_us, dtype=np.int64)
+        else:
+            months_step = step * (12 if unit == 'years' else 1)
+            local_dates = np.array([start_local, end_local], dtype=np.int64).view('datetime64[us]').astype('datetime64[M]')
+            months_between = int((local_dates[1] - local_dates[0]).astype(np.int64))
+            count = months_between // months_step + 1
+            local_us = add_months_to_local_us(np.full(count, start_local, dtype=np.int64),
+                                              np.arange(count, dtype=np.int64) * months_step)
+        epoch_us = arr._local_to_epoch_us(local_us)
+        # 墙上时间在终点之前，但是夏令时切换附近转成utc以后可能越过终点
+        arr.epoch_us = epoch_us[epoch_us <= end_us] if step > 0 else epoch_us[epoch_us >= end_us]
+        return arr
+
+    @property
+    def same_day_zero(self) -> 'NbTimeArray':
+        """每个元素在本时区当天0点，和 NbTime.same_day_zero 一样，0点不存在的那天是切换以后的第一个时刻"""
+        return self._bucket_us(US_PER_DAY)
+
+    def bucket(self, interval: typing.Union[str, int, float, datetime.timedelta]) -> 'NbTimeArray':
+        """NbTime.bucket 的 numpy 版本，每个元素所在窗口的开始时刻，规则见 nb_time.bucketing"""
+        return self._bucket_us(parse_interval_us(interval))
+
+    def _bucket_us(self, interval_us: int) -> 'NbTimeArray':
+        epoch_us = self.epoch_us
+        fixed = get_fixed_offset_us(self.time_zone_obj)
+        if fixed is not None:
+            local_us = epoch_us + fixed
+            return self._build_nb_time_array(local_us - local_us % interval_us - fixed)
+        offsets = self.get_utc_offsets_us()
+        local_us = epoch_us + offsets
+        floored_us = epoch_us - local_us % interval_us
+        crossed = self.get_utc_offsets_us(floored_us) != offsets  # 窗口内有夏令时切换的少数元素按墙上时间重新计算
+        if crossed.any():
+            floored_local_us = local_us[crossed]
+            floored_us[crossed] = self._local_boundary_to_epoch_us(floored_local_us - floored_local_us % interval_us)
+        return self._build_nb_time_array(floored_us)
+
+    def floor(self, unit: str) -> 'NbTimeArray':
+        """NbTime.floor 的 numpy 版本，unit 是 second minute hour day week month quarter year"""
+        from nb_time.bucketing import FIXED_UNIT_US, check_unit
+        unit = check_unit(unit)
+        if unit in FIXED_UNIT_US:
+            return self._bucket_us(FIXED_UNIT_US[unit])
+        local_us = self.local_us
+        if unit == 'week':  # 按周一对齐，1970-01-01 是周四
+            local_days = local_us // US_PER_DAY
+            floored_us = (local_days - (local_days + 3) % 7) * US_PER_DAY
+        else:
+            months = local_us.view('datetime64[us]').astype('datetime64[M]').view(np.int64)
+            if unit == 'quarter':
+                months = months - months % 3
+            elif unit == 'year':
+                months = months - months % 12
+            floored_us = months.view('datetime64[M]').astype('datetime64[us]').view(np.int64)
+        return self._build_nb_time_array(self._local_boundary_to_epoch_us(floored_us))
+
+    def _to_local_datetimes(self) -> typing.List[datetime.datetime]:
+        """转成带时区的 datetime 列表，同一个偏移共享同一个 datetime.timezone 对象"""
+        offsets = self.get_utc_offsets_us()
+        naive_list = (self.epoch_us + offsets).view('datetime64[us]').astype(object).tolist()
+        tz_cache = {}
+        out = []
+        for naive, offset_us, epoch_us in zip(naive_list, offsets.tolist(), self.epoch_us.tolist()):
+            tz = tz_cache.get(offset_us)
+            if tz is None:
+                tz_name = epoch_us_to_datetime(epoch_us, self.time_zone_obj).tzname()
+                tz = tz_cache[offset_us] = datetime.timezone(datetime.timedelta(microseconds=offset_us), tz_name)
+            out.append(naive.replace(tzinfo=tz))
+        return out
+
+    def get_str(self, formatter=None) -> typing.List[str]:
+        formatter = formatter or self.datetime_formatter
+        if '%z' not in formatter and '%Z' not in formatter:
+            datetimes = self.local_datetime64.astype(object).tolist()
+        else:
+            datetimes = self._to_local_datetimes()
+        compiled_str_formatter = get_compiled_str_formatter(formatter)
+        if compiled_str_formatter is None:
+            return [dt.strftime(formatter) for dt in datetimes]
+        format_func = compiled_str_formatter.format
+        return [format_func(dt) for dt in datetimes]
+
+    @property
+    def datetime_str(self) -> typing.List[str]:
+        return self.get_str()
+
+    def to_datetimes(self) -> typing.List[datetime.datetime]:
+        """转成本时区的 datetime 列表"""
+        return [epoch_us_to_datetime(epoch_us, self.time_zone_obj) for epoch_us in self.epoch_us.tolist()]
+
+    def to_nb_times(self) -> typing.List[NbTime]:
+        return [self.nb_time_cls(dt, **self.init_params) for dt in self.to_datetimes()]
+
+    def __len__(self):
+        return len(self.epoch_us)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self.nb_time_cls(epoch_us_to_datetime(int(self.epoch_us[item]), self.time_zone_obj),
+                                    **self.init_params)
+        return self._build_nb_time_array(self.epoch_us[item])
+
+    def __iter__(self):
+        return iter(self.to_nb_times())
+
+    def __str__(self) -> str:
+        return f'<NbTimeArray len={len(self)} ({self.time_zone_str})>'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+if __name__ == '__main__':
+    NbTime.set_default_time_zone('UTC+8')
+    arr = NbTime.from_many([1709192429, 1709283094.123, '2024-02-29 07:40:34', datetime.datetime.now()],
+                           datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE)
+    print(arr, arr.get_str())
+    print(arr.shift(months=1, hours=-1).get_str())
+    print(arr.same_day_zero.get_str(NbTime.FORMATTER_DATETIME))
+    print(arr.to_tz('America/New_York').get_str(NbTime.FORMATTER_MILLISECOND))
+    print(arr[0], arr[1:].timestamp)
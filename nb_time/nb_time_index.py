@@ -0,0 +1,212 @@
+"""
+NbTimeIndex 有序的时间索引，底层是排好序的 int64 utc 微秒数组，用二分查找定位，适合把事件匹配到之前最近的一条行情。
+
+对 NbTime 列表排序时每次比较都要重新计算时间戳，这里只在构造时转换一次，之后都是 numpy 的整数运算。
+
+    ticks = NbTimeIndex(tick_timestamps, time_zone='UTC+8')
+    tick_positions = ticks.asof_join(event_timestamps)  # 每个事件之前(包含同一时刻)最近的一条行情在原始输入里面的位置，没有是-1
+    prices = np.asarray(tick_prices)[tick_positions]
+    ticks = ticks.append(new_tick_timestamps)  # 流式追加，按时间顺序追加时是均摊 O(k) 的
+
+索引是不可变的，append slice_between 都返回新的索引。positions 是每个元素在原始输入里面的位置，append 的元素接着往后编号。
+"""
+import datetime
+import typing
+
+import numpy as np
+
+from nb_time import NbTime, NbTimeLite, datetime_to_epoch_us, epoch_us_to_datetime
+from nb_time.bucketing import parse_interval_us
+from nb_time.nb_time_array import NbTimeArray
+
+
+class _GrowableBuffer:
+    """append 共用的缓冲区，容量翻倍增长。多个索引共享同一个缓冲区的前 n 个元素，只有最新的那个索引可以原地往后写"""
+
+    def __init__(self, epoch_us: np.ndarray, positions: np.ndarray, capacity: int):
+        capacity = max(16, capacity)
+        self.epoch_us = np.empty(capacity, dtype=np.int64)
+        self.positions = np.empty(capacity, dtype=np.int64)
+        self.epoch_us[:len(epoch_us)] = epoch_us
+        self.positions[:len(positions)] = positions
+        self.used = len(epoch_us)
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    view = arr.view()
+    view.flags.writeable = False
+    return view
+
+
+class NbTimeIndex:
+    """ 不可变的有序时间索引，所有元素共享同一个时区和 datetime_formatter ，时间转换规则和 NbTimeArray 一样 """
+    nb_time_array_cls = NbTimeArray
+
+    def __init__(self,
+                 datetimexs: typing.Union[typing.Iterable, np.ndarray, None] = None,
+                 *,
+                 datetime_formatter: str = None,
+                 time_zone: typing.Union[str, datetime.tzinfo, None] = None):
+        """
+        :param datetimexs: NbTime 时间戳 时间字符串 datetime 等组成的序列，或者 NbTimeArray ，不需要事先排好序
+        :param datetime_formatter: 同 NbTime
+        :param time_zone: 同 NbTime ，只影响取出来的 NbTime 和字符串，排序和查找都是按utc时刻
+        """
+        self._array = self.nb_time_array_cls(None, datetime_formatter=datetime_formatter, time_zone=time_zone)
+        epoch_us = self._array.build_epoch_us([] if datetimexs is None else datetimexs)
+        order = np.argsort(epoch_us, kind='stable')  # 相同时刻保持原来的先后顺序
+        self._set_state(_readonly(epoch_us[order]), _readonly(order.astype(np.int64)), len(epoch_us), None)
+
+    def _set_state(self, epoch_us: np.ndarray, positions: np.ndarray, next_position: int,
+                   buffer: typing.Optional[_GrowableBuffer]):
+        self.epoch_us = epoch_us  # type: np.ndarray  # 升序的 int64 utc 微秒，只读
+        self.positions = positions  # type: np.ndarray  # 每个元素在原始输入里面的位置，只读
+        self._next_position = next_position
+        self._buffer = buffer
+
+    def _build_index(self, epoch_us: np.ndarray, positions: np.ndarray, next_position: int = None,
+                     buffer: _GrowableBuffer = None) -> 'NbTimeIndex':
+        index = self.__class__.__new__(self.__class__)
+        index._array = self._array
+        index._set_state(_readonly(epoch_us), _readonly(positions),
+                         self._next_position if next_position is None else next_position, buffer)
+        return index
+
+    @property
+    def time_zone_obj(self) -> datetime.tzinfo:
+        return self._array.time_zone_obj
+
+    @property
+    def time_zone_str(self):
+        return self._array.time_zone_str
+
+    @property
+    def datetime_formatter(self) -> str:
+        return self._array.datetime_formatter
+
+    def _to_epoch_us(self, datetimex) -> int:
+        if isinstance(datetimex, (NbTime, NbTimeLite)):
+            return datetimex.epoch_us
+        if isinstance(datetimex, datetime.datetime) and datetimex.tzinfo is not None:
+            return datetime_to_epoch_us(datetimex)
+        if isinstance(datetimex, np.number):
+            datetimex = datetimex.item()
+        # 单个值走 NbTime 比构造 numpy 数组快很多，规则是一样的
+        return self._array.nb_time_cls(datetimex, **self._array.init_params).epoch_us
+
+    def _to_epoch_us_array(self, datetimexs) -> np.ndarray:
+        if isinstance(datetimexs, NbTimeIndex):
+            return datetimexs.epoch_us
+        if isinstance(datetimexs, NbTimeArray):
+            return datetimexs.epoch_us
+        return self._array.build_epoch_us(datetimexs)
+
+    def searchsorted(self, datetimexs, side: str = 'left') -> typing.Union[int, np.ndarray]:
+        """
+        和 numpy.searchsorted 一样，返回插入以后仍然有序的位置(排好序以后的下标，不是原始输入的位置)。
+        传单个时间返回 int ，传序列返回 int64 数组。
+        """
+        if isinstance(datetimexs, (str, int, float, np.number, datetime.datetime, NbTime, NbTimeLite)):
+            return int(np.searchsorted(self.epoch_us, self._to_epoch_us(datetimexs), side=side))
+        return np.searchsorted(self.epoch_us, self._to_epoch_us_array(datetimexs), side=side)
+
+    def slice_between(self, start, end, include_end: bool = True) -> 'NbTimeIndex':
+        """start 到 end 之间的元素，包含 start ，include_end 为 True 时包含 end 。返回的索引和原索引共享内存"""
+        left = np.searchsorted(self.epoch_us, self._to_epoch_us(start), side='left')
+        right = np.searchsorted(self.epoch_us, self._to_epoch_us(end), side='right' if include_end else 'left')
+        right = max(left, right)
+        return self._build_index(self.epoch_us[left:right], self.positions[left:right])
+
+    def asof_loc(self, datetimex) -> int:
+        """小于等于 datetimex 的最后一个元素在排好序以后的下标，没有返回-1"""
+        return int(np.searchsorted(self.epoch_us, self._to_epoch_us(datetimex), side='right')) - 1
+
+    def asof(self, datetimex) -> typing.Optional[NbTime]:
+        """小于等于 datetimex 的最后一个元素，没有返回None"""
+        loc = self.asof_loc(datetimex)
+        return None if loc < 0 else self[loc]
+
+    def asof_join(self, other_times, tolerance: typing.Union[str, int, float, datetime.timedelta] = None,
+                  allow_exact_matches: bool = True) -> np.ndarray:
+        """
+        批量 asof ，other_times 每个时间匹配本索引里面之前最近的一个元素，返回它在原始输入里面的位置(positions)，匹配不到是-1。
+        二分查找是 O(n log m) ，other_times 不需要有序。
+        :param tolerance: 最多往前找多远，例如 '5min' ，同 NbTime.bucket 的 interval
+        :param allow_exact_matches: False 时只匹配严格早于的元素
+        """
+        other_us = self._to_epoch_us_array(other_times)
+        if not len(self):
+            return np.full(len(other_us), -1, dtype=np.int64)
+        locs = np.searchsorted(self.epoch_us, other_us, side='right' if allow_exact_matches else 'left') - 1
+        matched = locs >= 0
+        if tolerance is not None:
+            matched &= other_us - self.epoch_us[np.maximum(locs, 0)] <= parse_interval_us(tolerance)
+        return np.where(matched, self.positions[np.maximum(locs, 0)], -1)
+
+    def append(self, datetimexs) -> 'NbTimeIndex':
+        """
+        追加新的时间，返回新的索引，原索引不变。
+        新的时间都不早于最后一个元素(流式数据的常见情况)时写进共享的缓冲区，均摊 O(k) ；否则合并以后重新排序。
+        同一个索引不要在多个线程里面同时 append 。
+        """
+        new_us = self._to_epoch_us_array(datetimexs)
+        count = len(self)
+        new_positions = np.arange(self._next_position, self._next_position + len(new_us), dtype=np.int64)
+        next_position = self._next_position + len(new_us)
+        if not len(new_us):
+            return self._build_index(self.epoch_us, self.positions, next_position, self._buffer)
+        order = np.argsort(new_us, kind='stable')
+        new_us, new_positions = new_us[order], new_positions[order]
+        if count and new_us[0] < self.epoch_us[-1]:
+            epoch_us = np.concatenate([self.epoch_us, new_us])
+            positions = np.concatenate([self.positions, new_positions])
+            order = np.argsort(epoch_us, kind='stable')  # 两段各自有序，stable 排序接近线性
+            return self._build_index(epoch_us[order], positions[order], next_position)
+        buffer = self._buffer
+        total = count + len(new_us)
+        # 没有缓冲区(刚构造或者切片出来的)、已经有别的索引从同一个位置追加过、容量不够时，换一个新的缓冲区
+        if buffer is None or buffer.used != count or total > len(buffer.epoch_us):
+            buffer = _GrowableBuffer(self.epoch_us, self.positions, total * 2)
+        buffer.epoch_us[count:total] = new_us
+        buffer.positions[count:total] = new_positions
+        buffer.used = total
+        return self._build_index(buffer.epoch_us[:total], buffer.positions[:total], next_position, buffer)
+
+    def to_nb_time_array(self) -> NbTimeArray:
+        return self._array._build_nb_time_array(self.epoch_us.copy())
+
+    @property
+    def datetime64(self) -> np.ndarray:
+        """utc 时刻的 datetime64[us] 数组"""
+        return self.epoch_us.view('datetime64[us]')
+
+    def get_str(self, formatter=None) -> typing.List[str]:
+        return self.to_nb_time_array().get_str(formatter)
+
+    def __len__(self):
+        return len(self.epoch_us)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self._array.nb_time_cls(epoch_us_to_datetime(int(self.epoch_us[item]), self.time_zone_obj),
+                                           **self._array.init_params)
+        if isinstance(item, slice) and item.step not in (None, 1):
+            raise ValueError('NbTimeIndex only supports contiguous slices')
+        return self._build_index(self.epoch_us[item], self.positions[item])
+
+    def __iter__(self):
+        return iter(self.to_nb_time_array().to_nb_times())
+
+    def __str__(self) -> str:
+        return f'<NbTimeIndex len={len(self)} ({self.time_zone_str})>'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+if __name__ == '__main__':
+    ticks = NbTimeIndex([1709192429, 1709192400, '2024-02-29 15:41:00'], time_zone='UTC+8',
+                        datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE)
+    print(ticks, ticks.get_str(), ticks.positions)
+    print(ticks.asof(1709192430), ticks.asof_join([1709192399, 1709192429, 1709192500]))
+    print(ticks.append([1709192600, 1709192700]).get_str())
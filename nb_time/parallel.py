@@ -0,0 +1,174 @@
+"""
+多进程并行的批量时间转换，几千万个时间字符串的 解析 / 转时区 / 格式化 。
+
+纯 python 的解析受 GIL 限制，这里把输入切块分给 ProcessPoolExecutor ，
+进程之间只传输紧凑的结果: 解析结果是 array('q') 的 utc 微秒整数时间戳，不传输 pickle 的 NbTime 对象。
+进程池全局复用，第一次调用以后 worker 进程是热的，不用每次重新启动进程和 import 。
+
+    epoch_us = parallel_parse(strs, datetime_formatter='%Y-%m-%d %H:%M:%S', time_zone='UTC+8', processes=8)
+    strs_utc = parallel_format(epoch_us, datetime_formatter='%Y-%m-%dT%H:%M:%S%z', time_zone='UTC')
+    # 或者一次完成解析+转时区+格式化，只往返一次
+    strs_utc = parallel_convert(strs, from_time_zone='UTC+8', to_time_zone='UTC')
+
+解析失败的位置是 NAT (int64 最小值)，格式化 NAT 得到None。需要 numpy 时 numpy.frombuffer(epoch_us, dtype=numpy.int64) 零拷贝。
+"""
+import array
+import atexit
+import concurrent.futures
+import datetime
+import functools
+import os
+import threading
+import typing
+
+from nb_time import NbTime, epoch_us_to_datetime
+from nb_time.str_formatter import get_compiled_str_formatter
+from nb_time.tz_registry import time_zone_registry
+
+NAT = -2 ** 63  # 解析失败的位置，和 numpy 的 NaT 一样是 int64 最小值
+MIN_CHUNK_SIZE = 10000  # 太小的块进程间通信的开销比计算还大
+CHUNKS_PER_PROCESS = 4
+
+_pool_lock = threading.Lock()
+_pool: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+_pool_key: typing.Optional[tuple] = None
+
+
+def _init_worker(tz_backend: str):
+    if time_zone_registry.backend != tz_backend:
+        NbTime.set_tz_backend(tz_backend)
+
+
+def get_process_pool(processes: int = None) -> concurrent.futures.ProcessPoolExecutor:
+    """全局复用的进程池，进程数或者时区 backend 变了才重新创建"""
+    global _pool, _pool_key
+    processes = processes or os.cpu_count() or 1
+    key = (processes, time_zone_registry.backend)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                                           initargs=(time_zone_registry.backend,))
+            _pool_key = key
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+        _pool_key = None
+
+
+atexit.register(shutdown_process_pool)
+
+
+def _resolve_params(datetime_formatter: typing.Optional[str],
+                    time_zone: typing.Union[str, datetime.tzinfo, None]) -> typing.Tuple[str, typing.Union[str, datetime.tzinfo]]:
+    """默认值在主进程里面确定，worker 进程里面 set_default_* 不一定生效"""
+    return (datetime_formatter or NbTime.default_formatter or NbTime.FORMATTER_ISO,
+            time_zone or NbTime.default_time_zone or NbTime.get_localzone_name())
+
+
+@functools.lru_cache(maxsize=64)
+def _get_batch_parser(datetime_formatter: str, time_zone: typing.Union[str, datetime.tzinfo]):
+    from nb_time.batch_parse import BatchParser, OUTPUT_EPOCH_US
+    return BatchParser(NbTime, datetime_formatter, time_zone, OUTPUT_EPOCH_US)
+
+
+def parse_chunk(datetimexs: typing.Sequence, datetime_formatter: str,
+                time_zone: typing.Union[str, datetime.tzinfo]) -> array.array:
+    convert = _get_batch_parser(datetime_formatter, time_zone).convert
+    out = array.array('q')
+    append = out.append
+    for datetimex in datetimexs:
+        try:
+            append(convert(datetimex))
+        except Exception:
+            append(NAT)
+    return out
+
+
+def format_chunk(epoch_us: typing.Sequence[int], datetime_formatter: str,
+                 time_zone: typing.Union[str, datetime.tzinfo]) -> typing.List[typing.Optional[str]]:
+    tz = NbTime.build_pytz_timezone(time_zone)
+    compiled_str_formatter = get_compiled_str_formatter(datetime_formatter)
+    if compiled_str_formatter is None:
+        return [None if value == NAT else epoch_us_to_datetime(value, tz).strftime(datetime_formatter)
+                for value in epoch_us]
+    format_func = compiled_str_formatter.format
+    return [None if value == NAT else format_func(epoch_us_to_datetime(value, tz)) for value in epoch_us]
+
+
+def convert_chunk(datetimexs: typing.Sequence, from_formatter: str, from_time_zone: typing.Union[str, datetime.tzinfo],
+                  to_formatter: str, to_time_zone: typing.Union[str, datetime.tzinfo]) -> typing.List[typing.Optional[str]]:
+    return format_chunk(parse_chunk(datetimexs, from_formatter, from_time_zone), to_formatter, to_time_zone)
+
+
+def _split_chunks(items: typing.Sequence, processes: int, chunk_size: typing.Optional[int]) -> typing.List[typing.Sequence]:
+    if chunk_size is None:
+        chunk_size = max(MIN_CHUNK_SIZE, -(-len(items) // (processes * CHUNKS_PER_PROCESS)))
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def _map_chunks(func, items: typing.Sequence, processes: typing.Optional[int], chunk_size: typing.Optional[int],
+                *args) -> list:
+    """按顺序返回每块的结果。数据量小或者只用1个进程时在当前进程直接计算"""
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(items) <= MIN_CHUNK_SIZE:
+        return [func(items, *args)]
+    pool = get_process_pool(processes)
+    futures = [pool.submit(func, chunk, *args) for chunk in _split_chunks(items, processes, chunk_size)]
+    return [future.result() for future in futures]
+
+
+def parallel_parse(datetimexs: typing.Iterable, *,
+                   datetime_formatter: str = None,
+                   time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                   processes: int = None,
+                   chunk_size: int = None) -> array.array:
+    """多进程批量解析，返回 array('q') 的 utc 微秒时间戳，和入参一一对应，解析失败的位置是 NAT"""
+    datetime_formatter, time_zone = _resolve_params(datetime_formatter, time_zone)
+    items = datetimexs if isinstance(datetimexs, (list, tuple)) else list(datetimexs)
+    out = array.array('q')
+    for chunk_out in _map_chunks(parse_chunk, items, processes, chunk_size, datetime_formatter, time_zone):
+        out.extend(chunk_out)
+    return out
+
+
+def parallel_format(epoch_us: typing.Union[array.array, typing.Sequence[int]], *,
+                    datetime_formatter: str = None,
+                    time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                    processes: int = None,
+                    chunk_size: int = None) -> typing.List[typing.Optional[str]]:
+    """多进程批量格式化 utc 微秒时间戳，NAT 的位置是None"""
+    datetime_formatter, time_zone = _resolve_params(datetime_formatter, time_zone)
+    if not isinstance(epoch_us, array.array):
+        epoch_us = array.array('q', epoch_us)
+    out = []
+    for chunk_out in _map_chunks(format_chunk, epoch_us, processes, chunk_size, datetime_formatter, time_zone):
+        out.extend(chunk_out)
+    return out
+
+
+def parallel_convert(datetimexs: typing.Iterable, *,
+                     from_formatter: str = None,
+                     from_time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                     to_formatter: str = None,
+                     to_time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+                     processes: int = None,
+                     chunk_size: int = None) -> typing.List[typing.Optional[str]]:
+    """多进程 解析 + to_tz + 格式化 一次完成，返回字符串列表，解析失败的位置是None。
+    to_formatter to_time_zone 默认和 from_formatter from_time_zone 一样"""
+    from_formatter, from_time_zone = _resolve_params(from_formatter, from_time_zone)
+    to_formatter = to_formatter or from_formatter
+    to_time_zone = to_time_zone or from_time_zone
+    items = datetimexs if isinstance(datetimexs, (list, tuple)) else list(datetimexs)
+    out = []
+    for chunk_out in _map_chunks(convert_chunk, items, processes, chunk_size, from_formatter, from_time_zone,
+                                 to_formatter, to_time_zone):
+        out.extend(chunk_out)
+    return out
@@ -0,0 +1,183 @@
+"""
+NbTime 的紧凑序列化。
+
+pickle: NbTime.__reduce__ 只保存 (类, utc微秒时间戳, 时区key, formatter id) ，
+        常用 formatter 只保存一个小整数，反序列化时不走 __init__ 也不重新解析字符串。
+to_bytes/from_bytes: 固定16字节的二进制格式，适合放进 redis 或者 multiprocessing 队列:
+
+    <q  utc 微秒时间戳
+    <i  时区值，固定偏移时区是偏移秒数，命名时区是 NAMED_TIME_ZONES 里面的 id
+    <H  formatter id
+    <B  时区类型 0 固定偏移 1 命名时区
+    <B  版本号
+
+id 表只能在末尾追加不能修改，否则以前序列化的数据解析出来会错。
+不在表里面的 formatter 和命名时区可以用 register_formatter register_named_time_zone 注册，
+收发两边的进程要用同样的 id 注册。
+"""
+import datetime
+import struct
+import sys
+import typing
+
+from nb_time.tz_registry import CANONICAL_UTC, time_zone_registry
+
+BYTES_VERSION = 1
+_BYTES_STRUCT = struct.Struct('<qiHBB')
+BYTES_SIZE = _BYTES_STRUCT.size  # 16
+
+TZ_KIND_FIXED_OFFSET = 0
+TZ_KIND_NAMED = 1
+
+USER_ID_START = 1000  # 用户注册的 id 从这里开始，前面的留给内置表追加
+
+_BUILTIN_FORMATTERS = (
+    None,  # id 0 不使用
+    '%Y-%m-%d %H:%M:%S %z',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f %z',
+    '%Y-%m-%d',
+    '%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y%m%d',
+    '%Y%m%d%H%M%S',
+)
+
+_BUILTIN_NAMED_TIME_ZONES = (
+    None,  # id 0 不使用
+    'America/New_York', 'America/Chicago', 'America/Denver', 'America/Los_Angeles', 'America/Phoenix',
+    'America/Anchorage', 'America/Toronto', 'America/Vancouver', 'America/Mexico_City', 'America/Sao_Paulo',
+    'America/Argentina/Buenos_Aires', 'America/Bogota', 'America/Lima', 'America/Santiago', 'America/Halifax',
+    'America/St_Johns', 'Pacific/Honolulu', 'Europe/London', 'Europe/Dublin', 'Europe/Lisbon', 'Europe/Paris',
+    'Europe/Berlin', 'Europe/Madrid', 'Europe/Rome', 'Europe/Amsterdam', 'Europe/Brussels', 'Europe/Zurich',
+    'Europe/Vienna', 'Europe/Stockholm', 'Europe/Oslo', 'Europe/Copenhagen', 'Europe/Warsaw', 'Europe/Prague',
+    'Europe/Athens', 'Europe/Helsinki', 'Europe/Kiev', 'Europe/Istanbul', 'Europe/Moscow', 'Africa/Cairo',
+    'Africa/Johannesburg', 'Africa/Lagos', 'Africa/Nairobi', 'Asia/Dubai', 'Asia/Tehran', 'Asia/Karachi',
+    'Asia/Kolkata', 'Asia/Kathmandu', 'Asia/Dhaka', 'Asia/Bangkok', 'Asia/Jakarta', 'Asia/Ho_Chi_Minh',
+    'Asia/Hong_Kong', 'Asia/Taipei', 'Asia/Singapore', 'Asia/Kuala_Lumpur', 'Asia/Manila', 'Asia/Seoul',
+    'Asia/Tokyo', 'Asia/Chongqing', 'Asia/Harbin', 'Asia/Urumqi', 'Asia/Macau', 'Australia/Perth',
+    'Australia/Adelaide', 'Australia/Brisbane', 'Australia/Sydney', 'Australia/Melbourne', 'Pacific/Auckland',
+    'Asia/Jerusalem', 'Asia/Riyadh', 'Asia/Yangon', 'Asia/Colombo', 'Atlantic/Reykjavik', 'US/Eastern', 'US/Central',
+    'US/Mountain', 'US/Pacific', 'PRC', 'Asia/Calcutta', 'Asia/Saigon',
+)
+
+_id__formatter_map: typing.Dict[int, str] = {i: f for i, f in enumerate(_BUILTIN_FORMATTERS) if f}
+_formatter__id_map: typing.Dict[str, int] = {f: i for i, f in _id__formatter_map.items()}
+_id__named_time_zone_map: typing.Dict[int, str] = {i: z for i, z in enumerate(_BUILTIN_NAMED_TIME_ZONES) if z}
+_named_time_zone__id_map: typing.Dict[str, int] = {z.lower(): i for i, z in _id__named_time_zone_map.items()}
+
+
+def _register(id_map: dict, reverse_map: dict, item_id: int, item: str, reverse_key: str, kind: str):
+    if not USER_ID_START <= item_id <= 0xFFFF:
+        raise ValueError(f'{kind} id must be in [{USER_ID_START}, 65535], got {item_id}')
+    if id_map.get(item_id, item) != item:
+        raise ValueError(f'{kind} id {item_id} is already registered as {id_map[item_id]!r}')
+    id_map[item_id] = item
+    reverse_map[reverse_key] = item_id
+
+
+def register_formatter(formatter_id: int, formatter: str):
+    """注册一个不在内置表里面的 formatter ，收发两边要用同样的 id"""
+    _register(_id__formatter_map, _formatter__id_map, formatter_id, formatter, formatter, 'formatter')
+
+
+def register_named_time_zone(time_zone_id: int, name: str):
+    """注册一个不在内置表里面的命名时区(例如 'America/Havana')，收发两边要用同样的 id"""
+    _register(_id__named_time_zone_map, _named_time_zone__id_map, time_zone_id, name, name.lower(), 'time zone')
+
+
+def get_formatter_id(formatter: str) -> typing.Optional[int]:
+    return _formatter__id_map.get(formatter)
+
+
+def get_formatter_by_id(formatter_id: int) -> str:
+    try:
+        return _id__formatter_map[formatter_id]
+    except KeyError:
+        raise ValueError(f'unknown formatter id {formatter_id}, register it with register_formatter') from None
+
+
+def dump_formatter(formatter: str) -> typing.Union[int, str]:
+    """pickle 用，内置表里面的 formatter 保存成 id ，其他的保存原字符串"""
+    return _formatter__id_map.get(formatter, formatter)
+
+
+def load_formatter(formatter_id: typing.Union[int, str]) -> str:
+    if isinstance(formatter_id, int):
+        return get_formatter_by_id(formatter_id)
+    return sys.intern(formatter_id)
+
+
+def load_time_zone_key(time_zone_key: typing.Union[str, datetime.tzinfo]) -> typing.Union[str, datetime.tzinfo]:
+    """几百万个对象反序列化时，同样的时区字符串只保留一份"""
+    if isinstance(time_zone_key, str):
+        return sys.intern(time_zone_key)
+    return time_zone_key
+
+
+def _get_time_zone_name(time_zone: typing.Union[str, datetime.tzinfo]) -> typing.Optional[str]:
+    if isinstance(time_zone, str):
+        return time_zone_registry.normalize(time_zone)
+    for attr in ('zone', 'key'):  # pytz 是 zone ， zoneinfo 是 key
+        name = getattr(time_zone, attr, None)
+        if isinstance(name, str):
+            return time_zone_registry.normalize(name)
+    return None
+
+
+def encode_time_zone(time_zone: typing.Union[str, datetime.tzinfo]) -> typing.Tuple[int, int]:
+    """返回 (时区类型, 时区值)"""
+    name = _get_time_zone_name(time_zone)
+    if name is not None:
+        time_zone_id = _named_time_zone__id_map.get(name.lower())
+        if time_zone_id is not None:
+            return TZ_KIND_NAMED, time_zone_id
+    tz = time_zone_registry.get_time_zone(time_zone)
+    offset = time_zone_registry.get_fixed_utcoffset(tz)
+    if offset is None:
+        raise ValueError(f'time zone {time_zone!r} is not in the named time zone table, '
+                         f'register it with register_named_time_zone or use pickle')
+    if offset % datetime.timedelta(minutes=1):
+        # 时区字符串只能表示整分钟的偏移，带秒的偏移 decode_time_zone 以后解析不回来
+        raise ValueError(f'time zone {time_zone!r} has a utc offset that is not whole minutes, use pickle')
+    return TZ_KIND_FIXED_OFFSET, int(offset.total_seconds())
+
+
+def decode_time_zone(kind: int, value: int) -> str:
+    if kind == TZ_KIND_NAMED:
+        try:
+            return _id__named_time_zone_map[value]
+        except KeyError:
+            raise ValueError(f'unknown time zone id {value}, register it with register_named_time_zone') from None
+    if kind == TZ_KIND_FIXED_OFFSET:
+        if value == 0:
+            return CANONICAL_UTC
+        sign = '-' if value < 0 else '+'
+        if value % 60:
+            raise ValueError(f'fixed utc offset {value}s is not whole minutes')
+        hours, minutes = divmod(abs(value) // 60, 60)
+        return f'UTC{sign}{hours:02d}:{minutes:02d}'
+    raise ValueError(f'unknown time zone kind {kind}')
+
+
+def pack(epoch_us: int, time_zone: typing.Union[str, datetime.tzinfo], datetime_formatter: str) -> bytes:
+    formatter_id = get_formatter_id(datetime_formatter)
+    if formatter_id is None:
+        raise ValueError(f'formatter {datetime_formatter!r} is not in the formatter table, '
+                         f'register it with register_formatter or use pickle')
+    kind, value = encode_time_zone(time_zone)
+    return _BYTES_STRUCT.pack(epoch_us, value, formatter_id, kind, BYTES_VERSION)
+
+
+def unpack(data: bytes) -> typing.Tuple[int, str, str]:
+    """返回 (utc微秒时间戳, 时区字符串, formatter)"""
+    if len(data) != BYTES_SIZE:
+        raise ValueError(f'NbTime bytes must be {BYTES_SIZE} bytes, got {len(data)}')
+    epoch_us, value, formatter_id, kind, version = _BYTES_STRUCT.unpack(data)
+    if version != BYTES_VERSION:
+        raise ValueError(f'unsupported NbTime bytes version {version}')
+    return epoch_us, decode_time_zone(kind, value), get_formatter_by_id(formatter_id)
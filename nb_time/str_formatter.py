@@ -0,0 +1,177 @@
+"""
+预编译的 strftime 格式化器，替代 datetime.strftime 。
+
+每个 formatter 只编译一次，拆成一个个字段的生成函数:
+  日期部分(例如 '%Y-%m-%d ')按天缓存，同一天的时间只拼接一次日期前缀；
+  两位数的字段用预先生成的 DIGIT_MAP 查表，不走 int 的格式化；
+  %f 之前的部分按秒缓存，日志场景下同一秒内的大量时间直接复用上次的字符串。
+
+只支持和 locale 无关的指令 %Y %y %m %d %H %I %M %S %f %j %z %Z %% ，
+formatter 里面有其他指令(例如 %b %a %p 这种和 locale 相关的)时返回None，由调用方回退到 strftime 。
+"""
+import datetime
+import functools
+import typing
+
+DIGIT_MAP = {i: f'{i:02d}' for i in range(100)}
+
+_DATE_DIRECTIVES = frozenset('Yymdj')
+_ZONE_DIRECTIVES = frozenset('zZ')
+
+_offset__str_map = {}
+
+
+def _format_utcoffset(offset: typing.Optional[datetime.timedelta]) -> str:
+    """和 strftime 的 %z 一致，例如 +0800  -0530 ，有秒和微秒时是 +HHMMSS[.ffffff]"""
+    if offset is None:
+        return ''
+    offset_str = _offset__str_map.get(offset)
+    if offset_str is not None:
+        return offset_str
+    sign = '+'
+    abs_offset = offset
+    if offset < datetime.timedelta(0):
+        sign = '-'
+        abs_offset = -offset
+    hours, rest = divmod(abs_offset, datetime.timedelta(hours=1))
+    minutes, rest = divmod(rest, datetime.timedelta(minutes=1))
+    offset_str = f'{sign}{hours:02d}{minutes:02d}'
+    if rest:
+        offset_str += f'{rest.seconds:02d}'
+        if rest.microseconds:
+            offset_str += f'.{rest.microseconds:06d}'
+    if len(_offset__str_map) < 1024:
+        _offset__str_map[offset] = offset_str
+    return offset_str
+
+
+def _emit_year(dt):
+    year = dt.year
+    return str(year) if year >= 1000 else dt.strftime('%Y')  # 小于1000年各平台的补零规则不一样，交给strftime
+
+
+_DIRECTIVE_EMITTERS = {
+    'Y': _emit_year,
+    'y': lambda dt: DIGIT_MAP[dt.year % 100],
+    'm': lambda dt: DIGIT_MAP[dt.month],
+    'd': lambda dt: DIGIT_MAP[dt.day],
+    'j': lambda dt: f'{dt.timetuple().tm_yday:03d}',
+    'H': lambda dt: DIGIT_MAP[dt.hour],
+    'I': lambda dt: DIGIT_MAP[dt.hour % 12 or 12],
+    'M': lambda dt: DIGIT_MAP[dt.minute],
+    'S': lambda dt: DIGIT_MAP[dt.second],
+    'f': lambda dt: f'{dt.microsecond:06d}',
+    'z': lambda dt: _format_utcoffset(dt.utcoffset()),
+    'Z': lambda dt: dt.tzname() or '',
+}
+
+
+def _literal_emitter(text: str):
+    return lambda dt: text
+
+
+class CompiledStrFormatter:
+    """ 一个 formatter 对应一个编译好的格式化器，由 get_compiled_str_formatter 缓存复用，多线程共享是安全的。
+
+    缓存状态都是不可变的 tuple ，整体替换，不需要加锁。
+    """
+
+    def __init__(self, formatter: str, tokens: typing.List[typing.Tuple[bool, str]]):
+        """
+        :param tokens: [(是否是指令, 指令字母或者字面量文本), ...]
+        """
+        self.formatter = formatter
+        # 开头只由日期字段和字面量组成的部分，作为按天缓存的日期前缀。
+        prefix_len = 0
+        for is_directive, value in tokens:
+            if is_directive and value not in _DATE_DIRECTIVES:
+                break
+            prefix_len += 1
+        # 从 %f 开始的尾部每次都要生成，%f 之前的部分在同一秒内是不变的，按秒缓存。
+        tail_start = len(tokens)
+        for i, (is_directive, value) in enumerate(tokens):
+            if is_directive and value == 'f':
+                tail_start = i
+                break
+        self._date_prefix_emitters = self._build_emitters(tokens[:prefix_len])
+        self._second_emitters = self._build_emitters(tokens[prefix_len:tail_start])
+        self._tail_emitters = self._build_emitters(tokens[tail_start:])
+        self._zone_in_head = any(is_directive and value in _ZONE_DIRECTIVES
+                                 for is_directive, value in tokens[:tail_start])
+        self._date_state = (None, '')  # (ordinal, 日期前缀字符串)
+        self._second_state = (None, None, '')  # ((ordinal, hour, minute, second, fold), tzinfo, 到秒为止的字符串)
+
+    @staticmethod
+    def _build_emitters(tokens: typing.List[typing.Tuple[bool, str]]) -> list:
+        return [_DIRECTIVE_EMITTERS[value] if is_directive else _literal_emitter(value) for is_directive, value in
+                tokens]
+
+    def _get_date_prefix(self, dt: datetime.datetime, ordinal: int) -> str:
+        state = self._date_state
+        if state[0] == ordinal:
+            return state[1]
+        prefix = ''.join([emitter(dt) for emitter in self._date_prefix_emitters])
+        self._date_state = (ordinal, prefix)
+        return prefix
+
+    def format(self, dt: datetime.datetime) -> str:
+        ordinal = dt.toordinal()
+        second_key = (ordinal, dt.hour, dt.minute, dt.second, dt.fold)
+        state = self._second_state
+        # 带 %z %Z 时时区对象也要是同一个，pytz 的不同偏移是不同的 tzinfo 对象。
+        if state[0] == second_key and (not self._zone_in_head or state[1] is dt.tzinfo):
+            head = state[2]
+        else:
+            head = self._get_date_prefix(dt, ordinal)
+            if self._second_emitters:
+                head += ''.join([emitter(dt) for emitter in self._second_emitters])
+            self._second_state = (second_key, dt.tzinfo, head)
+        if self._tail_emitters:
+            return head + ''.join([emitter(dt) for emitter in self._tail_emitters])
+        return head
+
+
+def _tokenize(formatter: str) -> typing.Optional[typing.List[typing.Tuple[bool, str]]]:
+    tokens = []
+    literal = []
+    i = 0
+    length = len(formatter)
+    while i < length:
+        char = formatter[i]
+        if char != '%':
+            literal.append(char)
+            i += 1
+            continue
+        if i + 1 >= length:
+            return None
+        directive = formatter[i + 1]
+        i += 2
+        if directive == '%':
+            literal.append('%')
+            continue
+        if directive not in _DIRECTIVE_EMITTERS:
+            return None
+        if literal:
+            tokens.append((False, ''.join(literal)))
+            literal = []
+        tokens.append((True, directive))
+    if literal:
+        tokens.append((False, ''.join(literal)))
+    return tokens
+
+
+@functools.lru_cache(maxsize=256)
+def get_compiled_str_formatter(formatter: str) -> typing.Optional[CompiledStrFormatter]:
+    """每个 formatter 只编译一次，不支持的 formatter 返回None"""
+    tokens = _tokenize(formatter)
+    if tokens is None:
+        return None
+    return CompiledStrFormatter(formatter, tokens)
+
+
+def format_datetime(dt: datetime.datetime, formatter: str) -> str:
+    """等价于 dt.strftime(formatter)，能预编译的 formatter 走预编译格式化器"""
+    compiled_str_formatter = get_compiled_str_formatter(formatter)
+    if compiled_str_formatter is None:
+        return dt.strftime(formatter)
+    return compiled_str_formatter.format(dt)
@@ -0,0 +1,150 @@
+"""
+时间序列的惰性生成，NbTime.range / NbTime.span_iter 的实现。
+
+不是每一步都调用 NbTime.shift 重新走一遍构造函数，而是增量计算:
+  秒 分 时 这些固定长度的单位在 utc 微秒时间戳上累加，再转成本时区的时间，夏令时切换前后间隔仍然是准确的1小时；
+  天 周 月 年 按本时区的墙上时间计算，夏令时切换的那天也是每天0点，再按 time_zone_obj localize 。
+
+    for nb_time in NbTime.range('2024-03-09 00:00:00', '2024-03-12 00:00:00', unit='days', time_zone='America/New_York'):
+        print(nb_time)
+    ts_list = list(NbTime.range(start, end, step=15, unit='minutes', output='timestamp'))
+"""
+import datetime
+import typing
+
+from nb_time import NbTime, datetime_to_epoch_us, epoch_us_to_datetime
+from nb_time.str_formatter import format_datetime
+
+US_PER_SECOND = 1000000
+
+FIXED_UNIT_US = {
+    'microseconds': 1,
+    'milliseconds': 1000,
+    'seconds': US_PER_SECOND,
+    'minutes': 60 * US_PER_SECOND,
+    'hours': 3600 * US_PER_SECOND,
+}
+CALENDAR_UNITS = ('days', 'weeks', 'months', 'years')
+UNITS = tuple(FIXED_UNIT_US) + CALENDAR_UNITS
+
+OUTPUT_NB_TIME = 'nb_time'
+OUTPUT_DATETIME = 'datetime'
+OUTPUT_TIMESTAMP = 'timestamp'
+OUTPUT_EPOCH_US = 'epoch_us'
+OUTPUT_STR = 'str'  # 按 datetime_formatter 格式化的字符串
+OUTPUTS = (OUTPUT_NB_TIME, OUTPUT_DATETIME, OUTPUT_TIMESTAMP, OUTPUT_EPOCH_US, OUTPUT_STR)
+
+
+def check_unit(unit: str) -> str:
+    if unit in UNITS:
+        return unit
+    if unit + 's' in UNITS:  # 'hour' 'day' 也可以
+        return unit + 's'
+    raise ValueError(f'unit must be one of {UNITS}, got {unit!r}')
+
+
+def localize(naive: datetime.datetime, tz: datetime.tzinfo) -> datetime.datetime:
+    if hasattr(tz, 'localize'):  # pytz 的时区
+        return tz.localize(naive)
+    return naive.replace(tzinfo=tz)
+
+
+def _iter_points(start: datetime.datetime, step: int, unit: str) -> typing.Iterator[
+        typing.Tuple[int, typing.Optional[datetime.datetime]]]:
+    """无限产出 (utc微秒时间戳, datetime) ，固定长度单位的 datetime 是None，用到时再计算"""
+    if unit in FIXED_UNIT_US:
+        step_us = step * FIXED_UNIT_US[unit]
+        epoch_us = datetime_to_epoch_us(start)
+        while True:
+            yield epoch_us, None
+            epoch_us += step_us
+    tz = start.tzinfo
+    wall = start.replace(tzinfo=None)
+    if unit in ('days', 'weeks'):
+        delta = datetime.timedelta(days=step * (7 if unit == 'weeks' else 1))
+        datetime_obj = start
+        while True:
+            yield datetime_to_epoch_us(datetime_obj), datetime_obj
+            wall += delta
+            datetime_obj = localize(wall, tz)
+    from dateutil.relativedelta import relativedelta  # 只有按月 按年走才用到
+    months_step = step * (12 if unit == 'years' else 1)
+    i = 0
+    while True:
+        # 每次都从起点计算，1月31日开始按月走是 2月29日 3月31日，不会一直截断到29日
+        datetime_obj = localize(wall + relativedelta(months=months_step * i), tz) if i else start
+        yield datetime_to_epoch_us(datetime_obj), datetime_obj
+        i += 1
+
+
+class _RangeBuilder:
+    def __init__(self, nb_time_cls: typing.Type[NbTime], start, datetime_formatter: typing.Optional[str],
+                 time_zone: typing.Union[str, datetime.tzinfo, None], step: int, unit: str, output: str):
+        if not isinstance(step, int) or step == 0:
+            raise ValueError(f'step must be a non-zero int, got {step!r}')
+        if output not in OUTPUTS:
+            raise ValueError(f'output must be one of {OUTPUTS}, got {output!r}')
+        self.start = nb_time_cls(start, datetime_formatter=datetime_formatter, time_zone=time_zone)
+        self.step = step
+        self.unit = check_unit(unit)
+        self.output = output
+        self.time_zone_obj = self.start.time_zone_obj
+
+    def to_epoch_us(self, datetimex) -> int:
+        return self.start._build_nb_time(datetimex).epoch_us
+
+    def iter_points(self):
+        return _iter_points(self.start.datetime_obj, self.step, self.unit)
+
+    def convert(self, epoch_us: int, datetime_obj: typing.Optional[datetime.datetime]):
+        output = self.output
+        if output == OUTPUT_EPOCH_US:
+            return epoch_us
+        if output == OUTPUT_TIMESTAMP:
+            return epoch_us / US_PER_SECOND
+        if datetime_obj is None:
+            datetime_obj = epoch_us_to_datetime(epoch_us, self.time_zone_obj)
+        if output == OUTPUT_DATETIME:
+            return datetime_obj
+        if output == OUTPUT_STR:
+            return format_datetime(datetime_obj, self.start.datetime_formatter)
+        return self.start._build_nb_time_from_datetime_obj(datetime_obj)
+
+
+def iter_range(nb_time_cls: typing.Type[NbTime], start, end, step: int = 1, unit: str = 'hours', *,
+               datetime_formatter: str = None,
+               time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+               output: str = OUTPUT_NB_TIME,
+               limit: int = None) -> typing.Iterator:
+    builder = _RangeBuilder(nb_time_cls, start, datetime_formatter, time_zone, step, unit, output)
+    end_us = None if end is None else builder.to_epoch_us(end)
+    if end_us is None and limit is None:
+        raise ValueError('end and limit can not both be None')
+    convert = builder.convert
+    count = 0
+    for epoch_us, datetime_obj in builder.iter_points():
+        if end_us is not None and (epoch_us > end_us if step > 0 else epoch_us < end_us):
+            return
+        if limit is not None and count >= limit:
+            return
+        yield convert(epoch_us, datetime_obj)
+        count += 1
+
+
+def iter_span(nb_time_cls: typing.Type[NbTime], start, end, step: int = 1, unit: str = 'hours', *,
+              datetime_formatter: str = None,
+              time_zone: typing.Union[str, datetime.tzinfo, None] = None,
+              output: str = OUTPUT_NB_TIME) -> typing.Iterator[tuple]:
+    builder = _RangeBuilder(nb_time_cls, start, datetime_formatter, time_zone, step, unit, output)
+    if step < 0:
+        raise ValueError('span_iter step must be positive')
+    end_us = builder.to_epoch_us(end)
+    convert = builder.convert
+    points = builder.iter_points()
+    span_start_us, span_start_dt = next(points)
+    while span_start_us < end_us:
+        span_end_us, span_end_dt = next(points)
+        if span_end_us >= end_us:
+            span_end_us, span_end_dt = end_us, None
+        yield convert(span_start_us, span_start_dt), convert(span_end_us, span_end_dt)
+        span_start_us, span_start_dt = span_end_us, span_end_dt
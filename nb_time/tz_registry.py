@@ -0,0 +1,198 @@
+"""
+时区注册表，把各种写法的时区字符串解析成 tzinfo 对象并缓存。
+
+UTC+8  UTC+08:00  GMT+8  +0800  Etc/GMT-8  Asia/Shanghai 这些别名先规范化成同一个 key (例如 'UTC+08:00')，
+同一个 key 只解析一次，得到的是同一个 tzinfo 对象。
+固定偏移的时区(包括 UTC+05:30 UTC+05:45 这种非整点的)都解析成驻留的 datetime.timezone 单例，不经过 pytz 。
+
+缓存都是有上限的 lru_cache ，多租户服务里面用户输入的时区字符串五花八门也不会无限增长，
+lru_cache 本身是线程安全的，free-threaded 的 python 下也可以多线程并发调用。
+pytz 在第一次解析命名时区时才导入，只用 UTC UTC+8 Asia/Shanghai 这些固定偏移时区的程序不需要导入 pytz 。
+"""
+import datetime
+import functools
+import re
+import time
+import typing
+
+try:
+    import zoneinfo
+except ImportError:  # python3.9 以下
+    zoneinfo = None
+
+TZ_EAST_8 = datetime.timezone(datetime.timedelta(hours=8),
+                              name='UTC+08:00')  # 这种性能比pytz 'Asia/Shanghai' 性能高很多。但pytz可以处理历史夏令时。
+TZ_UTC = datetime.timezone.utc
+
+CANONICAL_UTC = 'UTC'
+
+# UTC+8  UTC+08:00  UTC-0530  GMT+8 ，GMT+8 和 UTC+8 一样当作东8区。
+# 兼容以前的宽松写法: 没有符号的 UTC8 UTC 8 当作东8区，冒号后面的分钟可以是一位 UTC+8:5
+_UTC_OFFSET_PATTERN = re.compile(r'(?:UTC|GMT)\s*([+-]?)\s*(\d{1,2})(?::(\d{1,2})|(\d{2}))?', re.IGNORECASE)
+# +0800  -05:30 ，和 %z 的格式一样
+_NUMERIC_OFFSET_PATTERN = re.compile(r'([+-])(\d{2}):?(\d{2})')
+# pytz 的 Etc/GMT 系列，符号和直觉相反，Etc/GMT-8 是东8区
+_ETC_GMT_PATTERN = re.compile(r'Etc/GMT([+-])(\d{1,2})', re.IGNORECASE)
+_MAX_OFFSET_MINUTES = 24 * 60  # datetime.timezone 要求偏移小于24小时
+_CANONICAL_OFFSET_PATTERN = re.compile(r'UTC([+-])(\d{2}):([0-5]\d)')
+_UTC_ALIASES = frozenset(['utc', 'gmt', 'z', 'etc/utc', 'etc/gmt', 'etc/gmt0', 'etc/gmt+0', 'etc/gmt-0', 'gmt0',
+                          'utc+0', 'utc-0', 'gmt+0', 'gmt-0', 'utc+00:00', 'utc-00:00', 'gmt+00:00', 'gmt-00:00'])
+_SHANGHAI_ALIASES = frozenset(['asia/shanghai'])  # 按照历史习惯直接当作固定的东8区
+
+TZ_BACKEND_PYTZ = 'pytz'
+TZ_BACKEND_ZONEINFO = 'zoneinfo'  # 标准库 zoneinfo ，不需要 pytz 的 localize normalize ，构造和 astimezone 更快
+TZ_BACKEND_FIXED = 'fixed'  # 命名时区解析成当前时刻的固定偏移 datetime.timezone ，最快，但是不处理夏令时切换
+TZ_BACKENDS = (TZ_BACKEND_PYTZ, TZ_BACKEND_ZONEINFO, TZ_BACKEND_FIXED)
+
+# 时区偏移按15分钟分桶缓存，现实中所有的夏令时切换时刻都是对齐到15分钟的。
+OFFSET_BUCKET_SECONDS = 900
+
+
+def _format_canonical_offset(offset_minutes: int) -> str:
+    if offset_minutes == 0:
+        return CANONICAL_UTC
+    sign = '-' if offset_minutes < 0 else '+'
+    hours, minutes = divmod(abs(offset_minutes), 60)
+    return f'UTC{sign}{hours:02d}:{minutes:02d}'
+
+
+def _format_offset_key(time_zone_strip: str, sign: int, hours: str, minutes: typing.Optional[str]) -> str:
+    hours_int, minutes_int = int(hours), int(minutes or 0)
+    if minutes_int >= 60 or hours_int * 60 + minutes_int >= _MAX_OFFSET_MINUTES:
+        return time_zone_strip  # 不合法的偏移原样返回，按命名时区解析时报错
+    return _format_canonical_offset(sign * (hours_int * 60 + minutes_int))
+
+
+@functools.lru_cache(maxsize=None)
+def get_fixed_offset_time_zone(offset_minutes: int) -> datetime.timezone:
+    """同一个偏移永远返回同一个 datetime.timezone 对象，切换 backend 清空缓存以后也一样，偏移最多 2*24*60 种"""
+    if offset_minutes == 480:
+        return TZ_EAST_8
+    if offset_minutes == 0:
+        return TZ_UTC
+    return datetime.timezone(datetime.timedelta(minutes=offset_minutes), name=_format_canonical_offset(offset_minutes))
+
+
+def _parse_canonical_offset(canonical_key: str) -> typing.Optional[int]:
+    """'UTC+08:00' -> 480 ，不是偏移格式的 key 返回None"""
+    if canonical_key == CANONICAL_UTC:
+        return 0
+    match = _CANONICAL_OFFSET_PATTERN.fullmatch(canonical_key)
+    if match is None:
+        return None
+    offset_minutes = int(match.group(2)) * 60 + int(match.group(3))
+    if offset_minutes >= _MAX_OFFSET_MINUTES:  # normalize 不认识原样返回的 UTC+25:00
+        return None
+    return -offset_minutes if match.group(1) == '-' else offset_minutes
+
+
+class TimeZoneRegistry:
+    """ 时区注册表，NbTime.build_pytz_timezone 通过它解析时区 """
+
+    def __init__(self, maxsize: int = 4096, backend: str = TZ_BACKEND_PYTZ):
+        self.maxsize = maxsize
+        self.backend = backend
+        # 原始字符串 -> tzinfo ，以及规范化 key -> tzinfo 两级缓存，别名最终得到同一个 tzinfo 对象
+        self._get_time_zone_by_str = functools.lru_cache(maxsize=maxsize)(self._resolve_time_zone_str)
+        self._get_time_zone_by_canonical_key = functools.lru_cache(maxsize=maxsize)(self._build_time_zone)
+        self._get_bucket_utcoffset = functools.lru_cache(maxsize=maxsize * 4)(self._compute_bucket_utcoffset)
+
+    @staticmethod
+    def normalize(time_zone: str) -> str:
+        """把时区字符串的各种别名规范化成同一个 key ，偏移类的统一成 'UTC+08:00' 这种格式，其他的原样返回"""
+        time_zone_strip = time_zone.strip()
+        time_zone_lower = time_zone_strip.lower()
+        if time_zone_lower in _UTC_ALIASES:
+            return CANONICAL_UTC
+        if time_zone_lower in _SHANGHAI_ALIASES:
+            return _format_canonical_offset(480)
+        match = _UTC_OFFSET_PATTERN.fullmatch(time_zone_strip)
+        if match:
+            sign = -1 if match.group(1) == '-' else 1
+            return _format_offset_key(time_zone_strip, sign, match.group(2), match.group(3) or match.group(4))
+        match = _NUMERIC_OFFSET_PATTERN.fullmatch(time_zone_strip)
+        if match:
+            sign = -1 if match.group(1) == '-' else 1
+            return _format_offset_key(time_zone_strip, sign, match.group(2), match.group(3))
+        match = _ETC_GMT_PATTERN.fullmatch(time_zone_strip)
+        if match:
+            sign = 1 if match.group(1) == '-' else -1
+            return _format_offset_key(time_zone_strip, sign, match.group(2), None)
+        return time_zone_strip
+
+    def _resolve_time_zone_str(self, time_zone: str) -> datetime.tzinfo:
+        return self._get_time_zone_by_canonical_key(self.normalize(time_zone))
+
+    def set_backend(self, backend: str):
+        """命名时区(例如 America/New_York)用什么解析: 'pytz' 'zoneinfo' 'fixed' """
+        if backend not in TZ_BACKENDS:
+            raise ValueError(f'tz backend must be one of {TZ_BACKENDS}, got {backend!r}')
+        if backend == TZ_BACKEND_ZONEINFO and zoneinfo is None:
+            raise ValueError('zoneinfo backend requires python3.9+')
+        self.backend = backend
+        self.cache_clear()
+
+    def _build_named_time_zone(self, name: str) -> datetime.tzinfo:
+        if self.backend == TZ_BACKEND_ZONEINFO:
+            try:
+                return zoneinfo.ZoneInfo(name)
+            except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+                # zoneinfo 区分大小写，pytz 不区分，用 pytz 找到规范的名字再试一次
+                import pytz
+                return zoneinfo.ZoneInfo(pytz.timezone(name).zone)
+        import pytz
+        pytz_timezone = pytz.timezone(name)
+        if self.backend == TZ_BACKEND_FIXED:
+            offset = datetime.datetime.now(tz=pytz_timezone).utcoffset()
+            return datetime.timezone(offset, name=name)
+        return pytz_timezone
+
+    def _build_time_zone(self, canonical_key: str) -> datetime.tzinfo:
+        offset_minutes = _parse_canonical_offset(canonical_key)
+        if offset_minutes is None:
+            return self._build_named_time_zone(canonical_key)
+        # 固定偏移的时区转化为内置的timezone类型，比pytz性能高很多。以前 pytz backend 转成 Etc/GMT-5 会丢掉 UTC+05:30 的分钟。
+        return get_fixed_offset_time_zone(offset_minutes)
+
+    def get_time_zone(self, time_zone: typing.Union[str, datetime.tzinfo]) -> datetime.tzinfo:
+        if isinstance(time_zone, datetime.tzinfo):
+            return time_zone
+        return self._get_time_zone_by_str(time_zone)
+
+    @staticmethod
+    def get_fixed_utcoffset(tz: datetime.tzinfo) -> typing.Optional[datetime.timedelta]:
+        """固定偏移的时区(datetime.timezone, pytz 的 Etc/GMT-7 UTC 等)返回偏移，有夏令时的时区返回None"""
+        try:
+            return tz.utcoffset(None)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _compute_bucket_utcoffset(tz: datetime.tzinfo, bucket: int) -> datetime.timedelta:
+        return datetime.datetime.fromtimestamp(bucket * OFFSET_BUCKET_SECONDS, tz=tz).utcoffset()
+
+    def get_utcoffset(self, time_zone: typing.Union[str, datetime.tzinfo],
+                      timestamp: typing.Optional[float] = None) -> datetime.timedelta:
+        """时区在某个时刻(默认现在)的utc偏移，固定偏移的时区直接返回，有夏令时的时区按 (时区, 15分钟桶) 缓存"""
+        tz = self.get_time_zone(time_zone)
+        offset = self.get_fixed_utcoffset(tz)
+        if offset is not None:
+            return offset
+        if timestamp is None:
+            timestamp = time.time()
+        return self._get_bucket_utcoffset(tz, int(timestamp // OFFSET_BUCKET_SECONDS))
+
+    def cache_clear(self):
+        self._get_time_zone_by_str.cache_clear()
+        self._get_time_zone_by_canonical_key.cache_clear()
+        self._get_bucket_utcoffset.cache_clear()
+
+    def cache_info(self) -> dict:
+        return {
+            'time_zone_str': self._get_time_zone_by_str.cache_info(),
+            'canonical_key': self._get_time_zone_by_canonical_key.cache_info(),
+            'utcoffset': self._get_bucket_utcoffset.cache_info(),
+        }
+
+
+time_zone_registry = TimeZoneRegistry()
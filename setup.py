@@ -11,7 +11,7 @@ filepath = 'README.md'
 print(filepath)
 
 
-extra_requires = {}
+extra_requires = {'numpy': ['numpy']}  # NbTimeArray 等批量计算功能需要
 install_requires = [
     'tzlocal',
     'pytz',
@@ -0,0 +1,35 @@
+import random
+import time
+
+import dateutil.parser
+
+from nb_time import NbTime
+from nb_time.adaptive_parser import adaptive_str_parser
+
+N = 50000
+random.seed(0)
+cases = {
+    '20230506T010203.886 +08:00': [
+        f'2023{random.randint(1, 12):02d}{random.randint(1, 28):02d}T{random.randint(0, 23):02d}'
+        f'{random.randint(0, 59):02d}{random.randint(0, 59):02d}.{random.randint(0, 999):03d} +08:00' for _ in range(N)],
+    'Jun 12 2024 10:30AM': [
+        f'Jun {random.randint(10, 28)} 2024 {random.randint(10, 12)}:{random.randint(10, 59)}AM' for _ in range(N)],
+}
+
+for name, time_strs in cases.items():
+    t1 = time.time()
+    expected = [dateutil.parser.parse(time_str) for time_str in time_strs]
+    t_dateutil = time.time() - t1
+    adaptive_str_parser.cache_clear()
+    t1 = time.time()
+    result = [adaptive_str_parser.parse(time_str) for time_str in time_strs]
+    t_adaptive = time.time() - t1
+    assert result == expected
+    print(f'{name:28} {N}次 dateutil {t_dateutil:.3f}s  自适应解析 {t_adaptive:.3f}s  '
+          f'学到的格式 {adaptive_str_parser.get_learned_formatter(time_strs[0])}')
+
+t1 = time.time()
+for time_str in cases['20230506T010203.886 +08:00']:
+    NbTime(time_str, time_zone='UTC+8')
+print(f'NbTime(混合格式字符串) {N}次 {time.time() - t1:.3f}s')
+print(adaptive_str_parser.cache_info())
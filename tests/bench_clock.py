@@ -0,0 +1,34 @@
+import datetime
+import time
+
+from nb_time import NbTime, NowTimeStrCache
+from nb_time.clock import CoarseClock, MonotonicClock
+
+n = 1000000
+
+
+def bench(name, func):
+    t1 = time.perf_counter()
+    for _ in range(n):
+        func()
+    print(f'{name:52} {n}次 {time.perf_counter() - t1:.3f}s')
+
+
+bench('datetime.datetime.now(tz=UTC+8)', lambda: datetime.datetime.now(tz=NbTime.TIMEZONE_TZ_EAST_8))
+bench('NbTime(time_zone=UTC+8)', lambda: NbTime(time_zone='UTC+8'))
+bench('NbTime.now_fast(UTC+8)', lambda: NbTime.now_fast('UTC+8'))
+bench('NowTimeStrCache.fast_get_now_time_str(UTC+8)', lambda: NowTimeStrCache.fast_get_now_time_str('UTC+8'))
+
+NbTime.set_clock(MonotonicClock())
+bench('MonotonicClock NbTime.now_fast(UTC+8)', lambda: NbTime.now_fast('UTC+8'))
+
+coarse_clock = CoarseClock(resolution=0.001)
+NbTime.set_clock(coarse_clock)
+bench('CoarseClock(毫秒) NbTime.now_fast(UTC+8)', lambda: NbTime.now_fast('UTC+8'))
+bench('CoarseClock(毫秒) NowTimeStrCache(UTC+8)', lambda: NowTimeStrCache.fast_get_now_time_str('UTC+8'))
+
+coarse_clock.start_ticker()
+bench('CoarseClock(毫秒,后台线程刷新) NbTime.now_fast(UTC+8)', lambda: NbTime.now_fast('UTC+8'))
+bench('CoarseClock(毫秒,后台线程刷新) NowTimeStrCache(UTC+8)', lambda: NowTimeStrCache.fast_get_now_time_str('UTC+8'))
+coarse_clock.stop_ticker()
+NbTime.set_clock(None)
@@ -0,0 +1,27 @@
+import datetime
+import time
+
+from nb_time import NbTime
+
+n = 200000
+
+
+def bench(name, func):
+    t1 = time.perf_counter()
+    for _ in range(n):
+        func()
+    print(f'{name:62} {n}次 {time.perf_counter() - t1:.3f}s')
+
+
+for time_zone in ['UTC+8', 'America/New_York']:
+    time_zone_obj = NbTime.build_pytz_timezone(time_zone)
+    last_request_ts = time.time() - 3600
+    bench(f'{time_zone} 以前的写法 now().replace(hour=0) 再构造 NbTime',
+          lambda: NbTime(datetime.datetime.now(tz=time_zone_obj).replace(hour=0, minute=0, second=0, microsecond=0),
+                         time_zone=time_zone).timestamp)
+    bench(f'{time_zone} NbTime().today_zero_timestamp', lambda: NbTime(time_zone=time_zone).today_zero_timestamp)
+    bench(f'{time_zone} NbTime.day_start_ts()', lambda: NbTime.day_start_ts(time_zone=time_zone))
+    bench(f'{time_zone} NbTime.is_same_day(last_request_ts)',
+          lambda: NbTime.is_same_day(last_request_ts, time_zone=time_zone))
+    nb_time = NbTime(time_zone=time_zone)
+    bench(f'{time_zone} nb_time.same_day_zero', lambda: nb_time.same_day_zero)
@@ -0,0 +1,39 @@
+import datetime
+import time
+
+import pytz
+
+from nb_time import NbTime
+from nb_time.tz_registry import time_zone_registry
+
+N = 20000
+time_zones = ['UTC-12', 'UTC-11', 'UTC-10', 'UTC-09:30', 'UTC-9', 'UTC-8', 'UTC-7', 'UTC-6', 'UTC-5', 'UTC-4',
+              'UTC-03:30', 'UTC-3', 'UTC-2', 'UTC-1', 'UTC', 'UTC+1', 'UTC+2', 'UTC+3', 'UTC+03:30', 'UTC+4',
+              'UTC+04:30', 'UTC+5', 'UTC+05:30', 'UTC+05:45', 'UTC+6', 'UTC+06:30', 'UTC+7', 'UTC+8', 'UTC+08:45',
+              'UTC+9', 'UTC+09:30', 'UTC+10', 'UTC+10:30', 'UTC+11', 'UTC+12', 'UTC+12:45', 'UTC+13', 'UTC+14',
+              'GMT+5', '+0530', 'Etc/GMT-3']
+
+# 以前 pytz backend 把 UTC+N 转成 Etc/GMT-N ，分钟被丢掉
+old_tzs = {time_zone: pytz.timezone(f'Etc/GMT{-int(time_zone_registry.get_utcoffset(time_zone).total_seconds() / 3600):+d}')
+           for time_zone in time_zones}
+
+total_new = total_old = 0
+for time_zone in time_zones:
+    tz = time_zone_registry.get_time_zone(time_zone)
+    assert isinstance(tz, datetime.timezone) and tz is time_zone_registry.get_time_zone(time_zone)
+    old_tz = old_tzs[time_zone]
+    t1 = time.time()
+    for i in range(N):
+        NbTime(1709192429 + i, time_zone=time_zone)
+    t_new = time.time() - t1
+    t1 = time.time()
+    for i in range(N):
+        NbTime(1709192429 + i, time_zone=old_tz)
+    t_old = time.time() - t1
+    total_new += t_new
+    total_old += t_old
+    offset_ok = NbTime(1709192429, time_zone=time_zone).datetime_obj.utcoffset() == tz.utcoffset(None)
+    old_offset_ok = datetime.datetime.fromtimestamp(0, old_tz).utcoffset() == tz.utcoffset(None)
+    print(f'{time_zone:12} {N}次 构造 datetime.timezone {t_new:.3f}s  pytz Etc/GMT {t_old:.3f}s  '
+          f'偏移正确 {offset_ok}  Etc/GMT 偏移正确 {old_offset_ok}')
+print(f'{len(time_zones)}个固定偏移时区合计 datetime.timezone {total_new:.3f}s  pytz Etc/GMT {total_old:.3f}s')
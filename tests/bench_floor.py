@@ -0,0 +1,44 @@
+import random
+import time
+
+import arrow
+import numpy as np
+
+from nb_time import NbTime
+from nb_time.bucketing import bucket_many
+
+random.seed(0)
+n = 50000
+# 聚合任务的事件时间一般集中在最近一段时间，这里是90天内，跨过了一次夏令时切换
+timestamps = [random.randint(1709000000, 1709000000 + 90 * 86400) for _ in range(n)]
+for time_zone in ['UTC+8', 'America/New_York']:
+    nb_times = [NbTime(ts, time_zone=time_zone) for ts in timestamps]
+    for unit in ['minute', 'hour', 'day', 'month']:
+        t1 = time.time()
+        arrow_result = [arrow.get(nb_time.datetime_obj).floor(unit).timestamp() for nb_time in nb_times]
+        t_arrow = time.time() - t1
+
+        t1 = time.time()
+        floor_result = [nb_time.floor(unit).timestamp for nb_time in nb_times]
+        t_floor = time.time() - t1
+        # arrow 对夏令时结束时第二次出现的 01:xx 取整到了第一次的 01:00 ，比原时间还早，这几个不一样是正常的
+        diff_count = sum(a != b for a, b in zip(floor_result, arrow_result))
+        print(f'{time_zone:18} {n}次 floor({unit!r:8})  arrow.floor {t_arrow:.3f}s  NbTime.floor {t_floor:.3f}s  '
+              f'和arrow不同 {diff_count}个')
+
+    for interval in ['5min', '1h', '1d']:
+        t1 = time.time()
+        loop_result = [nb_time.bucket(interval).timestamp for nb_time in nb_times]
+        t_loop = time.time() - t1
+
+        t1 = time.time()
+        list_result = bucket_many(timestamps, interval, time_zone)
+        t_list = time.time() - t1
+
+        ts_array = np.array(timestamps * 20, dtype=np.int64)
+        t1 = time.time()
+        array_result = bucket_many(ts_array, interval, time_zone)
+        t_array = time.time() - t1
+        assert loop_result == list_result == array_result[:n].tolist()
+        print(f'{time_zone:18} bucket({interval!r:6})  {n}次 NbTime.bucket {t_loop:.3f}s  '
+              f'bucket_many(list) {t_list:.3f}s  {len(ts_array)}个 bucket_many(numpy) {t_array:.3f}s')
@@ -0,0 +1,41 @@
+import random
+import time
+
+import arrow
+
+from nb_time import NbTime
+
+random.seed(0)
+n = 50000
+now_ts = time.time()
+for time_zone in ['UTC+8', 'America/New_York']:
+    nb_times = [NbTime(now_ts - random.randint(0, 86400 * 400), time_zone=time_zone) for _ in range(n)]
+
+    t1 = time.time()
+    arrow_result = [arrow.get(nb_time.datetime_obj) for nb_time in nb_times]
+    t_arrow_get = time.time() - t1
+
+    t1 = time.time()
+    to_arrow_result = [nb_time.to_arrow() for nb_time in nb_times]
+    t_to_arrow = time.time() - t1
+    # arrow.get 处理 pytz 时间时按名字重新解析时区，夏令时结束时第二次出现的 01:xx 会错1小时，to_arrow 按 utc 时刻转换不会错
+    assert [a.timestamp() for a in to_arrow_result] == [nb_time.timestamp for nb_time in nb_times]
+    arrow_get_diff_count = sum(a.timestamp() != nb_time.timestamp for a, nb_time in zip(arrow_result, nb_times))
+
+    reference = NbTime(now_ts, time_zone=time_zone)
+    reference_arrow = reference.to_arrow()
+    t1 = time.time()
+    arrow_humanize_result = [nb_time.to_arrow().humanize(reference_arrow) for nb_time in nb_times]
+    t_arrow_humanize = time.time() - t1
+
+    t1 = time.time()
+    humanize_result = [nb_time.humanize(reference) for nb_time in nb_times]
+    t_humanize = time.time() - t1
+
+    t1 = time.time()
+    humanize_many_result = NbTime.humanize_many(nb_times, reference=reference)
+    t_humanize_many = time.time() - t1
+    assert arrow_humanize_result == humanize_result == humanize_many_result
+    print(f'{time_zone:18} {n}次  arrow.get {t_arrow_get:.3f}s  to_arrow {t_to_arrow:.3f}s  '
+          f'arrow humanize {t_arrow_humanize:.3f}s  NbTime.humanize {t_humanize:.3f}s  '
+          f'NbTime.humanize_many {t_humanize_many:.3f}s  arrow.get 时间不对的 {arrow_get_diff_count}个')
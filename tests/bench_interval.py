@@ -0,0 +1,59 @@
+import random
+import time
+
+import numpy as np
+
+from nb_time import NbTime
+from nb_time.interval import IntervalSet
+
+N = 100000
+N_QUERIES = 2000
+t0 = 1709192429
+starts = [t0 + random.random() * 86400 * 30 for _ in range(N)]
+pairs = [(start, start + random.random() * 60) for start in starts]
+queries = [t0 + random.random() * 86400 * 30 for _ in range(N_QUERIES)]
+
+# 以前的做法: NbTime 对列表，排序合并和逐个判断
+nb_time_pairs = [(NbTime(a, time_zone='UTC+8'), NbTime(b, time_zone='UTC+8')) for a, b in pairs]
+t1 = time.time()
+merged = []
+for a, b in sorted(nb_time_pairs, key=lambda pair: pair[0].timestamp):
+    if merged and a.timestamp <= merged[-1][1]:
+        merged[-1][1] = max(merged[-1][1], b.timestamp)
+    else:
+        merged.append([a.timestamp, b.timestamp])
+covered_seconds = sum(b - a for a, b in merged)
+t_merge = time.time() - t1
+t1 = time.time()
+expected = [[i for i, (a, b) in enumerate(pairs) if a <= q < b] for q in queries[:200]]
+t_stab = (time.time() - t1) * N_QUERIES / 200
+print(f'NbTime对列表 {N}个区间 排序合并求时长 {t_merge:.3f}s  {N_QUERIES}次 stab (线性扫描估算) {t_stab:.3f}s')
+
+t1 = time.time()
+interval_set = IntervalSet(nb_time_pairs, time_zone='UTC+8')
+t_build = time.time() - t1
+pairs_us = np.round(np.asarray(pairs) * 1000000).astype(np.int64)
+t1 = time.time()
+interval_set_from_us = IntervalSet.from_epoch_us(pairs_us[:, 0], pairs_us[:, 1], time_zone='UTC+8')
+t_build_us = time.time() - t1
+t1 = time.time()
+duration = interval_set.duration
+t_duration = time.time() - t1
+t1 = time.time()
+stabbed = [interval_set.stab(q) for q in queries]
+t_stab_set = time.time() - t1
+t1 = time.time()
+counts = interval_set.count_at(np.asarray(queries))
+t_count = time.time() - t1
+print(f'IntervalSet 从NbTime对构造 {t_build:.3f}s  从微秒数组构造 {t_build_us:.4f}s  duration {t_duration:.4f}s  '
+      f'{N_QUERIES}次 stab {t_stab_set:.3f}s  批量 count_at {t_count:.4f}s')
+assert abs(duration.total_seconds() - covered_seconds) < 1e-3 * len(merged)
+assert [sorted(p.tolist()) for p in stabbed[:200]] == expected
+assert counts.tolist() == [len(p) for p in stabbed]
+
+other = IntervalSet.from_epoch_us(interval_set.starts_us[::2] + 20000000, interval_set.ends_us[::2] + 20000000,
+                                  time_zone='UTC+8')
+for name in ['union', 'intersect', 'subtract']:
+    t1 = time.time()
+    result = getattr(interval_set, name)(other)
+    print(f'IntervalSet {name} {N}+{len(other)}个区间 {time.time() - t1:.4f}s  结果{len(result)}个区间 覆盖 {result.duration}')
@@ -0,0 +1,38 @@
+import logging
+import time
+
+from nb_time import NbTime
+from nb_time.log_formatter import NbTimeFormatter
+
+N = 200000
+fmt = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 5万条每秒的日志，相邻两条的 created 相差20微秒
+t0 = time.time()
+records = []
+for i in range(N):
+    record = logging.LogRecord('bench', logging.INFO, __file__, 1, 'hello %s', (i,), None)
+    record.created = t0 + i * 0.00002
+    record.msecs = int((record.created - int(record.created)) * 1000) + 0.0
+    records.append(record)
+
+local_time_zone = NbTime.get_localzone_name()
+cases = [
+    ('logging.Formatter', logging.Formatter(fmt)),
+    ('NbTimeFormatter', NbTimeFormatter(fmt, time_zone=local_time_zone)),
+    ('logging.Formatter datefmt', logging.Formatter(fmt, datefmt='%Y-%m-%d %H:%M:%S')),
+    ('NbTimeFormatter datefmt', NbTimeFormatter(fmt, datefmt='%Y-%m-%d %H:%M:%S', time_zone=local_time_zone)),
+]
+for name, formatter in cases:
+    t1 = time.time()
+    for record in records:
+        formatter.formatTime(record, formatter.datefmt)
+    t_format_time = time.time() - t1
+    t1 = time.time()
+    for record in records:
+        formatter.format(record)
+    t_format = time.time() - t1
+    print(f'{name:28} {N}条 formatTime {t_format_time:.3f}s ({N / t_format_time:,.0f}/s)  '
+          f'format {t_format:.3f}s ({N / t_format:,.0f}/s)')
+
+assert cases[0][1].format(records[-1]) == cases[1][1].format(records[-1])
@@ -0,0 +1,31 @@
+import random
+import time
+
+from nb_time import NbTime
+from nb_time.nb_time_array import NbTimeArray
+
+N = 200000
+timestamps = [1709192429 + random.randint(0, 86400 * 365) + random.random() for _ in range(N)]
+time_strs = [NbTime(ts, time_zone='UTC+8', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE).datetime_str
+             for ts in timestamps[:N // 10]] * 10
+
+for time_zone in ['UTC+8', 'Asia/Shanghai', 'America/New_York']:
+    t1 = time.time()
+    loop_result = [NbTime(ts, time_zone=time_zone).shift(hours=1).get_str(NbTime.FORMATTER_DATETIME_NO_ZONE)
+                   for ts in timestamps]
+    t_loop = time.time() - t1
+
+    t1 = time.time()
+    arr_result = NbTimeArray(timestamps, time_zone=time_zone).shift(hours=1).get_str(
+        NbTime.FORMATTER_DATETIME_NO_ZONE)
+    t_arr = time.time() - t1
+    assert loop_result == arr_result
+    print(f'{time_zone:20} timestamp->shift->get_str  {N} 个, NbTime循环 {t_loop:.3f}s  NbTimeArray {t_arr:.3f}s')
+
+t1 = time.time()
+[NbTime(s, time_zone='UTC+8', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE).timestamp for s in time_strs]
+t_loop = time.time() - t1
+t1 = time.time()
+NbTimeArray(time_strs, time_zone='UTC+8', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE).timestamp
+t_arr = time.time() - t1
+print(f'{"UTC+8":20} str->timestamp  {N} 个, NbTime循环 {t_loop:.3f}s  NbTimeArray {t_arr:.3f}s')
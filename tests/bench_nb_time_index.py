@@ -0,0 +1,57 @@
+import bisect
+import random
+import time
+
+import numpy as np
+
+from nb_time import NbTime
+from nb_time.nb_time_index import NbTimeIndex
+
+N_TICKS = 100000
+N_EVENTS = 50000
+t0 = 1709192429
+tick_timestamps = [t0 + random.random() * 86400 for _ in range(N_TICKS)]
+event_timestamps = [t0 + random.random() * 90000 - 3600 for _ in range(N_EVENTS)]
+
+# 以前的做法: NbTime 列表排序，每次比较都重新计算时间戳，再逐个二分
+tick_nb_times = [NbTime(ts, time_zone='UTC+8') for ts in tick_timestamps]
+t1 = time.time()
+sorted_ticks = sorted(tick_nb_times)
+t_sort = time.time() - t1
+t1 = time.time()
+sorted_tick_ts = [nb_time.timestamp for nb_time in sorted_ticks]
+expected = []
+for event_ts in event_timestamps:
+    loc = bisect.bisect_right(sorted_tick_ts, event_ts) - 1
+    expected.append(sorted_ticks[loc].timestamp if loc >= 0 else None)
+t_bisect = time.time() - t1
+print(f'NbTime列表 sorted {N_TICKS}个 {t_sort:.3f}s  逐个 bisect {N_EVENTS}个事件 {t_bisect:.3f}s')
+
+t1 = time.time()
+index = NbTimeIndex(tick_nb_times, time_zone='UTC+8')
+t_build = time.time() - t1
+t1 = time.time()
+index_from_ts = NbTimeIndex(np.asarray(tick_timestamps), time_zone='UTC+8')
+t_build_ts = time.time() - t1
+t1 = time.time()
+positions = index_from_ts.asof_join(np.asarray(event_timestamps))
+t_join = time.time() - t1
+print(f'NbTimeIndex 从NbTime构造 {t_build:.3f}s  从时间戳数组构造 {t_build_ts:.3f}s  asof_join {N_EVENTS}个事件 {t_join:.4f}s')
+assert np.array_equal(index.epoch_us, index_from_ts.epoch_us)
+actual = [round(tick_timestamps[p], 6) if p >= 0 else None for p in positions.tolist()]
+assert actual == [round(ts, 6) if ts is not None else None for ts in expected]
+
+# 流式追加，每次追加100个
+stream = NbTimeIndex(time_zone='UTC+8')
+batches = np.sort(np.asarray(tick_timestamps)).reshape(-1, 100)
+t1 = time.time()
+for batch in batches:
+    stream = stream.append(batch)
+t_append = time.time() - t1
+assert np.array_equal(stream.epoch_us, index.epoch_us)
+print(f'NbTimeIndex 流式 append {len(batches)}批 共{N_TICKS}个 {t_append:.3f}s')
+
+t1 = time.time()
+for event_ts in event_timestamps[:10000]:
+    index.asof(event_ts)
+print(f'NbTimeIndex 逐个 asof 10000次 {time.time() - t1:.3f}s')
@@ -0,0 +1,40 @@
+import os
+import random
+import sys
+import time
+
+from nb_time import NbTime
+from nb_time.parallel import parallel_convert, parallel_format, parallel_parse, shutdown_process_pool
+
+if __name__ == '__main__':
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    max_processes = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    random.seed(0)
+    time_strs = [f'2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d} {random.randint(0, 23):02d}:'
+                 f'{random.randint(0, 59):02d}:{random.randint(0, 59):02d}.{random.randint(0, 999999):06d}'
+                 for _ in range(N)]
+    formatter = '%Y-%m-%d %H:%M:%S.%f'
+
+    expected = None
+    for processes in sorted({1, 2, 4, 8, 16, max_processes}):
+        if processes > max_processes:
+            continue
+        parallel_parse(time_strs[:100000], datetime_formatter=formatter, time_zone='UTC+8', processes=processes)  # 预热进程池
+        t1 = time.time()
+        epoch_us = parallel_parse(time_strs, datetime_formatter=formatter, time_zone='UTC+8', processes=processes)
+        t_parse = time.time() - t1
+        t1 = time.time()
+        strs = parallel_format(epoch_us, datetime_formatter=NbTime.FORMATTER_MILLISECOND, time_zone='America/New_York',
+                               processes=processes)
+        t_format = time.time() - t1
+        t1 = time.time()
+        strs2 = parallel_convert(time_strs, from_formatter=formatter, from_time_zone='UTC+8',
+                                 to_formatter=NbTime.FORMATTER_MILLISECOND, to_time_zone='America/New_York',
+                                 processes=processes)
+        t_convert = time.time() - t1
+        assert strs == strs2
+        if expected is None:
+            expected = strs
+        assert strs == expected
+        print(f'{N}个字符串 {processes:2d}进程  解析 {t_parse:.3f}s  格式化 {t_format:.3f}s  解析+转时区+格式化 {t_convert:.3f}s')
+    shutdown_process_pool()
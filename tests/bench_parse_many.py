@@ -0,0 +1,34 @@
+import random
+import time
+
+from nb_time import NbTime
+
+N = 200000
+random.seed(0)
+time_strs = [f'2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d} '
+             f'{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}' for _ in range(N)]
+for i in range(0, N, 100):
+    time_strs[i] = 'not a time'
+
+t1 = time.time()
+loop_result = []
+for time_str in time_strs:
+    try:
+        loop_result.append(NbTime(time_str, datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE,
+                                  time_zone='UTC+8').timestamp)
+    except Exception:
+        loop_result.append(None)
+t_loop = time.time() - t1
+
+t1 = time.time()
+values, failed_indexes = NbTime.parse_many(time_strs, datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE,
+                                           time_zone='UTC+8', errors='collect', output='timestamp')
+t_parse_many = time.time() - t1
+assert values == loop_result
+assert failed_indexes == list(range(0, N, 100))
+print(f'{N}个字符串(1%解析失败)  循环 NbTime + try/except {t_loop:.3f}s  parse_many {t_parse_many:.3f}s')
+
+t1 = time.time()
+count = sum(1 for value in NbTime.iter_parse_many(iter(time_strs), datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE,
+                                                  time_zone='UTC+8', errors='coerce', output='epoch_us') if value)
+print(f'iter_parse_many 流式 {time.time() - t1:.3f}s  成功 {count}')
@@ -0,0 +1,38 @@
+import pickle
+import time
+
+from nb_time import NbTime
+
+
+class DictPickleNbTime(NbTime):
+    """以前没有 __reduce__ 时 pickle 保存的是整个 __dict__"""
+    __reduce__ = object.__reduce__
+
+
+N = 100000
+nb_times = [NbTime(1709192429 + i, time_zone='Asia/Shanghai') for i in range(N)]
+
+old_nb_times = [DictPickleNbTime(1709192429 + i, time_zone='Asia/Shanghai') for i in range(N)]
+t1 = time.time()
+data = pickle.dumps(old_nb_times)
+t_dump = time.time() - t1
+t1 = time.time()
+pickle.loads(data)
+print(f'__dict__ pickle  {N}个  每个 {len(data) / N:.1f} 字节  dumps {t_dump:.3f}s  loads {time.time() - t1:.3f}s')
+
+t1 = time.time()
+data = pickle.dumps(nb_times)
+t_dump = time.time() - t1
+t1 = time.time()
+assert pickle.loads(data) == nb_times
+print(f'__reduce__ pickle  {N}个  每个 {len(data) / N:.1f} 字节  dumps {t_dump:.3f}s  loads {time.time() - t1:.3f}s')
+
+single = pickle.dumps(nb_times[0])
+print(f'单个对象 pickle {len(single)} 字节 , to_bytes {len(nb_times[0].to_bytes())} 字节')
+
+t1 = time.time()
+datas = [nb_time.to_bytes() for nb_time in nb_times]
+t_dump = time.time() - t1
+t1 = time.time()
+assert [NbTime.from_bytes(data) for data in datas] == nb_times
+print(f'to_bytes/from_bytes {N}个  to_bytes {t_dump:.3f}s  from_bytes {time.time() - t1:.3f}s')
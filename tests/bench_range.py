@@ -0,0 +1,34 @@
+import time
+
+from nb_time import NbTime
+from nb_time.nb_time_array import NbTimeArray
+
+start = '2000-01-01 00:00:00'
+end = '2023-12-31 23:00:00'
+for time_zone in ['UTC+8', 'America/New_York']:
+    t1 = time.time()
+    nb_time = NbTime(start, datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE, time_zone=time_zone)
+    end_nb_time = NbTime(end, datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE, time_zone=time_zone)
+    shift_result = []
+    while nb_time <= end_nb_time:
+        shift_result.append(nb_time.timestamp)
+        nb_time = nb_time.shift(hours=1)
+    t_shift = time.time() - t1
+
+    t1 = time.time()
+    range_result = [nb_time.timestamp for nb_time in NbTime.range(
+        start, end, unit='hours', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE, time_zone=time_zone)]
+    t_range = time.time() - t1
+
+    t1 = time.time()
+    ts_result = list(NbTime.range(start, end, unit='hours', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE,
+                                  time_zone=time_zone, output='timestamp'))
+    t_range_ts = time.time() - t1
+
+    t1 = time.time()
+    arr = NbTimeArray.range(start, end, unit='hours', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE,
+                            time_zone=time_zone)
+    t_array = time.time() - t1
+    assert shift_result == range_result == ts_result == arr.timestamp.tolist()
+    print(f'{time_zone:18} {len(ts_result)}个小时  循环shift {t_shift:.3f}s  NbTime.range {t_range:.3f}s  '
+          f'range(output=timestamp) {t_range_ts:.3f}s  NbTimeArray.range {t_array:.3f}s')
@@ -0,0 +1,19 @@
+import time
+
+from nb_time import NbTime, PopularNbTime
+
+N = 100000
+
+for time_zone in ['UTC+8', 'Asia/Shanghai', 'America/New_York']:
+    nb_time = NbTime(1709192429, time_zone=time_zone)
+    for kw in [dict(hours=1), dict(days=-7), dict(months=1)]:
+        t1 = time.time()
+        for _ in range(N):
+            nb_time.shift(**kw)
+        print(f'{time_zone:20} shift({kw}) {N}次 {time.time() - t1:.3f}s')
+
+popular_nb_time = PopularNbTime(time_zone='UTC+8')
+t1 = time.time()
+for _ in range(N):
+    popular_nb_time.ago_7_days
+print(f'PopularNbTime.ago_7_days {N}次 {time.time() - t1:.3f}s')
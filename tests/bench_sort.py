@@ -0,0 +1,29 @@
+import random
+import sys
+import time
+
+from nb_time import NbTime
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+nb_times = [NbTime(1709192429 + random.randint(0, 86400 * 365), time_zone='UTC+8') for _ in range(N)]
+
+t1 = time.time()
+sorted(nb_times, key=lambda x: x.timestamp)
+print(f'{N}个 NbTime 按 timestamp 排序(每次重新计算) {time.time() - t1:.3f}s')
+
+t1 = time.time()
+sorted(nb_times)
+print(f'{N}个 NbTime 直接排序(第一次计算并缓存 epoch_us) {time.time() - t1:.3f}s')
+
+t1 = time.time()
+sorted(nb_times)
+print(f'{N}个 NbTime 直接排序(epoch_us 已缓存) {time.time() - t1:.3f}s')
+
+t1 = time.time()
+sorted(nb_times, key=lambda x: x.epoch_us)
+print(f'{N}个 NbTime 按 epoch_us 排序 {time.time() - t1:.3f}s')
+
+t1 = time.time()
+unique = set(nb_times)
+print(f'{N}个 NbTime set 去重 -> {len(unique)} 个 {time.time() - t1:.3f}s')
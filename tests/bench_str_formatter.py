@@ -0,0 +1,21 @@
+import time
+
+from nb_time import NbTime
+from nb_time.str_formatter import get_compiled_str_formatter
+
+N = 300000
+start_ts = 1709192429
+# 模拟日志: 时间递增，每秒几十条
+datetimes = [NbTime(start_ts + i / 50, time_zone='UTC+8').datetime_obj for i in range(N)]
+
+for formatter in [NbTime.FORMATTER_DATETIME_NO_ZONE, NbTime.FORMATTER_DATETIME, NbTime.FORMATTER_MILLISECOND,
+                  NbTime.FORMATTER_ISO, NbTime.FORMATTER_DATE]:
+    compiled_str_formatter = get_compiled_str_formatter(formatter)
+    t1 = time.time()
+    strftime_result = [dt.strftime(formatter) for dt in datetimes]
+    t_strftime = time.time() - t1
+    t1 = time.time()
+    compiled_result = [compiled_str_formatter.format(dt) for dt in datetimes]
+    t_compiled = time.time() - t1
+    assert strftime_result == compiled_result
+    print(f'{formatter:28} {N}次 strftime {t_strftime:.3f}s  预编译格式化 {t_compiled:.3f}s')
@@ -0,0 +1,32 @@
+import datetime
+import time
+
+from nb_time import NbTime
+from nb_time.str_parser import get_compiled_str_parser
+
+N = 200000
+cases = [
+    ('2024-02-29 07:40:34', NbTime.FORMATTER_DATETIME_NO_ZONE),
+    ('2024-02-29 07:40:34 +0800', NbTime.FORMATTER_DATETIME),
+    ('2024-02-29 07:40:34.123456 +0800', NbTime.FORMATTER_MILLISECOND),
+    ('2024-02-29T07:40:34+0800', NbTime.FORMATTER_ISO),
+    ('23010108', '%y%m%d%H'),
+]
+
+for time_str, formatter in cases:
+    parser = get_compiled_str_parser(formatter)
+    assert parser.parse(time_str) == datetime.datetime.strptime(time_str, formatter)
+    t1 = time.time()
+    for _ in range(N):
+        datetime.datetime.strptime(time_str, formatter)
+    t_strptime = time.time() - t1
+    t1 = time.time()
+    for _ in range(N):
+        parser.parse(time_str)
+    t_compiled = time.time() - t1
+    print(f'{formatter:28} {N}次 strptime {t_strptime:.3f}s  预编译解析 {t_compiled:.3f}s')
+
+t1 = time.time()
+for _ in range(N):
+    NbTime('2024-02-29 07:40:34', datetime_formatter=NbTime.FORMATTER_DATETIME, time_zone='UTC+8')
+print(f'NbTime(str) {N}次 {time.time() - t1:.3f}s')
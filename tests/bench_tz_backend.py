@@ -0,0 +1,26 @@
+import time
+
+from nb_time import NbTime
+
+N = 50000
+time_zones = ['America/New_York', 'Europe/London', 'Asia/Tokyo', 'UTC+7']
+
+for backend in ['pytz', 'zoneinfo', 'fixed']:
+    NbTime.set_tz_backend(backend)
+    for time_zone in time_zones:
+        t1 = time.time()
+        for i in range(N):
+            NbTime(1709192429 + i, time_zone=time_zone)
+        t_construct = time.time() - t1
+
+        nb_time = NbTime(1709192429, time_zone=time_zone)
+        t1 = time.time()
+        for _ in range(N):
+            nb_time.to_tz('Europe/Paris')
+        t_to_tz = time.time() - t1
+
+        t1 = time.time()
+        for _ in range(N):
+            nb_time.shift(hours=1)
+        t_shift = time.time() - t1
+        print(f'{backend:10} {time_zone:20} {N}次 构造 {t_construct:.3f}s  to_tz {t_to_tz:.3f}s  shift {t_shift:.3f}s')
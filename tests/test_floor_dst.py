@@ -0,0 +1,98 @@
+"""
+NbTime.floor ceil bucket 在夏令时切换那几天的行为测试，和 arrow 的 floor ceil 对比。
+
+arrow 按墙上时间计算，夏令时结束时重复的 01:xx 一律当作第一次出现的那个，第二次出现的 01:30 floor 到第一次的 01:00 ，
+比原时间早了1个多小时；夏令时开始那天 01:xx 的 ceil('hour') 是 03:59:59.999999 ，这个小时变成了2小时。
+所以参考值是: floor 用 arrow floor 的墙上时间，有两个候选时刻时取不晚于原时间的较晚的那个；
+ceil 是下一个区间的开始时刻减1微秒，下一个区间的开始时刻是 floor 的墙上时间(重复的墙上时间第二次出现)
+或者 floor 的墙上时间加1个单位，取晚于原时间的最早的那个。
+
+    python tests/test_floor_dst.py
+"""
+import datetime
+import zoneinfo
+
+import arrow
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+from nb_time import NbTime, datetime_to_epoch_us
+from nb_time.bucketing import UNITS, bucket_many
+from nb_time.nb_time_array import NbTimeArray
+
+# (时区, 夏令时切换的日期)
+CASES = [
+    ('America/New_York', '2024-03-10'),  # 02:00 -> 03:00
+    ('America/New_York', '2024-11-03'),  # 02:00 -> 01:00 ，01:xx 出现两次
+    ('Europe/London', '2024-03-31'),
+    ('Europe/London', '2024-10-27'),
+    ('Australia/Lord_Howe', '2024-04-07'),  # 半小时的夏令时
+    ('Australia/Lord_Howe', '2024-10-06'),
+]
+STEP_US = 397 * 1000000 + 123457  # 不对齐到整分钟的步长，切换前后一天内大约650个点
+UNIT_DELTAS = {
+    'second': relativedelta(seconds=1), 'minute': relativedelta(minutes=1), 'hour': relativedelta(hours=1),
+    'day': relativedelta(days=1), 'week': relativedelta(weeks=1),
+    'month': relativedelta(months=1), 'quarter': relativedelta(months=3), 'year': relativedelta(years=1),
+}
+
+
+def candidate_epoch_us(wall: datetime.datetime, zone: zoneinfo.ZoneInfo) -> list:
+    """
+    墙上时间对应的 utc 微秒时间戳，重复的墙上时间有两个。
+    不存在的墙上时间只取 fold=0 ，按切换前的偏移计算，正好是切换以后的时刻。
+    """
+    aware_list = [wall.replace(tzinfo=zone, fold=fold) for fold in (0, 1)]
+    existing = [aware for aware in aware_list if aware.astimezone(datetime.timezone.utc).astimezone(zone)
+                .replace(tzinfo=None) == wall]
+    return sorted({datetime_to_epoch_us(aware) for aware in existing or aware_list[:1]})
+
+
+def expected_floor_us(epoch_us: int, wall: datetime.datetime, zone: zoneinfo.ZoneInfo) -> int:
+    return max(us for us in candidate_epoch_us(wall, zone) if us <= epoch_us)
+
+
+def expected_ceil_us(epoch_us: int, floor_wall: datetime.datetime, unit: str, zone: zoneinfo.ZoneInfo) -> int:
+    candidates = candidate_epoch_us(floor_wall, zone) + candidate_epoch_us(floor_wall + UNIT_DELTAS[unit], zone)
+    return min(us for us in candidates if us > epoch_us) - 1
+
+
+checked = 0
+for time_zone, day in CASES:
+    zone = zoneinfo.ZoneInfo(time_zone)
+    start_us = NbTime(f'{day} 00:00:00', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE,
+                      time_zone=time_zone).epoch_us - 86400 * 1000000
+    points_us = list(range(start_us, start_us + 3 * 86400 * 1000000, STEP_US))
+    for epoch_us in points_us:
+        arrow_obj = arrow.Arrow.fromtimestamp(epoch_us / 1000000, tzinfo=zone)
+        arrow_obj = arrow_obj.replace(microsecond=epoch_us % 1000000)
+        for tz in (time_zone, zone):  # pytz 和 zoneinfo 两种时区
+            nb_time = NbTime(epoch_us / 1000000, time_zone=tz)
+            assert nb_time.epoch_us == epoch_us
+            for unit in UNITS:
+                floor_wall = arrow_obj.floor(unit).naive
+                assert nb_time.floor(unit).epoch_us == expected_floor_us(epoch_us, floor_wall, zone), \
+                    (time_zone, nb_time, unit, nb_time.floor(unit), floor_wall)
+                assert nb_time.ceil(unit).epoch_us == expected_ceil_us(epoch_us, floor_wall, unit, zone), \
+                    (time_zone, nb_time, unit, nb_time.ceil(unit), floor_wall)
+            wall = arrow_obj.naive
+            bucket_wall = wall.replace(minute=wall.minute // 15 * 15, second=0, microsecond=0)
+            assert nb_time.bucket('15min').epoch_us == expected_floor_us(epoch_us, bucket_wall, zone), \
+                (time_zone, nb_time, nb_time.bucket('15min'), bucket_wall)
+            assert nb_time.bucket('1h').epoch_us == nb_time.floor('hour').epoch_us
+            assert nb_time.bucket('1d').epoch_us == nb_time.floor('day').epoch_us
+            checked += 1
+
+    # 批量的 NbTimeArray.floor bucket 和 bucket_many 要和单个 NbTime 的结果一样
+    arr = NbTimeArray(np.array(points_us, dtype=np.int64).view('datetime64[us]'), time_zone=time_zone)
+    assert arr.epoch_us.tolist() == points_us
+    for unit in UNITS:
+        assert arr.floor(unit).epoch_us.tolist() == \
+               [NbTime(us / 1000000, time_zone=time_zone).floor(unit).epoch_us for us in points_us], (time_zone, unit)
+    for interval in ('15min', '1h', '1d'):
+        expected = [NbTime(us / 1000000, time_zone=time_zone).bucket(interval).epoch_us for us in points_us]
+        assert arr.bucket(interval).epoch_us.tolist() == expected, (time_zone, interval)
+        assert bucket_many(np.array(points_us), interval, time_zone=time_zone, unit='us').tolist() == expected
+        assert bucket_many(points_us, interval, time_zone=time_zone, unit='us') == expected
+
+print(f'floor ceil bucket 夏令时检查通过，{checked} 个时间点，每个点 {len(UNITS)} 种 unit')
@@ -0,0 +1,50 @@
+"""
+NbTime.humanize_many 和逐个调用 arrow 的 humanize 对比，重点是月末月初附近、参考时间和被描述的时间不在同一个时区的情况。
+
+    python tests/test_humanize.py
+"""
+import datetime
+import itertools
+
+from nb_time import NbTime
+
+TIME_ZONES = ['UTC+8', 'America/New_York', 'Europe/London', 'UTC-10', 'Asia/Kolkata']
+# 参考时间都在月末月初附近，不同时区的墙上时间可能已经在不同的月份
+REFERENCE_TIMES = ['2024-03-31 23:30:00', '2024-03-01 00:30:00', '2024-02-29 12:00:00', '2023-12-31 20:00:00',
+                   '2024-11-03 01:30:00']
+DAY = 86400
+# 覆盖 now seconds minutes hours days weeks months years 每一档的边界附近
+OFFSETS = [0, 5, 30, 90, 1800, 5400, 20000, 100000, 200000, 6 * DAY, 8 * DAY, 20 * DAY, 45 * DAY, 60 * DAY,
+           100 * DAY, 200 * DAY, 400 * DAY, 800 * DAY] + [int(day * DAY) for day in range(13, 36)] + \
+          [day * DAY for day in range(330, 370, 3)]
+OFFSETS = sorted(set(OFFSETS + [offset + 7200 for offset in OFFSETS] + [offset - 7200 for offset in OFFSETS]))
+
+checked = 0
+for reference_zone, reference_str in itertools.product(TIME_ZONES, REFERENCE_TIMES):
+    reference = NbTime(reference_str, datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE, time_zone=reference_zone)
+    reference_arrow = reference.to_arrow()
+    for time_zone in TIME_ZONES:
+        nb_times = [NbTime(reference.timestamp + sign * offset, time_zone=time_zone)
+                    for offset in OFFSETS for sign in (1, -1)]
+        cases = [
+            (reference, reference_arrow),  # NbTime 参考时间和 to_arrow() 以后的 Arrow 一样
+            (reference_arrow, reference_arrow),
+            (reference.datetime_obj, reference.datetime_obj),  # datetime 转换到被描述的时间的时区
+        ]
+        for nb_time_reference, arrow_reference in cases:
+            expected = [nb_time.to_arrow().humanize(arrow_reference) for nb_time in nb_times]
+            assert NbTime.humanize_many(nb_times, reference=nb_time_reference) == expected, \
+                (reference, time_zone, type(nb_time_reference))
+            assert [nb_time.humanize(nb_time_reference) for nb_time in nb_times] == expected
+            expected_zh = [nb_time.to_arrow().humanize(arrow_reference, locale='zh_cn', granularity=['day', 'hour'])
+                           for nb_time in nb_times[:20]]
+            assert NbTime.humanize_many(nb_times[:20], reference=nb_time_reference, locale='zh_cn',
+                                        granularity=['day', 'hour']) == expected_zh
+            checked += len(nb_times)
+
+# 不传参考时间是现在，和 arrow 一样转换到每个时间自己的时区
+now_nb_times = [NbTime(time_zone=time_zone).shift(days=-40) for time_zone in TIME_ZONES]
+assert NbTime.humanize_many(now_nb_times) == [nb_time.to_arrow().humanize() for nb_time in now_nb_times]
+assert NbTime.humanize_many([NbTime(time_zone='UTC+8')], reference=datetime.datetime.now(datetime.timezone.utc)) == \
+       ['just now']
+print(f'humanize_many 和 arrow humanize 一致，{checked} 个用例')
@@ -0,0 +1,42 @@
+"""
+import nb_time 的耗时回归测试，用 python -X importtime 统计，不导入 arrow dateutil pytz tzlocal ，也不往 stdout 打印。
+
+    python tests/test_import_time.py                                # 默认预算 75ms
+    NB_TIME_IMPORT_BUDGET_MS=40 python tests/test_import_time.py    # 自定义预算，单位毫秒
+    pytest tests/test_import_time.py
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RUNS = 7
+BUDGET_MS = float(os.environ.get('NB_TIME_IMPORT_BUDGET_MS') or 75)
+LAZY_MODULES = ['arrow', 'dateutil', 'pytz', 'tzlocal', 'pickle', 'copy', 'numpy']
+CODE = 'import nb_time; nb_time.NbTime(); nb_time.NbTime(time_zone="UTC").get_str()'
+
+
+def test_import_time():
+    env = dict(os.environ, NB_TIME_LOCAL_TIME_ZONE='UTC+8')
+    cumulative_us_list = []
+    for _ in range(RUNS):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', CODE], env=env, capture_output=True,
+                              text=True, check=True)
+        assert proc.stdout == '', f'import nb_time 不应该打印任何东西: {proc.stdout!r}'
+        imported = {}
+        for line in proc.stderr.splitlines():
+            match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+            if match:
+                imported[match.group(4)] = int(match.group(2))
+        for module in LAZY_MODULES:
+            assert module not in imported, f'{module} 应该在第一次用到时才导入'
+        cumulative_us_list.append(imported['nb_time'])
+
+    median_ms = statistics.median(cumulative_us_list) / 1000
+    print(f'import nb_time 中位数 {median_ms:.1f}ms ，最快 {min(cumulative_us_list) / 1000:.1f}ms ，预算 {BUDGET_MS}ms')
+    assert median_ms <= BUDGET_MS, f'import nb_time 耗时 {median_ms:.1f}ms 超过预算 {BUDGET_MS}ms'
+
+
+if __name__ == '__main__':
+    test_import_time()
@@ -0,0 +1,51 @@
+"""
+NbTime pickle 和 to_bytes/from_bytes 的往返测试，to_bytes 接受的对象一定要能 from_bytes 回来。
+
+    python tests/test_serialization.py
+"""
+import datetime
+import pickle
+import zoneinfo
+
+from nb_time import NbTime
+from nb_time.serialization import BYTES_SIZE
+
+TIME_ZONES = ['UTC', 'UTC+8', 'UTC+05:30', 'UTC+05:45', 'UTC-09:30', 'UTC-12', 'Asia/Shanghai', 'America/New_York',
+              'Europe/London', zoneinfo.ZoneInfo('America/New_York'),
+              datetime.timezone(datetime.timedelta(hours=3, minutes=30)), datetime.timezone.utc]
+FORMATTERS = [NbTime.FORMATTER_DATETIME, NbTime.FORMATTER_DATETIME_NO_ZONE, NbTime.FORMATTER_MILLISECOND]
+
+
+def assert_same(restored: NbTime, nb_time: NbTime):
+    assert restored == nb_time, (restored, nb_time)
+    assert restored.epoch_us == nb_time.epoch_us
+    assert restored.datetime_obj.utcoffset() == nb_time.datetime_obj.utcoffset(), (restored, nb_time)
+    assert restored.datetime_formatter == nb_time.datetime_formatter
+    assert restored.datetime_str == nb_time.datetime_str, (restored.datetime_str, nb_time.datetime_str)
+
+
+checked = 0
+for time_zone in TIME_ZONES:
+    for formatter in FORMATTERS:
+        for ts in (0, 1709192429.123456, 1730612400, -86400 * 365):
+            nb_time = NbTime(ts, time_zone=time_zone, datetime_formatter=formatter)
+            assert_same(pickle.loads(pickle.dumps(nb_time)), nb_time)
+            data = nb_time.to_bytes()
+            assert len(data) == BYTES_SIZE
+            assert_same(NbTime.from_bytes(data), nb_time)
+            checked += 1
+
+# 带秒的固定偏移表示不成时区字符串，to_bytes 直接拒绝，让用户用 pickle ，不能序列化成功了却解析不回来
+for seconds in (3601, -3601, 59):
+    nb_time = NbTime(datetime.datetime(2024, 1, 1),
+                     time_zone=datetime.timezone(datetime.timedelta(seconds=seconds)))
+    try:
+        nb_time.to_bytes()
+    except ValueError as e:
+        assert 'pickle' in str(e), e
+    else:
+        raise AssertionError(f'utc offset {seconds}s should not be encoded by to_bytes')
+    assert_same(pickle.loads(pickle.dumps(nb_time)), nb_time)
+    checked += 1
+
+print(f'pickle to_bytes 往返检查通过，{checked} 个用例')
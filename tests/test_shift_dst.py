@@ -0,0 +1,57 @@
+"""
+NbTime.shift 跨夏令时的回归测试: 年 月 按墙上时间加减，时 分 秒 按绝对时间加减，pytz zoneinfo 两种时区的结果要一样。
+
+    python tests/test_shift_dst.py
+"""
+import datetime
+import random
+import zoneinfo
+
+from dateutil.relativedelta import relativedelta
+
+from nb_time import NbTime, NbTimeLite
+
+TIME_ZONES = ['America/New_York', 'Europe/London', 'Australia/Sydney', 'Australia/Lord_Howe', 'Asia/Shanghai']
+UTC = datetime.timezone.utc
+
+
+def is_unique_wall_time(wall: datetime.datetime, zone: zoneinfo.ZoneInfo) -> bool:
+    """墙上时间在这个时区存在而且不重复，重复和不存在的时刻 pytz 和 zoneinfo 的取法不一样，不比较"""
+    aware = wall.replace(tzinfo=zone)
+    return (aware.astimezone(UTC).astimezone(zone).replace(tzinfo=None) == wall and
+            aware.utcoffset() == aware.replace(fold=1).utcoffset())
+
+
+def shift_str(time_str: str, **kw) -> str:
+    nb_time = NbTime(time_str, time_zone='America/New_York', datetime_formatter=NbTime.FORMATTER_DATETIME_NO_ZONE)
+    return nb_time.shift(**kw).get_str(NbTime.FORMATTER_DATETIME)
+
+
+# 纽约冬令时 + 6个月 要保持墙上时间 10:00 ，不能是 11:00
+assert shift_str('2024-01-15 10:00:00', months=6) == '2024-07-15 10:00:00 -0400'
+assert shift_str('2024-07-15 10:00:00', months=-6) == '2024-01-15 10:00:00 -0500'
+assert shift_str('2023-11-05 12:00:00', years=1) == '2024-11-05 12:00:00 -0500'
+# 时 分 秒 是绝对时间，跨过 2024-03-10 的切换只过了1小时
+assert shift_str('2024-03-10 01:30:00', hours=1) == '2024-03-10 03:30:00 -0400'
+
+random.seed(7)
+checked = 0
+for time_zone in TIME_ZONES:
+    zone = zoneinfo.ZoneInfo(time_zone)
+    for _ in range(3000):
+        ts = random.randint(1500000000, 1900000000)
+        kw = random.choice([dict(months=random.randint(-30, 30)), dict(years=random.randint(-3, 3)),
+                            dict(months=random.randint(-12, 12), days=random.randint(-40, 40)),
+                            dict(years=1, hours=random.randint(-50, 50))])
+        calendar_kw = {k: v for k, v in kw.items() if k in ('years', 'months')}
+        wall = datetime.datetime.fromtimestamp(ts, zone).replace(tzinfo=None) + relativedelta(**calendar_kw)
+        if not is_unique_wall_time(wall, zone):
+            continue
+        fixed_delta = datetime.timedelta(days=kw.get('days', 0), hours=kw.get('hours', 0))
+        expected = (wall.replace(tzinfo=zone).astimezone(UTC) + fixed_delta).astimezone(zone)
+        for cls, tz in [(NbTime, time_zone), (NbTime, zone), (NbTimeLite, time_zone)]:
+            actual = cls(ts, time_zone=tz).shift(**kw).datetime_obj
+            assert actual == expected and actual.utcoffset() == expected.utcoffset() and \
+                   actual.replace(tzinfo=None) == expected.replace(tzinfo=None), (time_zone, ts, kw, actual, expected)
+        checked += 1
+print(f'shift 跨夏令时检查通过，{checked} 个随机用例')